@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """
 main script to analyze laser scans using laserscanqa framework
+
+without arguments it runs the single scan, batch and report examples; with
+--watch it keeps assessing scans as they arrive in a directory:
+    python analyze_scans.py --watch /mnt/scans --output reports --workers 4
+and --compare reports what changed between two scans of the same asset:
+    python analyze_scans.py --compare week1.las week2.las
 """
 
 from laserscanqa import LaserScanQA
+from pointcloud_io import SUPPORTED_EXTENSIONS
 from pathlib import Path
+import argparse
 import json
 
 def analyze_single_scan():
@@ -61,24 +69,24 @@ def analyze_batch_scans():
     #initialize the quality assessment framework
     qa = LaserScanQA()
     
-    #find all csv files in data directory
+    #find all supported point cloud files in data directory
     data_dir = Path("data")
-    csv_files = list(data_dir.glob("*.csv"))
+    scan_files = sorted(f for f in data_dir.glob("*") if f.suffix.lower() in SUPPORTED_EXTENSIONS)
     
-    #check if any csv files found
-    if not csv_files:
-        print("no csv files found in data folder!")
+    #check if any scan files found
+    if not scan_files:
+        print("no scan files found in data folder!")
         print("run 'create_sample_data.py' first to create sample files.")
         return
     
-    #list all found csv files
-    print(f"found {len(csv_files)} scan files:")
-    for file in csv_files:
+    #list all found scan files
+    print(f"found {len(scan_files)} scan files:")
+    for file in scan_files:
         print(f"  - {file.name}")
     
     #process all files in batch
     print("\nprocessing files...")
-    reports = qa.batch_process([str(f) for f in csv_files], "reports")
+    reports = qa.batch_process([str(f) for f in scan_files], "reports")
     
     #confirm reports generated
     print(f"\ngenerated {len(reports)} quality reports!")
@@ -118,10 +126,69 @@ def read_report_example():
     #print quality standards status
     print(f"meets all quality standards: {'YES' if all_pass else 'NO'}")
 
-if __name__ == "__main__":
+def watch_scans(args: argparse.Namespace):
+    """assess scans arriving in a directory until interrupted"""
+    print("=== WATCH FOLDER ===")
+    
+    #one warm framework instance for the whole session
+    qa = LaserScanQA()
+    qa.config['watch_poll_seconds'] = args.poll
+    qa.config['watch_settle_seconds'] = args.settle
+    if args.jsonl:
+        qa.config['report_format'] = 'jsonl'
+    
+    #runs until ctrl-c; the checkpoint lets the next start skip finished files
+    assessed = qa.watch_folder(args.watch, args.output, workers=args.workers,
+                               checkpoint_path=args.checkpoint, recursive=args.recursive)
+    print(f"\nassessed {assessed} scans this session")
+
+def compare_scans(args: argparse.Namespace):
+    """report what changed between two scans of the same asset"""
+    print("=== CHANGE DETECTION ===")
+    
+    qa = LaserScanQA()
+    previous_path, current_path = args.compare
+    Path(args.output).mkdir(parents=True, exist_ok=True)
+    output_path = Path(args.output) / f"{Path(current_path).stem}_changes.json"
+    report = qa.compare_scans(current_path, previous_path, str(output_path))
+    if report is None:
+        return
+    
+    change = report['change']
+    print(f"added: {change['added_points']:,} points in {change['added_volume']:.3f} m^3")
+    print(f"removed: {change['removed_points']:,} points in {change['removed_volume']:.3f} m^3")
+    print(f"unchanged voxels: {change['persisted_voxels']:,}")
+
+def main():
+    """parse arguments and run the examples, change detection or the watch folder mode"""
+    parser = argparse.ArgumentParser(description="analyze laser scans with the laserscanqa framework")
+    parser.add_argument('--watch', default=None, help="directory to watch for arriving scans")
+    parser.add_argument('--output', default='reports', help="directory for reports and the checkpoint")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes assessing scans")
+    parser.add_argument('--poll', type=float, default=2.0, help="seconds between directory listings")
+    parser.add_argument('--settle', type=float, default=5.0,
+                        help="seconds a file must stay unchanged before it is assessed")
+    parser.add_argument('--checkpoint', default=None,
+                        help="log of assessed files (default: watch_checkpoint.jsonl in --output)")
+    parser.add_argument('--recursive', action='store_true', help="also watch subdirectories")
+    parser.add_argument('--jsonl', action='store_true', help="append reports to one json lines file")
+    parser.add_argument('--compare', nargs=2, default=None, metavar=('PREVIOUS', 'CURRENT'),
+                        help="report changes between an earlier and a later scan of one asset")
+    args = parser.parse_args()
+    
+    if args.compare:
+        compare_scans(args)
+        return
+    if args.watch:
+        watch_scans(args)
+        return
+    
     #run the single scan analysis function
     analyze_single_scan()
     #run the batch scan analysis function
     analyze_batch_scans()
     #run the report reading example function
-    read_report_example()
\ No newline at end of file
+    read_report_example()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
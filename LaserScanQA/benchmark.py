@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+benchmark suite for the laserscanqa framework
+
+builds seeded synthetic site scans (ground, walls and a roof with sensor noise,
+occlusion holes and outliers) from 1e4 up to 1e8 points, writes them in csv and
+binary formats, times every assessment stage and batch processing, and writes
+machine-readable results that can be diffed between releases.
+
+examples:
+    python benchmark.py --sizes 1e4 1e5 1e6 --output bench.json
+    python benchmark.py --sizes 1e7 1e8 --formats npy las --max-in-memory 2e7
+    python benchmark.py --compare bench_old.json --output bench_new.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+from laserscanqa import METRICS_VERSION, LaserScanQA
+from pointcloud_io import write_points
+
+#points per square meter of scanned surface, so larger scans cover larger sites
+SURFACE_DENSITY = 2000.0
+#points generated per chunk; the scene for a given seed depends only on n
+GENERATION_CHUNK = 1_000_000
+
+
+def scene_chunks(n: int, seed: int = 0, noise: float = 0.005,
+                 outlier_ratio: float = 0.001) -> Iterator[np.ndarray]:
+    """
+    generate a synthetic site scan chunk by chunk
+
+    Args:
+        n: total number of points
+        seed: random seed
+        noise: standard deviation of gaussian sensor noise in meters
+        outlier_ratio: fraction of points scattered uniformly around the scene
+
+    Returns:
+        iterator of (B, 3) float64 chunks adding up to n points
+    """
+    #site size grows with the point count so the surface density stays realistic
+    side = float(np.sqrt(n / SURFACE_DENSITY / 1.4))
+    height = side / 5.0
+    #occlusion holes on the ground, fixed for the whole scene
+    scene_rng = np.random.default_rng([seed, 0])
+    holes = scene_rng.uniform(0.1 * side, 0.9 * side, size=(5, 2))
+    hole_radius = side / 20.0
+    #share of points on ground, two walls, roof and outliers
+    shares = np.array([0.6, 0.15, 0.15, 0.1])
+    shares = np.append(shares * (1.0 - outlier_ratio), outlier_ratio)
+
+    for index, start in enumerate(range(0, n, GENERATION_CHUNK)):
+        rng = np.random.default_rng([seed, index + 1])
+        count = min(GENERATION_CHUNK, n - start)
+        parts = []
+        ground_n, wall_a_n, wall_b_n, roof_n, outlier_n = rng.multinomial(count, shares)
+
+        #ground plane with holes, sampled with oversampling and rejection
+        ground = np.empty((0, 3))
+        while len(ground) < ground_n:
+            xy = rng.uniform(0, side, size=(int((ground_n - len(ground)) * 1.2) + 16, 2))
+            inside = np.zeros(len(xy), dtype=bool)
+            for centre in holes:
+                inside |= np.sum((xy - centre) ** 2, axis=1) < hole_radius ** 2
+            xy = xy[~inside]
+            ground = np.vstack([ground, np.column_stack([xy, np.zeros(len(xy))])])
+        parts.append(ground[:ground_n])
+
+        #walls along the x = 0 and y = 0 edges
+        a = rng.uniform(0, 1, size=(wall_a_n, 2))
+        parts.append(np.column_stack([np.zeros(wall_a_n), a[:, 0] * side, a[:, 1] * height]))
+        b = rng.uniform(0, 1, size=(wall_b_n, 2))
+        parts.append(np.column_stack([b[:, 0] * side, np.zeros(wall_b_n), b[:, 1] * height]))
+
+        #tilted roof over part of the site
+        r = rng.uniform(0, 1, size=(roof_n, 2))
+        parts.append(np.column_stack([r[:, 0] * side / 2, r[:, 1] * side / 2,
+                                      height + r[:, 0] * height / 4]))
+
+        chunk = np.vstack(parts)
+        chunk += rng.normal(0.0, noise, size=chunk.shape)
+        #flying pixels around the scene
+        outliers = rng.uniform([-0.2 * side, -0.2 * side, -0.2 * height],
+                               [1.2 * side, 1.2 * side, 1.5 * height], size=(outlier_n, 3))
+        chunk = np.vstack([chunk, outliers])
+        yield chunk[rng.permutation(len(chunk))]
+
+
+def build_scene_files(n: int, seed: int, formats: List[str], workdir: Path) -> Dict[str, Path]:
+    """
+    write one scene in every requested format
+
+    the scene is generated once into a memory-mapped .npy file, which every other
+    format is converted from, so memory stays bounded for the largest sizes.
+
+    Args:
+        n: number of points
+        seed: random seed
+        formats: file extensions without dot ('csv', 'npy', 'ply', 'las')
+        workdir: directory for the generated files
+
+    Returns:
+        mapping from format to file path
+    """
+    base = workdir / f"scene_{n}_{seed}.npy"
+    points = np.lib.format.open_memmap(base, mode='w+', dtype=np.float64, shape=(n, 3))
+    filled = 0
+    for chunk in scene_chunks(n, seed):
+        points[filled:filled + len(chunk)] = chunk
+        filled += len(chunk)
+    points.flush()
+
+    files = {}
+    for fmt in formats:
+        path = workdir / f"scene_{n}_{seed}.{fmt}"
+        if fmt != 'npy':
+            write_points(str(path), points)
+        files[fmt] = path
+    del points
+    return files
+
+
+def profile_rows(profile: Dict, **labels) -> List[Dict]:
+    """flatten a metrics profile into one result row per stage"""
+    return [dict(labels, stage=stage, seconds=entry['seconds'], peak_bytes=entry['peak_bytes'])
+            for stage, entry in profile.items()]
+
+
+def run_benchmark(sizes: List[int], formats: List[str], seed: int, workers: int,
+                  max_in_memory: int, trace_memory: bool, workdir: Path) -> Dict:
+    """
+    generate scenes and time every stage
+
+    Args:
+        sizes: point counts to benchmark
+        formats: file formats to benchmark
+        seed: random seed of the scenes
+        workers: worker processes for the parallel batch run
+        max_in_memory: largest point count assessed in memory (larger ones are streamed only)
+        trace_memory: record peak memory of every stage
+        workdir: directory for generated files and reports
+
+    Returns:
+        dictionary with environment information and result rows
+    """
+    config = dict(LaserScanQA()._default_config(), profile_memory=trace_memory)
+    results = []
+    for n in sizes:
+        print(f"generating {n:,} points...")
+        files = build_scene_files(n, seed, formats, workdir)
+        qa = LaserScanQA(config)
+        streaming_qa = LaserScanQA(dict(config, streaming=True))
+
+        for fmt, path in files.items():
+            labels = {'points': n, 'format': fmt}
+            if n <= max_in_memory:
+                result = qa.process_file(str(path), str(workdir / 'reports'))
+                if result is not None:
+                    results += profile_rows(result[0].profile, mode='in_memory', **labels)
+                    results.append(dict(labels, mode='in_memory', stage='total',
+                                        seconds=result[0].processing_time
+                                        + result[0].profile.get('load', {}).get('seconds', 0.0),
+                                        peak_bytes=max(e['peak_bytes'] for e in result[0].profile.values())))
+            result = streaming_qa.process_file(str(path), str(workdir / 'reports'))
+            if result is not None:
+                results += profile_rows(result[0].profile, mode='streaming', **labels)
+                results.append(dict(labels, mode='streaming', stage='total',
+                                    seconds=result[0].processing_time,
+                                    peak_bytes=max(e['peak_bytes'] for e in result[0].profile.values())))
+
+        #whole batch over every format of this size, serial and on a process pool
+        batch_qa = qa if n <= max_in_memory else streaming_qa
+        for batch_workers in sorted({1, workers}):
+            start = time.perf_counter()
+            batch_qa.batch_process([str(p) for p in files.values()], str(workdir / 'reports'),
+                                   workers=batch_workers)
+            results.append({'points': n, 'format': 'all', 'mode': f'batch_{batch_workers}',
+                            'stage': 'total', 'seconds': time.perf_counter() - start, 'peak_bytes': 0})
+
+        for path in set(files.values()) | {workdir / f"scene_{n}_{seed}.npy"}:
+            path.unlink(missing_ok=True)
+
+    return {
+        'metrics_version': METRICS_VERSION,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': results
+    }
+
+
+def compare_results(old: Dict, new: Dict, tolerance: float) -> List[str]:
+    """
+    list stages that got slower than tolerance allows
+
+    Args:
+        old: earlier benchmark output
+        new: current benchmark output
+        tolerance: allowed relative slowdown (0.2 means 20 percent)
+
+    Returns:
+        one line per regression
+    """
+    def keyed(data):
+        return {(r['points'], r['format'], r['mode'], r['stage']): r for r in data['results']}
+
+    before = keyed(old)
+    regressions = []
+    for key, row in sorted(keyed(new).items(), key=lambda item: str(item[0])):
+        if key not in before or before[key]['seconds'] <= 0:
+            continue
+        ratio = row['seconds'] / before[key]['seconds']
+        #ignore sub-millisecond stages, their timings are mostly noise
+        if ratio > 1.0 + tolerance and row['seconds'] > 1e-3:
+            regressions.append(f"{key}: {before[key]['seconds']:.4f}s -> {row['seconds']:.4f}s ({ratio:.2f}x)")
+    return regressions
+
+
+def main():
+    """parse arguments, run the benchmark and write the results"""
+    parser = argparse.ArgumentParser(description="benchmark the laserscanqa framework")
+    parser.add_argument('--sizes', nargs='+', type=float, default=[1e4, 1e5, 1e6],
+                        help="point counts to benchmark (up to 1e8)")
+    parser.add_argument('--formats', nargs='+', default=['csv', 'npy', 'ply', 'las'],
+                        choices=['csv', 'npy', 'ply', 'las'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=4, help="worker processes for the parallel batch run")
+    parser.add_argument('--max-in-memory', type=float, default=2e7,
+                        help="largest scan assessed in memory; larger scans are only streamed")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc peak memory tracing")
+    parser.add_argument('--workdir', default=None, help="directory for generated scans (default: temporary)")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', default=None, help="earlier results to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp:
+        workdir = Path(args.workdir or temp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = run_benchmark([int(s) for s in args.sizes], args.formats, args.seed, args.workers,
+                                int(args.max_in_memory), not args.no_memory, workdir)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            regressions = compare_results(json.load(f), results, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+change_detection - voxel-hash differences between two scans of the same asset
+"""
+
+import numpy as np
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from spatial_index import VoxelHashIndex
+from voxel_grid import VoxelGrid, pack_voxel_keys, unpack_voxel_keys
+
+#offsets of a voxel and its 26 neighbours
+NEIGHBOUR_OFFSETS = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+
+
+@dataclass
+class ScanChange:
+    """
+    differences between a scan (before) and its rescan (after)
+
+    added_mask flags after points with no before point within threshold,
+    removed_mask flags before points with no after point within threshold.
+    the voxel key arrays are sorted and share the frame of origin.
+    """
+    voxel_size: float
+    threshold: float
+    origin: np.ndarray
+    added_mask: np.ndarray
+    removed_mask: np.ndarray
+    added_voxels: np.ndarray
+    removed_voxels: np.ndarray
+    persisted_voxels: int
+
+    @property
+    def voxel_volume(self) -> float:
+        """volume of one voxel"""
+        return self.voxel_size ** 3
+
+    @property
+    def added_volume(self) -> float:
+        """volume of the voxels holding added points"""
+        return len(self.added_voxels) * self.voxel_volume
+
+    @property
+    def removed_volume(self) -> float:
+        """volume of the voxels holding removed points"""
+        return len(self.removed_voxels) * self.voxel_volume
+
+    def voxel_centers(self, keys: np.ndarray) -> np.ndarray:
+        """centre coordinates (M, 3) of voxel keys, e.g. added_voxels for export"""
+        return self.origin + (unpack_voxel_keys(keys) + 0.5) * self.voxel_size
+
+    def summary(self) -> Dict:
+        """json-ready counts and volumes"""
+        return {
+            'voxel_size': self.voxel_size,
+            'threshold': self.threshold,
+            'added_points': int(np.count_nonzero(self.added_mask)),
+            'removed_points': int(np.count_nonzero(self.removed_mask)),
+            'added_voxels': len(self.added_voxels),
+            'removed_voxels': len(self.removed_voxels),
+            'persisted_voxels': int(self.persisted_voxels),
+            'added_volume': self.added_volume,
+            'removed_volume': self.removed_volume,
+            'change_volume': self.added_volume + self.removed_volume
+        }
+
+
+def neighbour_keys(keys: np.ndarray) -> np.ndarray:
+    """
+    keys of every voxel's 3x3x3 neighbourhood, itself included
+
+    Args:
+        keys: int64 voxel keys (M,)
+
+    Returns:
+        int64 keys (M, 27)
+    """
+    cells = unpack_voxel_keys(keys)
+    return pack_voxel_keys((cells[:, None, :] + NEIGHBOUR_OFFSETS).reshape(-1, 3)).reshape(len(keys), -1)
+
+
+def sorted_member(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    """whether each key occurs in a sorted unique key array"""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return sorted_keys[pos] == keys
+
+
+def _unmatched(points: np.ndarray, keys: np.ndarray, candidates: np.ndarray,
+               other: np.ndarray, other_keys: np.ndarray, other_voxels: np.ndarray,
+               threshold: float) -> np.ndarray:
+    """
+    flag points of candidate voxels with no point of the other scan within threshold
+
+    with threshold <= voxel_size a match can only lie in the 3x3x3 neighbourhood
+    of a point's voxel. candidates with an empty neighbourhood in the other scan
+    are changed outright; for the rest only the other scan's points in their
+    neighbourhoods are indexed and queried.
+    """
+    mask = sorted_member(keys, candidates)
+    if len(candidates) == 0 or len(other_voxels) == 0:
+        return mask
+    neighbours = neighbour_keys(candidates)
+    occupied = sorted_member(neighbours.ravel(), other_voxels).reshape(neighbours.shape)
+    contested = candidates[occupied.any(axis=1)]
+    if len(contested) == 0:
+        return mask
+    rows = np.flatnonzero(sorted_member(keys, contested))
+    nearby = other[sorted_member(other_keys, np.unique(neighbours[occupied]))]
+    mask[rows] = VoxelHashIndex(nearby).nearest_distances(points[rows]) > threshold
+    return mask
+
+
+def detect_changes(before: np.ndarray, after: np.ndarray, voxel_size: float = 0.25,
+                   threshold: Optional[float] = None) -> ScanChange:
+    """
+    find what was added and removed between two scans in time linear in their size
+
+    both clouds are binned into voxel keys on one lattice. sorted set
+    differences give the voxels occupied in only one scan; points in voxels
+    occupied in both count as unchanged. points in the other voxels get exact
+    nearest-neighbour distances to the other scan where it has points close
+    enough to matter, so a surface that merely crossed a voxel border is not
+    reported as a change.
+
+    Args:
+        before: earlier scan (N, 3)
+        after: later scan (M, 3) in the same coordinates
+        voxel_size: voxel edge length, the resolution of the change map
+        threshold: distance beyond which a point counts as changed (if None,
+            voxel_size; capped at voxel_size)
+
+    Returns:
+        scanchange with per-point masks, changed voxel keys and volumes
+    """
+    threshold = voxel_size if threshold is None else min(float(threshold), voxel_size)
+    clouds = [c for c in (before, after) if len(c)]
+    low = np.min([np.min(c, axis=0) for c in clouds], axis=0) if clouds else np.zeros(3)
+    grid = VoxelGrid(voxel_size, np.asarray(low, dtype=np.float64))
+    before_keys = grid.voxel_keys(before) if len(before) else np.empty(0, dtype=np.int64)
+    after_keys = grid.voxel_keys(after) if len(after) else np.empty(0, dtype=np.int64)
+    before_voxels = np.unique(before_keys)
+    after_voxels = np.unique(after_keys)
+
+    #sorted-array set operations on the occupied voxels
+    added = np.setdiff1d(after_voxels, before_voxels, assume_unique=True)
+    removed = np.setdiff1d(before_voxels, after_voxels, assume_unique=True)
+    persisted = len(after_voxels) - len(added)
+
+    added_mask = _unmatched(after, after_keys, added, before, before_keys, before_voxels, threshold)
+    removed_mask = _unmatched(before, before_keys, removed, after, after_keys, after_voxels, threshold)
+    return ScanChange(voxel_size=float(voxel_size), threshold=threshold, origin=grid.origin,
+                      added_mask=added_mask, removed_mask=removed_mask,
+                      added_voxels=np.unique(after_keys[added_mask]),
+                      removed_voxels=np.unique(before_keys[removed_mask]),
+                      persisted_voxels=persisted)
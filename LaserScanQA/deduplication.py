@@ -0,0 +1,129 @@
+"""
+deduplication - duplicate and near-duplicate points found through quantized 64-bit keys
+"""
+
+import numpy as np
+import warnings
+from typing import Tuple
+
+from voxel_grid import KEY_BIAS, KEY_BITS, KEY_MASK, pack_voxel_keys
+
+#points quantized per block, bounding the int64 cell temporaries
+DEDUP_CHUNK_ROWS = 1_000_000
+
+
+def quantized_keys(points: np.ndarray, tolerance: float,
+                   chunk_size: int = DEDUP_CHUNK_ROWS) -> np.ndarray:
+    """
+    pack each point's tolerance-sized cell into one int64 key
+
+    cells are counted from the cloud minimum, so 2**21 cells fit per axis
+    (about 2 km at a 1 mm tolerance). a larger cloud gets the rank of its cell
+    among the sorted cells instead, which costs a lexsort and 24 bytes per
+    point, and a warning.
+
+    Args:
+        points: point cloud data (N, 3)
+        tolerance: cell edge length; points sharing a cell are duplicates
+        chunk_size: points quantized per block
+
+    Returns:
+        int64 keys (N,)
+    """
+    keys = np.empty(len(points), dtype=np.int64)
+    if len(points) == 0:
+        return keys
+    low = np.min(points, axis=0).astype(np.float64)
+    high = np.max(points, axis=0).astype(np.float64)
+    if np.any(np.floor((high - low) / tolerance) > KEY_MASK):
+        warnings.warn(f"cloud extent exceeds {KEY_BITS} bits per axis at tolerance {tolerance}; "
+                      "using slower sorted cell keys", RuntimeWarning)
+        return ranked_keys(points, low, tolerance, chunk_size)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        cells = np.floor((chunk - low) / tolerance).astype(np.int64)
+        #shift to the signed range the key packing expects
+        keys[start:start + len(chunk)] = pack_voxel_keys(cells - KEY_BIAS)
+    return keys
+
+
+def ranked_keys(points: np.ndarray, low: np.ndarray, tolerance: float,
+                chunk_size: int = DEDUP_CHUNK_ROWS) -> np.ndarray:
+    """
+    key each point by the rank of its cell among the occupied cells
+
+    equal cells get equal keys like packed keys, without a limit on the extent.
+
+    Args:
+        points: point cloud data (N, 3)
+        low: cloud minimum (3,)
+        tolerance: cell edge length
+        chunk_size: points quantized per block
+
+    Returns:
+        int64 keys (N,)
+    """
+    cells = np.empty((len(points), 3), dtype=np.int64)
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size], dtype=np.float64)
+        cells[start:start + len(chunk)] = np.floor((chunk - low) / tolerance)
+    order = np.lexsort((cells[:, 2], cells[:, 1], cells[:, 0]))
+    cells = cells[order]
+    #a new rank starts wherever the sorted cell changes
+    ranks = np.empty(len(cells), dtype=np.int64)
+    ranks[0] = 0
+    np.cumsum(np.any(cells[1:] != cells[:-1], axis=1), out=ranks[1:])
+    keys = np.empty(len(cells), dtype=np.int64)
+    keys[order] = ranks
+    return keys
+
+
+def unique_count(points: np.ndarray, tolerance: float = 0.001) -> int:
+    """
+    number of occupied tolerance cells, without building a mask
+
+    the keys are sorted in place, which is several times faster than the
+    argsort a mask needs.
+
+    Args:
+        points: point cloud data (N, 3)
+        tolerance: cell edge length
+
+    Returns:
+        number of unique points
+    """
+    keys = quantized_keys(points, tolerance)
+    if len(keys) == 0:
+        return 0
+    keys.sort()
+    return int(np.count_nonzero(keys[1:] != keys[:-1])) + 1
+
+
+def duplicate_mask(points: np.ndarray, tolerance: float = 0.001) -> Tuple[np.ndarray, int]:
+    """
+    keep one point of every occupied tolerance cell
+
+    one argsort of the keys groups equal cells and the first point of each run
+    in sorted order is kept. near-duplicates that straddle a cell border fall
+    into different cells and are both kept.
+
+    Args:
+        points: point cloud data (N, 3)
+        tolerance: cell edge length (a few times the scanner resolution)
+
+    Returns:
+        tuple of keep mask (N,) and the number of unique points
+    """
+    keys = quantized_keys(points, tolerance)
+    keep = np.zeros(len(keys), dtype=bool)
+    if len(keys) == 0:
+        return keep, 0
+    order = np.argsort(keys)
+    #sorted keys replace the unsorted ones instead of being held next to them
+    keys = keys[order]
+    first = np.empty(len(keys), dtype=bool)
+    first[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=first[1:])
+    del keys
+    keep[order[first]] = True
+    return keep, int(np.count_nonzero(first))
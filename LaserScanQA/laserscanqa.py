@@ -4,12 +4,64 @@ laserscanqa - a simple python framework for laser scan quality assessment
 """
 
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 import json
+import os
+import queue
+import tempfile
+import threading
 import time
-from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 
+from change_detection import ScanChange, detect_changes
+from deduplication import duplicate_mask, unique_count
+from local_geometry import (local_noise_statistics, neighbour_properties, plane_residuals,
+                            residual_statistics, surface_properties)
+from metric_engine import CloudContext, MetricEngine, MetricPlugin
+from octree import Octree
+from outlier_filter import outlier_mask
+from point_attributes import AttributeStatistics, iter_attribute_chunks, read_attributes
+from metrics_history import MetricsHistory
+from point_storage import PRECISIONS, CompactPoints, load_compact_points
+from pointcloud_io import READERS, SUPPORTED_EXTENSIONS, iter_point_chunks
+from profiling import ProfileHook, StageProfiler
+from reference_registry import ReferenceRegistry
+from report_store import ReportStore
+from result_cache import ResultCache
+from sampling import mean_interval, median_interval, sample_rows
+from spatial_index import VoxelHashIndex
+from streaming import ResidualHistogram, RunningMoments
+from tiling import TilePartition, tile_grid
+from voxel_grid import VoxelGrid, unpack_voxel_keys
+from watch_folder import Checkpoint, StabilityTracker, list_scans
+
+#version of the metric definitions; bump it whenever a metric changes so cached results are recomputed
+METRICS_VERSION = '2'
+#config keys that change metric values or report contents; only these (and keys the
+#defaults do not know, such as settings of custom metrics) go into cache keys
+RESULT_CONFIG_KEYS = frozenset({
+    'density_threshold', 'noise_threshold', 'noise_method', 'local_noise_threshold',
+    'noise_neighbors', 'voxel_size', 'completeness_min_fill', 'completeness_max_gap',
+    'completeness_threshold', 'max_processing_time', 'precision', 'quantization_scale',
+    'streaming', 'stream_chunk_rows', 'approximate', 'sample_size', 'sampling_method',
+    'sample_seed', 'confidence', 'escalate', 'roughness', 'roughness_threshold',
+    'attributes', 'attribute_columns', 'low_intensity', 'max_low_return_ratio',
+    'deduplicate', 'duplicate_tolerance', 'outlier_filter', 'outlier_neighbors',
+    'outlier_std_ratio', 'outlier_radius', 'outlier_min_neighbors', 'tile_size', 'tile_halo',
+    'region_search', 'region_min_size'
+})
+#number of lowest-quality tiles listed in a tile map
+WEAKEST_TILES = 5
+#number of under-covered octree regions listed in a report
+WEAKEST_REGIONS = 10
+#metrics registered by the framework itself; any other registered metric is custom
+BUILTIN_METRICS = ('density', 'noise_level', 'completeness', 'geometric_accuracy')
+#built-in metrics computed only when enabled in the config
+OPTIONAL_METRICS = ('roughness',)
+
 @dataclass
 class ScanMetrics:
     """data class to store scan quality metrics"""
@@ -20,52 +72,181 @@ class ScanMetrics:
     geometric_accuracy: float
     timestamp: float
     processing_time: float
+    noise_statistics: Dict[str, float] = field(default_factory=dict)
+    profile: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    tiles: Dict = field(default_factory=dict)
+    sampling: Dict = field(default_factory=dict)
+    custom_metrics: Dict[str, float] = field(default_factory=dict)
+    outliers: Dict = field(default_factory=dict)
+    duplicates: Dict = field(default_factory=dict)
+    attributes: Dict = field(default_factory=dict)
+    regions: Dict = field(default_factory=dict)
+    roughness: Dict[str, float] = field(default_factory=dict)
 
 class LaserScanQA:
     """
     a simple framework for laser scan quality assessment
     """
     
-    def __init__(self, config: Optional[Dict] = None):
+    def __init__(self, config: Optional[Dict] = None,
+                 profile_hook: Optional[ProfileHook] = None):
         """
         initialize the laserscanqa framework
         
         Args:
             config: optional configuration dictionary
+            profile_hook: optional callback (stage, seconds, peak_bytes) called after
+                every profiled stage, e.g. to export timings to a metrics pipeline
         """
         #use provided config or default config if none provided
         self.config = config or self._default_config()
-        #initialize empty list to store metrics history
-        self.metrics_history = []
+        #bounded columnar store of past metrics for aggregate queries
+        self.metrics_history = MetricsHistory(self.config.get('history_size', 100_000), ScanMetrics)
+        #callback receiving every stage measurement
+        self.profile_hook = profile_hook
+        #optional on-disk result cache used by batch processing
+        self.cache = None
+        if self.config.get('cache_dir'):
+            self.cache = ResultCache(self.config['cache_dir'],
+                                     self.config.get('cache_max_bytes', 256 * 1024 * 1024))
+        #reference indexes built once and reused by every scan compared against the same reference
+        self.references = ReferenceRegistry(self.config.get('reference_cache_bytes', 1024 * 1024 * 1024),
+                                            self.config.get('reference_index_dir'))
+        #metric plugins sharing one fused pass over each cloud; custom metrics register here too
+        self.metric_engine = MetricEngine()
+        self._register_builtin_metrics()
+        #consolidated report file of the batch in progress (None writes one file per scan)
+        self._report_store = None
+        #directory report names are taken relative to (None uses the file name)
+        self._report_root = None
         
     def _default_config(self) -> Dict:
         """return default configuration for quality assessment"""
         return {
             'density_threshold': 1000,  #minimum points per cubic meter required
-            'noise_threshold': 0.05,    #maximum acceptable noise level
+            'noise_threshold': 0.05,    #maximum acceptable 0-1 centroid spread (noise_method 'centroid')
+            'noise_method': 'centroid',  #'centroid' spread or 'local' plane-fit residuals for surface scans
+            'local_noise_threshold': 0.01,  #maximum median plane residual in point cloud units (noise_method 'local')
+            'noise_neighbors': 10,      #neighbours per local plane fit
+            'noise_chunk_size': 65536,  #points per block in the local noise engine
+            'voxel_size': 0.25,         #voxel edge length for occupancy-based completeness
+            'completeness_min_fill': 0.5,  #share of the density_threshold points a voxel needs to count as covered
+            'completeness_max_gap': 2,  #empty voxels between occupied ones counted as a hole without a reference
+            'precision': 'float64',     #'float64', 'float32' or 'int32' quantized point storage
+            'quantization_scale': 0.001,  #size of one int32 step in point cloud units
+            'streaming': False,         #assess files chunk by chunk in batch_process
+            'stream_chunk_rows': 1_000_000,  #points per chunk in streaming assessment
+            'cache_dir': None,          #directory of the batch result cache (None disables it)
+            'cache_max_bytes': 256 * 1024 * 1024,  #cache size before least recently used entries go
+            'profile_memory': True,     #trace peak memory of every stage with tracemalloc
+            'history_size': 100_000,    #most recent scans kept in metrics_history
+            'pipelined': False,         #overlap loading, computing and report writing in batch_process
+            'prefetch_depth': 2,        #files loaded ahead of the one being assessed when pipelined
+            'approximate': False,       #estimate neighbour-based metrics from a sample
+            'sample_size': 200_000,     #points sampled in approximate mode
+            'sampling_method': 'uniform',  #'uniform' or 'voxel' stratified sampling
+            'sample_seed': 0,           #seed of the approximate-mode sample
+            'confidence': 0.95,         #confidence level of approximate-mode intervals
+            'escalate': True,           #recompute exactly when an interval straddles a threshold
+            'roughness': False,         #per-point roughness and curvature from the noise neighbourhoods
+            'roughness_threshold': None,  #maximum median roughness for a PASS (None reports no status)
+            'attributes': (),           #per-point attributes loaded with each scan, e.g. ('intensity', 'return_number')
+            'attribute_columns': None,  #attribute column indices in header-less csv and plain npy files (None: intensity 3, return_number 4)
+            'low_intensity': 1000,      #raw intensity below which a return counts as low
+            'max_low_return_ratio': None,  #largest share of low-intensity returns for a PASS (None reports no status)
+            'deduplicate': None,        #'report' measures the duplicate ratio, 'remove' also assesses the unique points
+            'duplicate_tolerance': 0.001,  #points closer than this cell edge count as duplicates
+            'outlier_filter': None,     #'statistical', 'radius' or 'both' drops isolated points first
+            'outlier_neighbors': 8,     #neighbours averaged by statistical outlier removal
+            'outlier_std_ratio': 2.0,   #standard deviations above the mean neighbour distance allowed
+            'outlier_radius': 0.1,      #search radius of radius outlier removal
+            'outlier_min_neighbors': 3,  #neighbours required within outlier_radius
+            'tile_size': None,          #xy tile edge for a per-tile quality map (None disables it)
+            'tile_halo': 0.25,          #neighbouring points within this margin feed tile edge queries
+            'tile_workers': 1,          #worker processes for tiles (None uses every core)
+            'region_search': False,     #coarse-to-fine octree search for under-covered regions
+            'region_min_size': 2.0,     #edge of the smallest region the search refines down to
+            'reference_cache_bytes': 1024 * 1024 * 1024,  #reference indexes kept in memory across scans
+            'reference_index_dir': None,  #directory where reference indexes are saved and memory-mapped
+            'report_format': 'json',    #'json' file per scan or 'jsonl' consolidated batch file
+            'report_file': 'reports.jsonl',  #name of the consolidated file in the output directory
+            'watch_poll_seconds': 2.0,  #interval between directory listings in watch_folder
+            'watch_settle_seconds': 5.0,  #time a file must stay unchanged before watch_folder assesses it
+            'change_voxel_size': None,  #voxel edge of change detection between scans (None uses voxel_size)
+            'change_threshold': None,   #distance a point must move to count as changed (None uses the voxel edge)
+            'max_change_volume': None,  #largest changed volume for a PASS (None reports no status)
             'completeness_threshold': 0.9,  #minimum completeness ratio needed
             'max_processing_time': 30.0  #maximum processing time in seconds
         }
     
+    def _register_builtin_metrics(self):
+        """register the four core metrics with the intermediates each of them reads"""
+        engine = self.metric_engine
+        engine.register_intermediate('sample', self._sample_intermediate, ('voxel_grid',), stage='sampling')
+        engine.register_intermediate('surface_properties', self._surface_intermediate, stage='surface')
+        engine.register('density', self._density_metric, ('bbox',))
+        engine.register('noise_level', self._noise_metric, self._noise_requirements, stage='noise')
+        engine.register('completeness', self._completeness_metric, ('voxel_grid',))
+        engine.register('geometric_accuracy', self._accuracy_metric, self._accuracy_requirements,
+                        stage='accuracy')
+        engine.register('roughness', self._roughness_metric, self._roughness_requirements)
+    
+    def register_metric(self, name: str, compute, requires=(), stage: Optional[str] = None,
+                        version: str = '1') -> MetricPlugin:
+        """
+        add a custom metric computed by run_quality_assessment next to the core ones
+        
+        the metric reads shared intermediates from its context, e.g. context['bbox'],
+        context['moments'] or context['voxel_grid'], which are computed in the same
+        single pass as those of the core metrics. values are stored in
+        scanmetrics.custom_metrics and reported under detailed_metrics.
+        
+        Args:
+            name: metric name
+            compute: function of a cloudcontext returning the value; use a module-level
+                function so batch worker processes can receive it
+            requires: intermediates it reads, or a function of the context returning them
+            stage: profiler stage name (if None, the metric name)
+            version: bump it whenever the metric changes so cached results are recomputed
+            
+        Returns:
+            the registered plugin
+        """
+        if name in BUILTIN_METRICS + OPTIONAL_METRICS:
+            raise ValueError(f"cannot replace core metric: {name}")
+        return self.metric_engine.register(name, compute, requires, stage, version, replace=True)
+    
+    def custom_metrics(self) -> List[MetricPlugin]:
+        """registered custom metric plugins"""
+        return [plugin for name, plugin in self.metric_engine.metrics.items()
+                if name not in BUILTIN_METRICS + OPTIONAL_METRICS]
+    
     def load_point_cloud(self, file_path: str) -> Optional[np.ndarray]:
         """
         load point cloud data from file
         
         Args:
-            file_path: path to point cloud file
+            file_path: path to point cloud file (.csv, .npy, binary .ply or uncompressed .las)
             
         Returns:
-            numpy array of points (N, 3) or None if loading failed
+            numpy array of points (N, 3), compactpoints when the config precision is
+            'float32' or 'int32', or None if loading failed
         """
         try:
-            #check if file is csv format
-            if file_path.endswith('.csv'):
-                #try to load without header first
-                try:
-                    points = np.loadtxt(file_path, delimiter=',')
-                except ValueError:
-                    #if header exists, skip the first row
-                    points = np.loadtxt(file_path, delimiter=',', skiprows=1)
+            #reduced precisions are converted chunk by chunk while reading
+            precision = self.config.get('precision', 'float64')
+            if precision not in PRECISIONS:
+                print(f"unknown precision: {precision}")
+                return None
+            if precision != 'float64' and Path(file_path).suffix.lower() in READERS:
+                return load_compact_points(file_path, precision,
+                                           self.config.get('quantization_scale', 0.001))
+            
+            #pick the reader from the file extension
+            reader = READERS.get(Path(file_path).suffix.lower())
+            if reader is not None:
+                #csv is parsed in blocks into one array, binary formats are memory-mapped
+                points = reader(file_path)
                 return points
             else:
                 #print error for unsupported file formats
@@ -76,12 +257,13 @@ class LaserScanQA:
             print(f"error loading point cloud: {e}")
             return None
     
-    def calculate_density(self, points: np.ndarray) -> float:
+    def calculate_density(self, points: np.ndarray, grid: Optional[VoxelGrid] = None) -> float:
         """
         calculate point density of the scan
         
         Args:
             points: point cloud data (N, 3)
+            grid: prebuilt voxel grid of points (its bounding box is reused)
             
         Returns:
             point density (points per cubic meter)
@@ -89,11 +271,20 @@ class LaserScanQA:
         #check if points array is empty
         if len(points) == 0:
             return 0.0
+        
+        #the voxel grid already tracked the bounding box
+        if grid is not None:
+            return self._density_from_bounds(grid.point_count, grid.mins, grid.maxs)
             
         #calculate minimum coordinates of bounding box
         min_coords = np.min(points, axis=0)
         #calculate maximum coordinates of bounding box
         max_coords = np.max(points, axis=0)
+        return self._density_from_bounds(len(points), min_coords, max_coords)
+    
+    def _density_from_bounds(self, count: int, min_coords: np.ndarray,
+                             max_coords: np.ndarray) -> float:
+        """points per cubic meter of the axis-aligned bounding box"""
         #calculate volume of bounding box
         volume = np.prod(max_coords - min_coords)
         
@@ -102,25 +293,59 @@ class LaserScanQA:
             return float('inf')
             
         #return density as points count divided by volume
-        return len(points) / volume
+        return count / volume
     
-    def estimate_noise_level(self, points: np.ndarray, k: int = 5) -> float:
+    def estimate_noise_level(self, points: np.ndarray, k: Optional[int] = None) -> float:
         """
         estimate noise level in the point cloud using numpy only
         
         Args:
             points: point cloud data (N, 3)
-            k: number of neighbors to consider (not used in this implementation)
+            k: number of neighbors per local plane fit (if None, use config)
             
         Returns:
-            estimated noise level (0-1)
+            estimated noise level (0-1 centroid spread, or the median local plane
+            residual in point cloud units when noise_method is 'local')
         """
+        #use config neighbour count if k not provided
+        if k is None:
+            k = self.config.get('noise_neighbors', 10)
+            
         #check if there are enough points for noise estimation
         if len(points) < k + 1:
             return 0.0
             
+        #spread around the centroid unless local plane fits were asked for
+        if self.config.get('noise_method', 'centroid') == 'centroid':
+            return self._centroid_spread(points)
+        
+        #noise level is the typical distance of a point's neighbourhood to its plane
+        return self.estimate_local_noise(points, k)['median']
+    
+    def estimate_local_noise(self, points: np.ndarray, k: Optional[int] = None) -> Dict[str, float]:
+        """
+        estimate local sensor noise from plane fits to each point's k neighbours
+        
+        Args:
+            points: point cloud data (N, 3)
+            k: number of neighbors per local plane fit (if None, use config)
+            
+        Returns:
+            dictionary with mean, median, p95 and rms plane residual
+        """
+        #use config neighbour count if k not provided
+        if k is None:
+            k = self.config.get('noise_neighbors', 10)
+        #not enough points to fit a plane through a neighbourhood
+        if len(points) < max(k + 1, 4):
+            return {'mean': 0.0, 'median': 0.0, 'p95': 0.0, 'rms': 0.0, 'k': int(k)}
+        return local_noise_statistics(points, k, self.config.get('noise_chunk_size', 65536))
+    
+    def _centroid_spread(self, points: np.ndarray, centroid: Optional[np.ndarray] = None) -> float:
+        """mean distance to the centroid (if None, computed here) normalized by the largest distance (0-1)"""
         #calculate centroid of all points
-        centroid = np.mean(points, axis=0)
+        if centroid is None:
+            centroid = np.mean(points, axis=0)
         #calculate distances from each point to centroid
         distances = np.linalg.norm(points - centroid, axis=1)
         
@@ -135,13 +360,23 @@ class LaserScanQA:
         return min(noise_level, 1.0)
     
     def check_completeness(self, points: np.ndarray, 
-                          expected_density: Optional[float] = None) -> float:
+                          expected_density: Optional[float] = None,
+                          reference_points: Optional[np.ndarray] = None,
+                          grid: Optional[VoxelGrid] = None) -> float:
         """
-        check scan completeness based on expected density
+        check scan completeness as voxel coverage of the expected surface
+        
+        a voxel of the expected surface is covered when it holds at least
+        completeness_min_fill of the points expected_density puts in it;
+        completeness is the fraction of covered voxels. the expected surface is
+        the reference cloud when given, otherwise the voxels the scan occupies
+        plus the short empty runs between them (see VoxelGrid.enclosed_gaps).
         
         Args:
             points: point cloud data (N, 3)
             expected_density: expected point density (if None, use config)
+            reference_points: optional reference point cloud describing the expected surface
+            grid: prebuilt voxel grid of points (if None, one is built)
             
         Returns:
             completeness ratio (0-1)
@@ -150,95 +385,1161 @@ class LaserScanQA:
         if expected_density is None:
             expected_density = self.config['density_threshold']
             
-        #calculate actual density of the point cloud
-        actual_density = self.calculate_density(points)
-        
         #avoid division by zero
-        if expected_density == 0:
+        if expected_density == 0 or len(points) == 0:
             return 0.0
+        
+        #occupancy of the scan and, when available, of the reference in the same frame
+        if grid is None:
+            grid = self.build_voxel_grid(points)
+        expected = None
+        if reference_points is not None and len(reference_points) > 0:
+            expected = VoxelGrid.from_points(reference_points, grid.voxel_size, grid.origin)
+        
+        return self._voxel_coverage(grid, expected, expected_density)
+    
+    def _voxel_coverage(self, grid: VoxelGrid, expected: Optional[VoxelGrid] = None,
+                        expected_density: Optional[float] = None) -> float:
+        """fraction of the expected surface's voxels the grid covers, with the config fill and gap limits"""
+        if expected_density is None:
+            expected_density = self.config['density_threshold']
+        min_count = self.config.get('completeness_min_fill', 0.5) * expected_density * grid.voxel_volume
+        return grid.coverage(min_count, expected, self.config.get('completeness_max_gap', 2))
+    
+    def filter_outliers(self, points: np.ndarray,
+                        method: Optional[str] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        remove isolated points before assessment
+        
+        Args:
+            points: point cloud data (N, 3)
+            method: 'statistical', 'radius' or 'both' (if None, use config)
             
-        #calculate completeness ratio (capped at 1.0)
-        completeness = min(actual_density / expected_density, 1.0)
-        return completeness
+        Returns:
+            tuple of the kept points and a summary with the method, the input point
+            count, the number of points removed and the count each test removed
+        """
+        method = method or self.config.get('outlier_filter') or 'statistical'
+        keep, removed = self._outlier_mask(points, method)
+        kept = int(np.count_nonzero(keep))
+        summary = dict({'method': method, 'input_points': len(points), 'removed': len(points) - kept},
+                       **removed)
+        if kept == len(points):
+            return points, summary
+        return points[keep], summary
+    
+    def _outlier_mask(self, points: np.ndarray, method: Optional[str] = None) -> Tuple[np.ndarray, Dict[str, int]]:
+        """keep mask and per-test removal counts with the configured outlier parameters"""
+        return outlier_mask(points, method or self.config.get('outlier_filter') or 'statistical',
+                            self.config.get('outlier_neighbors', 8),
+                            self.config.get('outlier_std_ratio', 2.0),
+                            self.config.get('outlier_radius', 0.1),
+                            self.config.get('outlier_min_neighbors', 3),
+                            self.config.get('noise_chunk_size', 65536))
+    
+    def load_attributes(self, file_path: str,
+                        names: Optional[List[str]] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        load typed per-point attributes of a point cloud file
+        
+        only the requested columns are read; coordinates and other attributes
+        are never materialized.
+        
+        Args:
+            file_path: path to point cloud file
+            names: attributes to load, e.g. ['intensity', 'rgb'] (if None, use config)
+            
+        Returns:
+            dictionary from attribute name to uint16 intensity or uint8 arrays (rgb is
+            (N, 3)) holding the attributes the file has, or None if loading failed
+        """
+        names = self.config.get('attributes', ()) if names is None else names
+        try:
+            return read_attributes(file_path, names, self.config.get('attribute_columns'))
+        except Exception as e:
+            print(f"error loading attributes: {e}")
+            return None
+    
+    def attribute_statistics(self, attributes: Dict[str, np.ndarray]) -> Dict:
+        """
+        intensity, return and colour statistics of typed attributes
+        
+        Args:
+            attributes: dictionary from attribute name to typed array
+            
+        Returns:
+            summary with the low-return ratio (share of returns below low_intensity)
+        """
+        statistics = AttributeStatistics()
+        statistics.update(attributes)
+        return statistics.summary(self.config.get('low_intensity', 1000))
+    
+    def deduplicate(self, points: np.ndarray, tolerance: Optional[float] = None,
+                    remove: bool = True) -> Tuple[np.ndarray, Dict]:
+        """
+        find duplicate and near-duplicate points from overlapping scan stations
+        
+        points are quantized to tolerance-sized cells packed into 64-bit keys and
+        sorted once; every point after the first in its cell is a duplicate.
+        
+        Args:
+            points: point cloud data (N, 3)
+            tolerance: cell edge length (if None, use config)
+            remove: return only the unique points (False returns points unchanged)
+            
+        Returns:
+            tuple of the (deduplicated) points and a summary with the tolerance, the
+            input point count, the number of duplicates and the duplicate ratio
+        """
+        tolerance = tolerance or self.config.get('duplicate_tolerance', 0.001)
+        if not remove:
+            #counting needs no mask, so a plain sort of the keys is enough
+            unique = unique_count(points, tolerance)
+        else:
+            keep, unique = duplicate_mask(points, tolerance)
+        summary = {
+            'tolerance': tolerance,
+            'input_points': len(points),
+            'duplicates': len(points) - unique,
+            'duplicate_ratio': (len(points) - unique) / len(points) if len(points) else 0.0,
+            'action': 'removed' if remove else 'reported',
+            'scope': 'cloud'
+        }
+        if not remove or unique == len(points):
+            return points, summary
+        return points[keep], summary
+    
+    def build_voxel_grid(self, points: np.ndarray) -> VoxelGrid:
+        """
+        build the sparse voxel occupancy grid shared by density and completeness
+        
+        Args:
+            points: point cloud data (N, 3)
+            
+        Returns:
+            voxel grid with config voxel_size
+        """
+        return VoxelGrid.from_points(points, self.config.get('voxel_size', 0.25))
     
     def assess_geometric_accuracy(self, points: np.ndarray, 
-                                 reference_points: Optional[np.ndarray] = None) -> float:
+                                 reference_points: Optional[np.ndarray] = None,
+                                 offset: Optional[np.ndarray] = None) -> float:
         """
         assess geometric accuracy of the scan using numpy only
         
         Args:
             points: point cloud data to assess
             reference_points: reference point cloud (if available)
+            offset: reference-frame position of the points' coordinate zero, for
+                points stored as offsets from a scan origin
             
         Returns:
             geometric accuracy score (0-1)
         """
         #if no reference points provided, use distribution-based method
         if reference_points is None or len(reference_points) == 0:
-            #calculate bounding box volume
-            bbox_volume = np.prod(np.ptp(points, axis=0))
-            #return default accuracy for very small volumes
-            if bbox_volume < 1e-10:
-                return 0.5
-                
-            #calculate standard deviation of points
-            std_dev = np.std(points, axis=0)
-            #calculate uniformity based on standard deviation
-            uniformity = 1.0 / (1.0 + np.mean(std_dev))
-            #return accuracy score (capped at 1.0)
-            return min(uniformity * 1.5, 1.0)
-        
-        #with reference points, calculate distance-based accuracy
-        min_distances = []
-        #calculate minimum distance for each point to reference points
-        for point in points:
-            distances = np.linalg.norm(reference_points - point, axis=1)
-            min_distances.append(np.min(distances))
+            #calculate bounding box volume and standard deviation of points
+            return self._uniformity_score(np.ptp(points, axis=0), np.std(points, axis=0))
+        
+        #with reference points, reuse the reference index and query all points in batches
+        index = self.reference_index(reference_points)
+        min_distances = index.nearest_distances(points, offset=offset)
         
         #calculate mean error distance
-        mean_error = np.mean(min_distances)
+        return self._accuracy_from_error(np.mean(min_distances))
+    
+    def reference_index(self, reference_points: np.ndarray) -> VoxelHashIndex:
+        """
+        nearest neighbour index of a reference cloud, shared across scans
         
-        #convert error to accuracy score (0-1)
+        Args:
+            reference_points: reference point cloud (M, 3) in world coordinates
+            
+        Returns:
+            index from the reference registry, built on first use
+        """
+        return self.references.index(reference_points)
+    
+    def detect_changes(self, points, previous_points,
+                       voxel_size: Optional[float] = None,
+                       threshold: Optional[float] = None) -> ScanChange:
+        """
+        compare a scan with an earlier scan of the same asset
+        
+        Args:
+            points: current scan (N, 3) or compactpoints
+            previous_points: earlier scan (M, 3) or compactpoints
+            voxel_size: change map resolution (if None, use config)
+            threshold: distance a point must move to count as changed (if None, use config)
+            
+        Returns:
+            scanchange whose added_mask flags current points and removed_mask previous
+            points; its origin is in world coordinates
+        """
+        voxel_size = voxel_size or self.config.get('change_voxel_size') or self.config.get('voxel_size', 0.25)
+        if threshold is None:
+            threshold = self.config.get('change_threshold')
+        
+        #bring both scans into the working frame of the current one
+        offset = self._frame_offset(points)
+        if isinstance(previous_points, CompactPoints):
+            previous_points = previous_points.world()
+        points, previous_points = self._working_coordinates(points, previous_points)
+        
+        change = detect_changes(previous_points, points, voxel_size, threshold)
+        if offset is not None:
+            change.origin = change.origin + offset
+        return change
+    
+    def compare_scans(self, file_path: str, previous_file_path: str,
+                      output_path: Optional[str] = None) -> Optional[Dict]:
+        """
+        load two scans of the same asset and report what changed between them
+        
+        Args:
+            file_path: current scan file
+            previous_file_path: earlier scan file
+            output_path: json file the change report is saved to (None does not save it)
+            
+        Returns:
+            change report dictionary, or None if a file could not be loaded
+        """
+        points = self.load_point_cloud(file_path)
+        previous_points = self.load_point_cloud(previous_file_path)
+        if points is None or previous_points is None:
+            return None
+        
+        start_time = time.time()
+        change = self.detect_changes(points, previous_points)
+        summary = change.summary()
+        report = {
+            'scan': file_path,
+            'previous_scan': previous_file_path,
+            'point_count': len(points),
+            'previous_point_count': len(previous_points),
+            'change': summary,
+            'processing_time': time.time() - start_time,
+            'timestamp': time.time()
+        }
+        #judge the total changed volume when a limit is set
+        limit = self.config.get('max_change_volume')
+        if limit is not None:
+            report['change']['status'] = 'PASS' if summary['change_volume'] <= limit else 'FAIL'
+            report['change']['threshold'] = limit
+        
+        if output_path is not None:
+            self.save_report(report, output_path)
+        return report
+    
+    def _uniformity_score(self, extent: np.ndarray, std_dev: np.ndarray) -> float:
+        """distribution-based accuracy from bounding box extent and per-axis std"""
+        #return default accuracy for very small volumes
+        if np.prod(extent) < 1e-10:
+            return 0.5
+            
+        #calculate uniformity based on standard deviation
+        uniformity = 1.0 / (1.0 + np.mean(std_dev))
+        #return accuracy score (capped at 1.0)
+        return min(uniformity * 1.5, 1.0)
+    
+    def _accuracy_from_error(self, mean_error: float) -> float:
+        """convert a mean nearest-reference distance to an accuracy score (0-1)"""
         accuracy = max(0, 1 - (mean_error / 0.1))  #assuming 0.1m is high error
         return accuracy
     
     def run_quality_assessment(self, points: np.ndarray, 
-                              reference_points: Optional[np.ndarray] = None) -> ScanMetrics:
+                              reference_points: Optional[np.ndarray] = None,
+                              profiler: Optional[StageProfiler] = None,
+                              approximate: Optional[bool] = None,
+                              attributes: Optional[Dict[str, np.ndarray]] = None) -> ScanMetrics:
         """
         run comprehensive quality assessment on point cloud
         
+        in approximate mode, clouds larger than sample_size get local noise and
+        reference accuracy estimated from a seeded sample (neighbours still come
+        from the whole cloud) with confidence intervals; density and completeness
+        come from the exact voxel pass, which is cheap next to neighbourhood fits.
+        
+        metrics run as plugins of the metric engine: bounding box, moments and
+        voxel grid are computed once in a fused pass and shared by the core
+        metrics and those added with register_metric.
+        
         Args:
             points: point cloud data to assess
             reference_points: optional reference point cloud for comparison
+            profiler: profiler that already holds earlier stages such as loading
+                (if None, a new one is created)
+            approximate: estimate from a sample (if None, use config)
+            attributes: typed per-point attributes of the points, as returned by
+                load_attributes; their statistics cover every given point
             
         Returns:
             scanmetrics object with quality assessment results
         """
         #start timing the processing
-        start_time = time.time()
+        start_time = time.perf_counter()
+        if profiler is None:
+            profiler = self.create_profiler()
         
         #check if points are valid
         if points is None or len(points) == 0:
             raise ValueError("empty or invalid point cloud data")
+        offset = self._frame_offset(points)
+        #the reference index stays in world coordinates so other scans can reuse it
+        world_reference = reference_points
+        points, reference_points = self._working_coordinates(points, reference_points)
+        
+        #intensity and return statistics are taken before any point is filtered out
+        attribute_statistics = {}
+        if attributes:
+            with profiler.stage('attributes'):
+                attribute_statistics = self.attribute_statistics(attributes)
+        
+        #points seen from several stations would inflate point count and density
+        duplicates = {}
+        if self.config.get('deduplicate'):
+            with profiler.stage('deduplicate'):
+                points, duplicates = self.deduplicate(points, remove=self.config['deduplicate'] == 'remove')
+        
+        #flying pixels would inflate the bounding box and every spread-based score
+        outliers = {}
+        if self.config.get('outlier_filter'):
+            with profiler.stage('outlier_filter'):
+                points, outliers = self.filter_outliers(points)
+        
+        #neighbour-based metrics are estimated from a sample once the cloud outgrows it
+        if approximate is None:
+            approximate = self.config.get('approximate', False)
+        sampled = bool(approximate) and len(points) > self.config.get('sample_size', 200_000)
+        
+        #every metric reads its intermediates from one context, so bounding box,
+        #moments and voxel grid are computed once in a single pass
+        context = self.metric_engine.context(points, reference_points, profiler,
+                                             self.config.get('voxel_size', 0.25),
+                                             offset=offset, world_reference=world_reference,
+                                             sampled=sampled)
+        context.details.update(intervals={}, escalated=[], noise_statistics={})
+        names = [name for name in self.metric_engine.metrics
+                 if name not in OPTIONAL_METRICS or self.config.get(name, False)]
+        values = self.metric_engine.run(context, names)
+        density, noise_level, completeness, accuracy = (values.pop(name) for name in BUILTIN_METRICS)
+        for name in OPTIONAL_METRICS:
+            values.pop(name, None)
+        noise_statistics = context.details['noise_statistics']
+        
+        #exactly computed metrics get zero-width intervals
+        sampling = {}
+        if sampled:
+            intervals = context.details['intervals']
+            exact = {'density': density, 'noise_level': noise_level,
+                     'completeness': completeness, 'geometric_accuracy': accuracy}
+            for name, value in exact.items():
+                intervals.setdefault(name, [float(value), float(value)])
+            sampling = {
+                'method': self.config.get('sampling_method', 'uniform'),
+                'sample_size': self.config.get('sample_size', 200_000),
+                'seed': self.config.get('sample_seed', 0),
+                'confidence': self.config.get('confidence', 0.95),
+                'intervals': intervals,
+                'escalated': context.details['escalated']
+            }
+        
+        #per-region map so weak corners are not hidden by the global score
+        tiles = {}
+        if self.config.get('tile_size'):
+            with profiler.stage('tiles'):
+                tiles = self._assess_tiles(points, reference_points, offset)
+        
+        #under-covered regions, searched coarse to fine in the octree
+        regions = {}
+        if self.config.get('region_search'):
+            with profiler.stage('regions'):
+                regions = self.find_weak_regions(Octree(points, self.config.get('voxel_size', 0.25), offset))
         
         #create scanmetrics object with all calculated metrics
         metrics = ScanMetrics(
             point_count=len(points),
-            density=self.calculate_density(points),
-            noise_level=self.estimate_noise_level(points),
-            completeness=self.check_completeness(points),
-            geometric_accuracy=self.assess_geometric_accuracy(points, reference_points),
+            density=float(density),
+            noise_level=float(noise_level),
+            completeness=float(completeness),
+            geometric_accuracy=float(accuracy),
             timestamp=time.time(),
-            processing_time=0.0
+            processing_time=0.0,
+            noise_statistics=noise_statistics,
+            profile=profiler.profile(),
+            tiles=tiles,
+            sampling=sampling,
+            custom_metrics=values,
+            outliers=outliers,
+            duplicates=duplicates,
+            attributes=attribute_statistics,
+            regions=regions,
+            roughness=context.details.get('roughness', {})
         )
         
         #calculate actual processing time
-        metrics.processing_time = time.time() - start_time
+        metrics.processing_time = time.perf_counter() - start_time
         #add metrics to history
         self.metrics_history.append(metrics)
         
         return metrics
     
+    def _density_metric(self, context: CloudContext) -> float:
+        """density plugin: points per cubic meter of the shared bounding box"""
+        if len(context.points) == 0:
+            return 0.0
+        return self._density_from_bounds(len(context.points), *context['bbox'])
+    
+    def _sample_requirement(self, context: CloudContext) -> Tuple[str, ...]:
+        """the sample is only needed in approximate mode"""
+        return ('sample',) if context.inputs.get('sampled') else ()
+    
+    def _noise_requirements(self, context: CloudContext) -> Tuple[str, ...]:
+        """shared centroid for centroid noise; sample or shared surface pass for local noise"""
+        if self.config.get('noise_method', 'centroid') != 'local':
+            return ('centroid',)
+        if context.inputs.get('sampled'):
+            return ('sample',)
+        if self._shares_surface_pass(context):
+            return ('surface_properties',)
+        return ()
+    
+    def _shares_surface_pass(self, context: CloudContext) -> bool:
+        """whether local noise can reuse the residuals of the roughness pass"""
+        k = self.config.get('noise_neighbors', 10)
+        return (self.config.get('roughness', False) and self.config.get('noise_method', 'centroid') == 'local'
+                and not context.inputs.get('sampled') and len(context.points) >= max(k + 1, 4))
+    
+    def _noise_metric(self, context: CloudContext) -> float:
+        """noise plugin; local residual statistics go to context.details['noise_statistics']"""
+        if self.config.get('noise_method', 'centroid') != 'local':
+            if len(context.points) < self.config.get('noise_neighbors', 10) + 1:
+                return 0.0
+            #the centroid is the mean of the shared moments pass
+            return self._centroid_spread(context.points, context['centroid'].astype(context.points.dtype, copy=False))
+        if context.inputs.get('sampled'):
+            rows, index = context['sample']
+            statistics = self._sampled_noise(context.points, rows, index, context.details['intervals'],
+                                             context.details['escalated'])
+        elif self._shares_surface_pass(context):
+            statistics = residual_statistics(context['surface_properties']['residuals'],
+                                             self.config.get('noise_neighbors', 10))
+        else:
+            statistics = self.estimate_local_noise(context.points)
+        context.details['noise_statistics'] = statistics
+        return statistics['median']
+    
+    def _completeness_metric(self, context: CloudContext) -> float:
+        """completeness plugin on the shared voxel grid"""
+        return self.check_completeness(context.points, reference_points=context.reference_points,
+                                       grid=context['voxel_grid'])
+    
+    def _accuracy_requirements(self, context: CloudContext) -> Tuple[str, ...]:
+        """the uniformity score reads bounding box and moments; the reference distance the sample"""
+        if not context.has_reference:
+            return ('bbox', 'moments')
+        return self._sample_requirement(context)
+    
+    def _accuracy_metric(self, context: CloudContext) -> float:
+        """accuracy plugin against the world reference, or from the shared moments without one"""
+        if not context.has_reference:
+            mins, maxs = context['bbox']
+            return self._uniformity_score(maxs - mins, context['moments'].std)
+        offset = context.inputs.get('offset')
+        reference_points = context.inputs.get('world_reference', context.reference_points)
+        if context.inputs.get('sampled'):
+            return self._sampled_accuracy(context.points, reference_points, offset, context['sample'][0],
+                                          context.details['intervals'], context.details['escalated'])
+        return self.assess_geometric_accuracy(context.points, reference_points, offset)
+    
+    def _surface_intermediate(self, context: CloudContext) -> Dict[str, np.ndarray]:
+        """residuals, curvature and roughness of every point (or of the sample in approximate mode)"""
+        rows = index = None
+        if context.inputs.get('sampled'):
+            rows, index = context['sample']
+        return surface_properties(context.points, self.config.get('noise_neighbors', 10),
+                                  self.config.get('noise_chunk_size', 65536), index, rows)
+    
+    def _roughness_requirements(self, context: CloudContext) -> Tuple[str, ...]:
+        """the surface pass, unless the cloud is too small for a neighbourhood fit"""
+        k = self.config.get('noise_neighbors', 10)
+        return ('surface_properties',) if len(context.points) >= max(k + 1, 4) else ()
+    
+    def _roughness_metric(self, context: CloudContext) -> float:
+        """roughness plugin: median point-to-plane distance; statistics go to context.details['roughness']"""
+        k = self.config.get('noise_neighbors', 10)
+        if len(context.points) < max(k + 1, 4):
+            statistics = {'mean': 0.0, 'median': 0.0, 'p95': 0.0, 'rms': 0.0, 'k': int(k),
+                          'curvature_median': 0.0, 'curvature_p95': 0.0}
+        else:
+            properties = context['surface_properties']
+            curvature = np.percentile(properties['curvature'], [50, 95])
+            statistics = dict(residual_statistics(properties['roughness'], k),
+                              curvature_median=float(curvature[0]), curvature_p95=float(curvature[1]))
+        context.details['roughness'] = statistics
+        return statistics['median']
+    
+    def _sample_intermediate(self, context: CloudContext) -> Tuple[np.ndarray, Optional[VoxelHashIndex]]:
+        """sample rows and neighbour index of approximate mode, shared by noise and accuracy"""
+        return self._draw_sample(context.points, context['voxel_grid'],
+                                 self.config.get('noise_method', 'centroid') == 'local')
+    
+    def _draw_sample(self, points: np.ndarray, grid: VoxelGrid,
+                     local_noise: bool) -> Tuple[np.ndarray, Optional[VoxelHashIndex]]:
+        """seeded sample rows and, for local noise, the neighbour index over the whole cloud"""
+        index = None
+        if local_noise:
+            k = self.config.get('noise_neighbors', 10)
+            index = VoxelHashIndex(points, target_occupancy=max(8.0, 2.0 * k))
+        method = self.config.get('sampling_method', 'uniform')
+        #voxel stratification walks the points in voxel key order
+        order = np.argsort(grid.voxel_keys(points), kind='stable') if method == 'voxel' else None
+        rows = sample_rows(len(points), self.config.get('sample_size', 200_000), method,
+                           self.config.get('sample_seed', 0), order)
+        return rows, index
+    
+    def _straddles(self, name: str, interval: Tuple[float, float]) -> bool:
+        """whether escalation is on and a metric's interval contains its pass/fail threshold"""
+        threshold = self._pass_rules()[name][1]
+        return self.config.get('escalate', True) and interval[0] <= threshold <= interval[1]
+    
+    def _sampled_noise(self, points: np.ndarray, rows: np.ndarray, index: VoxelHashIndex,
+                       intervals: Dict, escalated: List[str]) -> Dict[str, float]:
+        """local noise statistics of sampled points, recomputed exactly near the threshold"""
+        k = self.config.get('noise_neighbors', 10)
+        chunk_size = self.config.get('noise_chunk_size', 65536)
+        residuals = plane_residuals(points, k, chunk_size, index, rows)
+        interval = median_interval(residuals, self.config.get('confidence', 0.95))
+        if self._straddles('noise_level', interval):
+            escalated.append('noise_level')
+            return local_noise_statistics(points, k, chunk_size, index)
+        intervals['noise_level'] = list(interval)
+        return dict(residual_statistics(residuals, k), sample_size=len(rows))
+    
+    def _sampled_accuracy(self, points: np.ndarray, reference_points: np.ndarray,
+                          offset: Optional[np.ndarray], rows: np.ndarray,
+                          intervals: Dict, escalated: List[str]) -> float:
+        """reference accuracy of sampled points, recomputed exactly near the threshold"""
+        index = self.reference_index(reference_points)
+        mean_error, low, high = mean_interval(index.nearest_distances(points[rows], offset=offset),
+                                              self.config.get('confidence', 0.95), len(points))
+        #accuracy falls as the error grows, so the bounds swap
+        interval = (self._accuracy_from_error(high), self._accuracy_from_error(low))
+        if self._straddles('geometric_accuracy', interval):
+            escalated.append('geometric_accuracy')
+            return self._accuracy_from_error(np.mean(index.nearest_distances(points, offset=offset)))
+        intervals['geometric_accuracy'] = [float(interval[0]), float(interval[1])]
+        return self._accuracy_from_error(mean_error)
+    
+    def run_tiled_assessment(self, points: np.ndarray,
+                             reference_points: Optional[np.ndarray] = None,
+                             tile_size: Optional[float] = None,
+                             workers: Optional[int] = None) -> Dict:
+        """
+        assess density, noise, completeness and accuracy per xy tile
+        
+        the cloud is partitioned with one sort by tile key. tiles are assessed
+        one by one or across a process pool, each with the points of its
+        neighbours within tile_halo so edge neighbourhoods and nearest reference
+        points are not cut off. with a reference, tiles the reference covers but
+        the scan misses are reported with zero completeness.
+        
+        Args:
+            points: point cloud data to assess
+            reference_points: optional reference point cloud for comparison
+            tile_size: tile edge length (if None, use config, else 10 units);
+                a multiple of voxel_size keeps voxels inside one tile
+            workers: worker processes (if None, use config)
+            
+        Returns:
+            tile map: grid origin, tile_size, shape (nx, ny), one [ny][nx] grid per
+            metric with None for tiles without data, and the weakest tiles
+        """
+        offset = self._frame_offset(points)
+        points, reference_points = self._working_coordinates(points, reference_points)
+        return self._assess_tiles(points, reference_points, offset, tile_size, workers)
+    
+    def build_octree(self, points) -> Octree:
+        """
+        morton-ordered octree of a point cloud for level-of-detail metrics and region queries
+        
+        Args:
+            points: point cloud data (N, 3) or compactpoints
+            
+        Returns:
+            octree with voxel_size leaves; its crop and within queries take world
+            coordinates and return row indices of points
+        """
+        offset = self._frame_offset(points)
+        points, _ = self._working_coordinates(points, None)
+        return Octree(points, self.config.get('voxel_size', 0.25), offset)
+    
+    def find_weak_regions(self, octree: Octree) -> Dict:
+        """
+        search for under-covered regions from coarse octree levels down
+        
+        coverage is the completeness measure (share of the occupied voxels
+        holding completeness_min_fill of the expected points) taken per node;
+        holes between nodes are left to check_completeness. it starts on the eight octants; only nodes below
+        completeness_threshold are split and evaluated again, down to nodes of
+        region_min_size, so well covered parts of the scan are settled at a
+        coarse level. a small weak patch inside a region that passes as a whole
+        is not searched for.
+        
+        Args:
+            octree: octree of the points, e.g. from build_octree
+            
+        Returns:
+            dictionary with the nodes evaluated per level, the number of weak regions
+            at the finest level reached and the weakest of them
+        """
+        min_count = (self.config.get('completeness_min_fill', 0.5) *
+                     self.config['density_threshold'] * octree.leaf_size ** 3)
+        threshold = self.config['completeness_threshold']
+        #prefix sums of the covered voxels give any node's coverage from two lookups
+        leaf_counts = np.diff(np.r_[octree.leaf_starts, len(octree)])
+        filled = np.r_[0, np.cumsum(leaf_counts >= min_count)]
+        
+        min_size = self.config.get('region_min_size', 2.0)
+        stop = max((level for level in range(octree.depth + 1) if octree.node_size(level) >= min_size),
+                   default=0)
+        level = min(1, stop)
+        keys, _, _ = octree.nodes(level)
+        levels = []
+        while True:
+            starts, ends = octree.ranges(level, keys)
+            first = np.searchsorted(octree.leaf_starts, starts)
+            last = np.searchsorted(octree.leaf_starts, ends)
+            coverage = (filled[last] - filled[first]) / (last - first)
+            failing = coverage < threshold
+            levels.append({'level': level, 'node_size': octree.node_size(level),
+                           'evaluated': len(keys), 'failing': int(np.count_nonzero(failing))})
+            if level == stop or not failing.any():
+                break
+            children = (keys[failing][:, None] * 8 + np.arange(8)).ravel()
+            starts, ends = octree.ranges(level + 1, children)
+            keys = children[ends > starts]
+            level += 1
+        
+        #weakest regions first, in world coordinates
+        weak = np.flatnonzero(failing) if level == stop else np.empty(0, dtype=np.int64)
+        weak = weak[np.argsort(coverage[weak], kind='stable')][:WEAKEST_REGIONS]
+        lo, hi = octree.node_bounds(level, keys[weak])
+        return {
+            'node_size': octree.node_size(level),
+            'levels': levels,
+            'weak_region_count': int(np.count_nonzero(failing)) if level == stop else 0,
+            'weakest': [{'min': (lo[i] + octree.offset).tolist(), 'max': (hi[i] + octree.offset).tolist(),
+                         'coverage': float(coverage[j]), 'points': int(ends[j] - starts[j])}
+                        for i, j in enumerate(weak)]
+        }
+    
+    def _frame_offset(self, points) -> Optional[np.ndarray]:
+        """world position of the working coordinates' zero (None when they are world coordinates)"""
+        if isinstance(points, CompactPoints):
+            return points.origin
+        return None
+    
+    def _assess_tiles(self, points: np.ndarray, reference_points: Optional[np.ndarray],
+                      offset: Optional[np.ndarray], tile_size: Optional[float] = None,
+                      workers: Optional[int] = None) -> Dict:
+        """tile map of points in working coordinates whose zero lies at offset"""
+        offset = np.zeros(2) if offset is None else offset[:2]
+        if tile_size is None:
+            tile_size = self.config.get('tile_size') or 10.0
+        if workers is None:
+            workers = self.config.get('tile_workers', 1) or os.cpu_count() or 1
+        halo = min(self.config.get('tile_halo', 0.25), tile_size)
+        if reference_points is not None and len(reference_points) == 0:
+            reference_points = None
+        
+        #one grid over scan and reference so their tiles line up
+        origin, shape = tile_grid([points, reference_points], tile_size, offset)
+        scan = TilePartition(points, tile_size, origin, shape)
+        reference = None
+        keys = scan.keys
+        if reference_points is not None:
+            reference = TilePartition(reference_points, tile_size, origin, shape)
+            keys = np.union1d(keys, reference.keys)
+        
+        #tile points are gathered lazily so only the tiles in flight are copied
+        tasks = ((key, scan.tile_points(key), scan.halo_points(key, halo),
+                  None if reference is None else reference.tile_points(key),
+                  None if reference is None else reference.halo_points(key, halo))
+                 for key in keys.tolist())
+        if workers > 1 and len(keys) > 1:
+            results = dict(self._assess_tiles_parallel(tasks, workers))
+        else:
+            results = {task[0]: self.assess_tile(*task[1:]) for task in tasks}
+        return self._tile_map(results, scan, offset)
+    
+    def assess_tile(self, points: np.ndarray, halo_points: np.ndarray,
+                    reference_points: Optional[np.ndarray] = None,
+                    reference_halo: Optional[np.ndarray] = None) -> Dict[str, float]:
+        """
+        metrics of one tile
+        
+        Args:
+            points: scan points inside the tile
+            halo_points: scan points of neighbouring tiles near the tile edge
+            reference_points: reference points inside the tile (None without a reference)
+            reference_halo: reference points of neighbouring tiles near the tile edge
+            
+        Returns:
+            dictionary with point_count, density, noise_level, completeness and
+            geometric_accuracy (noise_level None for an empty tile)
+        """
+        if len(points) == 0:
+            return {'point_count': 0, 'density': 0.0, 'noise_level': None,
+                    'completeness': 0.0, 'geometric_accuracy': 0.0}
+        
+        grid = self.build_voxel_grid(points)
+        density = self.calculate_density(points, grid)
+        
+        #fit planes with the halo so edge points keep full neighbourhoods
+        k = self.config.get('noise_neighbors', 10)
+        if self.config.get('noise_method', 'centroid') == 'local':
+            context = np.concatenate([points, halo_points])
+            noise_level = 0.0
+            if len(context) >= max(k + 1, 4):
+                residuals = plane_residuals(context, k, self.config.get('noise_chunk_size', 65536))
+                noise_level = float(np.median(residuals[:len(points)]))
+        else:
+            noise_level = self.estimate_noise_level(points, k)
+        
+        completeness = self.check_completeness(points, reference_points=reference_points, grid=grid)
+        if reference_points is None:
+            accuracy = self.assess_geometric_accuracy(points)
+        else:
+            nearby = np.concatenate([reference_points, reference_halo])
+            #no reference anywhere near the tile means the scan is off the expected surface
+            accuracy = 0.0
+            if len(nearby):
+                #tile references are transient, so they are indexed directly instead of registered
+                distances = VoxelHashIndex(nearby).nearest_distances(points)
+                accuracy = self._accuracy_from_error(np.mean(distances))
+        
+        return {'point_count': len(points), 'density': float(density), 'noise_level': float(noise_level),
+                'completeness': float(completeness), 'geometric_accuracy': float(accuracy)}
+    
+    def _assess_tiles_parallel(self, tasks: Iterator[Tuple], workers: int) -> Iterator[Tuple[int, Dict]]:
+        """assess tiles on a process pool with at most two tiles per worker in flight"""
+        with self._worker_pool(workers) as pool:
+            pending = deque()
+            for key, *task in tasks:
+                pending.append((key, pool.submit(_run_tile_worker, *task)))
+                if len(pending) >= 2 * workers:
+                    key, future = pending.popleft()
+                    yield key, future.result()
+            while pending:
+                key, future = pending.popleft()
+                yield key, future.result()
+    
+    def _tile_map(self, results: Dict[int, Dict], scan: TilePartition, offset: np.ndarray) -> Dict:
+        """arrange per-tile metrics as row-per-y grids and rank the weakest tiles, in world xy"""
+        nx, ny = scan.shape
+        names = ('point_count', 'density', 'noise_level', 'completeness',
+                 'geometric_accuracy', 'overall_quality')
+        grids = {name: [[None] * nx for _ in range(ny)] for name in names}
+        ranked = []
+        for key, values in results.items():
+            ix, iy = key % nx, key // nx
+            quality = 0.0
+            if values['point_count']:
+                quality = float(self._calculate_overall_quality(ScanMetrics(
+                    timestamp=0.0, processing_time=0.0, **values)))
+            values = dict(values, overall_quality=quality)
+            for name in names:
+                grids[name][iy][ix] = values[name]
+            box = scan.bounds(key) + np.tile(offset, 2)
+            ranked.append({'tile': [ix, iy], 'bounds': box.tolist(),
+                           'point_count': values['point_count'], 'overall_quality': quality})
+        ranked.sort(key=lambda tile: tile['overall_quality'])
+        return dict({'origin': (scan.origin + offset).tolist(), 'tile_size': scan.tile_size, 'shape': [nx, ny]},
+                    **grids, weakest=ranked[:WEAKEST_TILES])
+    
+    def _working_coordinates(self, points, reference_points: Optional[np.ndarray]
+                             ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        coordinates the metric kernels run on
+        
+        compact clouds are assessed as float32 offsets from their origin, with the
+        reference moved into the same frame; plain arrays are used as they are, and
+        float32 arrays stay float32 through every kernel.
+        """
+        if isinstance(points, CompactPoints):
+            if reference_points is not None:
+                reference_points = points.to_local(reference_points)
+            points = points.local()
+        return points, reference_points
+    
+    def create_profiler(self) -> StageProfiler:
+        """return a stage profiler configured from config and the profile hook"""
+        return StageProfiler(self.config.get('profile_memory', True), self.profile_hook)
+    
+    def _profiled_chunks(self, chunks: Iterator[np.ndarray],
+                         profiler: StageProfiler) -> Iterator[np.ndarray]:
+        """yield chunks from an iterator, timing each read as the load stage"""
+        iterator = iter(chunks)
+        while True:
+            with profiler.stage('load'):
+                chunk = next(iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    
+    def run_streaming_assessment(self, file_path: str,
+                                 reference_points: Optional[np.ndarray] = None,
+                                 chunk_rows: Optional[int] = None,
+                                 profiler: Optional[StageProfiler] = None) -> ScanMetrics:
+        """
+        run the quality assessment on a file chunk by chunk, for scans larger than memory
+        
+        count, bounding box, welford mean/variance and voxel occupancy are
+        accumulated in one pass.
+        local noise and roughness are fitted on the chunk itself when the file fits
+        in one; a file split over several chunks gets a spatial pass with halos
+        (see _streaming_surface_pass) so neighbourhoods are the in-memory ones.
+        the centroid noise needs a second pass too.
+        duplicates are found within each chunk only (scope 'chunk' in the summary);
+        copies of a point that fall in different chunks are all kept.
+        the outlier filter is rejected with a valueerror: its neighbourhood statistics
+        would only see the points of one chunk, which in file order are not neighbours.
+        
+        Args:
+            file_path: path to point cloud file
+            reference_points: optional reference point cloud for comparison (held in memory)
+            chunk_rows: points per chunk (if None, use config)
+            profiler: profiler to record stages into (if None, a new one is created)
+            
+        Returns:
+            scanmetrics object with quality assessment results
+        """
+        if self.config.get('outlier_filter'):
+            raise ValueError("outlier_filter is not supported in streaming mode; "
+                             "filter the file in memory or disable the filter")
+        #start timing the processing
+        start_time = time.perf_counter()
+        if profiler is None:
+            profiler = self.create_profiler()
+        if chunk_rows is None:
+            chunk_rows = self.config.get('stream_chunk_rows', 1_000_000)
+        k = self.config.get('noise_neighbors', 10)
+        local_noise = self.config.get('noise_method', 'centroid') == 'local'
+        
+        compact = self.config.get('precision', 'float64') != 'float64'
+        has_reference = reference_points is not None and len(reference_points) > 0
+        
+        #the reference index stays in world coordinates, chunks are queried from their frame
+        index = None
+        if has_reference:
+            with profiler.stage('reference_index'):
+                index = self.reference_index(reference_points)
+        frame = None
+        moments = RunningMoments()
+        residuals = ResidualHistogram()
+        roughness = self.config.get('roughness', False)
+        roughness_values, curvature_values = ResidualHistogram(), ResidualHistogram()
+        grid = VoxelGrid(self.config.get('voxel_size', 0.25))
+        error_sum = 0.0
+        duplicates = {}
+        chunk_count = 0
+        for chunk in self._profiled_chunks(iter_point_chunks(file_path, chunk_rows), profiler):
+            chunk_count += 1
+            if compact:
+                #reduced precisions work on float32 offsets from an origin fixed by the first chunk
+                if frame is None:
+                    frame = CompactPoints.empty(0, 'float32', np.floor(np.min(chunk, axis=0)))
+                    if has_reference:
+                        reference_points = frame.to_local(reference_points)
+                chunk = frame.to_local(chunk)
+            if self.config.get('deduplicate'):
+                #duplicates are found within each chunk
+                with profiler.stage('deduplicate'):
+                    chunk, found = self.deduplicate(chunk, remove=self.config['deduplicate'] == 'remove')
+                duplicates = self._add_counts(duplicates, found)
+            if len(chunk) == 0:
+                continue
+            #chunk bounds are found once for both accumulators
+            with profiler.stage('moments'):
+                bounds = (np.min(chunk, axis=0), np.max(chunk, axis=0))
+                moments.update(chunk, bounds)
+            with profiler.stage('voxel_grid'):
+                grid.update(chunk, bounds)
+            if index is not None:
+                with profiler.stage('accuracy'):
+                    error_sum += float(index.nearest_distances(
+                        chunk, offset=None if frame is None else frame.origin).sum())
+        
+        #check if points are valid
+        if moments.count == 0:
+            raise ValueError("empty or invalid point cloud data")
+        if duplicates:
+            duplicates['duplicate_ratio'] = duplicates['duplicates'] / duplicates['input_points']
+            #a point duplicated in another chunk is not seen, so both copies are kept
+            duplicates['scope'] = 'chunk'
+        
+        #neighbourhoods cross chunk borders, so a split file is fitted in a spatial pass
+        if (roughness or local_noise) and moments.count >= max(k + 1, 4):
+            histograms = {'residuals': residuals}
+            if roughness:
+                histograms.update(roughness=roughness_values, curvature=curvature_values)
+            with profiler.stage('surface' if roughness else 'noise'):
+                if chunk_count > 1:
+                    self._streaming_surface_pass(file_path, grid, chunk_rows, frame, histograms)
+                elif roughness:
+                    #one neighbourhood pass gives the noise residuals too
+                    properties = surface_properties(chunk, k, self.config.get('noise_chunk_size', 65536))
+                    for name, histogram in histograms.items():
+                        histogram.update(properties[name])
+                else:
+                    residuals.update(plane_residuals(chunk, k, self.config.get('noise_chunk_size', 65536)))
+        
+        #attributes are read in a pass of their own over just their columns
+        attribute_statistics = {}
+        if self.config.get('attributes'):
+            with profiler.stage('attributes'):
+                statistics = AttributeStatistics()
+                for attributes in iter_attribute_chunks(file_path, self.config['attributes'], chunk_rows,
+                                                        self.config.get('attribute_columns')):
+                    statistics.update(attributes)
+                attribute_statistics = statistics.summary(self.config.get('low_intensity', 1000))
+        
+        #noise from the fitted residuals or from a second pass over centroid distances
+        noise_statistics = {}
+        if local_noise:
+            noise_statistics = dict(residuals.summary(), k=int(k))
+            noise_level = noise_statistics['median']
+        elif moments.count < k + 1:
+            noise_level = 0.0
+        else:
+            with profiler.stage('centroid_pass'):
+                centroid = moments.mean if frame is None else moments.mean + frame.origin
+                noise_level = self._streaming_centroid_spread(file_path, centroid, chunk_rows, frame)
+        
+        roughness_statistics = {}
+        if roughness:
+            curvature = curvature_values.summary()
+            roughness_statistics = dict(roughness_values.summary(), k=int(k),
+                                        curvature_median=curvature['median'], curvature_p95=curvature['p95'])
+        
+        density = self._density_from_bounds(moments.count, moments.mins, moments.maxs)
+        #voxels are aligned to the lattice, so chunked occupancy equals the in-memory grid
+        expected = None
+        if index is not None:
+            accuracy = self._accuracy_from_error(error_sum / moments.count)
+            with profiler.stage('completeness'):
+                expected = VoxelGrid.from_points(reference_points, grid.voxel_size, grid.origin)
+        else:
+            accuracy = self._uniformity_score(moments.maxs - moments.mins, moments.std)
+        with profiler.stage('completeness'):
+            completeness = self._voxel_coverage(grid, expected)
+        
+        metrics = ScanMetrics(
+            point_count=moments.count,
+            density=float(density),
+            noise_level=float(noise_level),
+            completeness=float(completeness),
+            geometric_accuracy=float(accuracy),
+            timestamp=time.time(),
+            processing_time=0.0,
+            noise_statistics=noise_statistics,
+            profile=profiler.profile(),
+            duplicates=duplicates,
+            attributes=attribute_statistics,
+            roughness=roughness_statistics
+        )
+        
+        #calculate actual processing time
+        metrics.processing_time = time.perf_counter() - start_time
+        #add metrics to history
+        self.metrics_history.append(metrics)
+        
+        return metrics
+    
+    def _add_counts(self, total: Dict, counts: Dict) -> Dict:
+        """sum the integer entries of two outlier or duplicate summaries"""
+        merged = dict(counts)
+        for key, value in total.items():
+            if isinstance(value, int):
+                merged[key] = value + counts.get(key, 0)
+        return merged
+    
+    def _replayed_chunks(self, file_path: str, chunk_rows: int,
+                         frame: Optional[CompactPoints] = None) -> Iterator[np.ndarray]:
+        """the chunks of a file again, in the working frame and deduplicated like the first streaming pass"""
+        for chunk in iter_point_chunks(file_path, chunk_rows):
+            if frame is not None:
+                chunk = frame.to_local(chunk)
+            if self.config.get('deduplicate') == 'remove':
+                keep, _ = duplicate_mask(chunk, self.config.get('duplicate_tolerance', 0.001))
+                chunk = chunk[keep]
+            yield chunk
+    
+    def _streaming_surface_pass(self, file_path: str, grid: VoxelGrid, chunk_rows: int,
+                                frame: Optional[CompactPoints], histograms: Dict[str, ResidualHistogram]):
+        """
+        exact neighbourhood fits of a file split over several chunks
+        
+        the voxel grid of the first pass cuts the cloud into slabs of about
+        chunk_rows points along its longest axis. one more pass writes every
+        slab, plus a halo one voxel deep from its neighbours, to a temporary
+        file; each slab's points are then fitted against slab and halo. a point
+        whose farthest neighbour is further away than the halo edge may have a
+        closer neighbour outside it, so those few are completed by merging their
+        nearest neighbours over every chunk of the file.
+        
+        Args:
+            file_path: path to point cloud file
+            grid: voxel grid of the whole file in the working frame
+            chunk_rows: points per chunk
+            frame: working frame of reduced precisions (None for world coordinates)
+            histograms: histograms to update, keyed by surface_properties output
+        """
+        k = self.config.get('noise_neighbors', 10)
+        chunk_size = self.config.get('noise_chunk_size', 65536)
+        cells = unpack_voxel_keys(grid.keys)
+        axis = int(np.argmax(np.ptp(cells, axis=0)))
+        first = int(cells[:, axis].min())
+        layers = np.bincount(cells[:, axis] - first, weights=grid.counts).astype(np.int64)
+        #a voxel layer joins the slab holding the points before it
+        _, slab_of_layer = np.unique((np.cumsum(layers) - layers) // chunk_rows, return_inverse=True)
+        starts = np.flatnonzero(np.r_[True, slab_of_layer[1:] != slab_of_layer[:-1]])
+        halo = grid.voxel_size
+        #slab edges on the axis; the outer slabs are open so no point falls outside
+        edges = grid.origin[axis] + (first + np.r_[starts, len(layers)]) * halo
+        edges[0], edges[-1] = -np.inf, np.inf
+        
+        def slab_of(x: np.ndarray) -> np.ndarray:
+            layer = np.floor((x - grid.origin[axis]) / halo).astype(np.int64) - first
+            return slab_of_layer[np.clip(layer, 0, len(layers) - 1)]
+        
+        pending = []
+        with tempfile.TemporaryDirectory() as directory:
+            paths = [os.path.join(directory, f'{slab}.bin') for slab in range(len(starts))]
+            dtype = np.float64
+            for chunk in self._replayed_chunks(file_path, chunk_rows, frame):
+                dtype = chunk.dtype
+                order = np.argsort(chunk[:, axis], kind='stable')
+                x = chunk[order, axis].astype(np.float64)
+                #slab plus halo is one contiguous range of the sorted chunk
+                lows = np.searchsorted(x, edges[:-1] - halo)
+                highs = np.searchsorted(x, edges[1:] + halo)
+                for slab in np.flatnonzero(highs > lows):
+                    with open(paths[slab], 'ab') as f:
+                        chunk[order[lows[slab]:highs[slab]]].tofile(f)
+            
+            for slab, path in enumerate(paths):
+                if not os.path.exists(path):
+                    continue
+                loaded = np.fromfile(path, dtype=dtype).reshape(-1, 3)
+                x = loaded[:, axis].astype(np.float64)
+                core = np.flatnonzero(slab_of(x) == slab)
+                if len(core) == 0:
+                    continue
+                if len(loaded) < k + 1:
+                    pending.append(loaded[core])
+                    continue
+                properties = surface_properties(loaded, k, chunk_size, rows=core, reach=True)
+                #anything outside the halo is at least this far away
+                margin = np.minimum(x[core] - (edges[slab] - halo), edges[slab + 1] + halo - x[core])
+                far = properties['reach'] >= margin
+                for name, histogram in histograms.items():
+                    histogram.update(properties[name][~far])
+                pending.append(loaded[core[far]])
+        
+        queries = np.concatenate(pending)
+        if len(queries):
+            properties = neighbour_properties(queries, self._merged_neighbourhoods(file_path, queries,
+                                                                                   chunk_rows, frame))
+            for name, histogram in histograms.items():
+                histogram.update(properties[name])
+    
+    def _merged_neighbourhoods(self, file_path: str, queries: np.ndarray, chunk_rows: int,
+                               frame: Optional[CompactPoints] = None) -> np.ndarray:
+        """coordinates (Q, k + 1, 3) of the exact neighbourhoods of a few points, merged over every chunk"""
+        n = self.config.get('noise_neighbors', 10) + 1
+        nearest = np.full((len(queries), n), np.inf)
+        coords = np.zeros((len(queries), n, 3), dtype=queries.dtype)
+        for chunk in self._replayed_chunks(file_path, chunk_rows, frame):
+            if len(chunk) == 0:
+                continue
+            distances, rows = VoxelHashIndex(chunk).query(queries, k=n)
+            distances = np.concatenate([nearest, distances], axis=1)
+            candidates = np.concatenate([coords, chunk[rows]], axis=1)
+            keep = np.argsort(distances, axis=1, kind='stable')[:, :n]
+            nearest = np.take_along_axis(distances, keep, axis=1)
+            coords = np.take_along_axis(candidates, keep[:, :, None], axis=1)
+        return coords
+    
+    def _streaming_centroid_spread(self, file_path: str, centroid: np.ndarray,
+                                   chunk_rows: int, frame: Optional[CompactPoints] = None) -> float:
+        """centroid spread (0-1) from a second chunked pass over the file"""
+        distance_sum = 0.0
+        max_distance = 0.0
+        count = 0
+        for chunk in iter_point_chunks(file_path, chunk_rows):
+            if self.config.get('deduplicate') == 'remove':
+                #drop the same points as the first pass, which deduplicated in the working frame
+                keep, _ = duplicate_mask(chunk if frame is None else frame.to_local(chunk),
+                                         self.config.get('duplicate_tolerance', 0.001))
+                chunk = chunk[keep]
+            if len(chunk) == 0:
+                continue
+            distances = np.linalg.norm(chunk - centroid, axis=1)
+            distance_sum += float(distances.sum())
+            max_distance = max(max_distance, float(distances.max()))
+            count += len(chunk)
+        #normalizing the mean by the max is the same as averaging normalized distances
+        if max_distance <= 0:
+            max_distance = 1.0
+        return min(distance_sum / count / max_distance, 1.0)
+    
+    def _noise_threshold(self) -> float:
+        """noise limit in the unit of the configured noise method"""
+        if self.config.get('noise_method', 'centroid') == 'local':
+            return self.config.get('local_noise_threshold', 0.01)
+        return self.config['noise_threshold']
+    
+    def _pass_rules(self) -> Dict[str, Tuple[str, float]]:
+        """comparison and threshold each metric has to meet to pass"""
+        return {
+            'density': ('>=', self.config['density_threshold']),
+            'noise_level': ('<=', self._noise_threshold()),
+            'completeness': ('>=', self.config['completeness_threshold']),
+            'geometric_accuracy': ('>=', 0.7)
+        }
+    
+    def pass_rates(self, window: Optional[int] = None,
+                   since: Optional[float] = None) -> Dict[str, float]:
+        """
+        fraction of recent scans that passed each metric's threshold
+        
+        Args:
+            window: only the most recent window scans (all retained if None)
+            since: only scans with timestamp >= since
+            
+        Returns:
+            pass rate per metric and under 'all'
+        """
+        return self.metrics_history.pass_rates(self._pass_rules(), window, since)
+    
+    def processing_time_percentiles(self, q=(50, 95, 99), window: Optional[int] = None,
+                                    since: Optional[float] = None) -> Dict[float, float]:
+        """
+        percentiles of processing time over recent scans
+        
+        Args:
+            q: percentiles to compute
+            window: only the most recent window scans (all retained if None)
+            since: only scans with timestamp >= since
+            
+        Returns:
+            mapping from percentile to seconds
+        """
+        values = np.atleast_1d(self.metrics_history.percentile('processing_time', q, window, since))
+        return {p.item(): float(v) for p, v in zip(np.atleast_1d(q), values)}
+    
     def generate_report(self, metrics: ScanMetrics) -> Dict:
         """
         generate a quality assessment report
@@ -264,8 +1565,8 @@ class LaserScanQA:
                 },
                 'noise_level': {
                     'value': metrics.noise_level,
-                    'status': 'PASS' if metrics.noise_level <= self.config['noise_threshold'] else 'FAIL',
-                    'threshold': self.config['noise_threshold']
+                    'status': 'PASS' if metrics.noise_level <= self._noise_threshold() else 'FAIL',
+                    'threshold': self._noise_threshold()
                 },
                 'completeness': {
                     'value': metrics.completeness,
@@ -280,6 +1581,55 @@ class LaserScanQA:
             'timestamp': metrics.timestamp
         }
         
+        #include local residual statistics when the local noise engine was used
+        if metrics.noise_statistics:
+            report['detailed_metrics']['noise_level']['statistics'] = metrics.noise_statistics
+        #confidence intervals of approximate-mode metrics
+        if metrics.sampling:
+            for name, interval in metrics.sampling['intervals'].items():
+                report['detailed_metrics'][name]['confidence_interval'] = interval
+            report['sampling'] = {key: value for key, value in metrics.sampling.items()
+                                  if key != 'intervals'}
+        #local surface roughness, judged on its median when a threshold is set
+        if metrics.roughness:
+            roughness = {'value': metrics.roughness['median'], 'statistics': metrics.roughness}
+            threshold = self.config.get('roughness_threshold')
+            if threshold is not None:
+                roughness['status'] = 'PASS' if metrics.roughness['median'] <= threshold else 'FAIL'
+                roughness['threshold'] = threshold
+            report['detailed_metrics']['roughness'] = roughness
+        #intensity and return statistics, judged on the low-return ratio when a limit is set
+        if metrics.attributes:
+            report['attributes'] = metrics.attributes
+            if 'intensity' in metrics.attributes:
+                ratio = metrics.attributes['intensity']['low_return_ratio']
+                low_returns = {'value': ratio}
+                limit = self.config.get('max_low_return_ratio')
+                if limit is not None:
+                    low_returns['status'] = 'PASS' if ratio <= limit else 'FAIL'
+                    low_returns['threshold'] = limit
+                report['detailed_metrics']['low_return_ratio'] = low_returns
+        #duplicate points from overlapping stations, dropped when deduplicate is 'remove'
+        if metrics.duplicates:
+            report['summary']['duplicate_ratio'] = metrics.duplicates['duplicate_ratio']
+            report['duplicates'] = metrics.duplicates
+        #points dropped by the outlier filter before the metrics were computed
+        if metrics.outliers:
+            report['summary']['outliers_removed'] = metrics.outliers['removed']
+            report['outlier_filter'] = metrics.outliers
+        #metrics registered as custom plugins
+        for name, value in metrics.custom_metrics.items():
+            report['detailed_metrics'][name] = {'value': value}
+        #per-tile quality map
+        if metrics.tiles:
+            report['tiles'] = metrics.tiles
+        #under-covered octree regions
+        if metrics.regions:
+            report['regions'] = metrics.regions
+        #per-stage timings and peak memory
+        if metrics.profile:
+            report['profile'] = metrics.profile
+        
         return report
     
     def _calculate_overall_quality(self, metrics: ScanMetrics) -> float:
@@ -294,7 +1644,7 @@ class LaserScanQA:
         
         #calculate individual scores for each metric
         density_score = min(metrics.density / self.config['density_threshold'], 1.0)
-        noise_score = max(0, 1 - (metrics.noise_level / self.config['noise_threshold']))
+        noise_score = max(0, 1 - (metrics.noise_level / self._noise_threshold()))
         
         #calculate weighted overall quality score
         overall = (
@@ -323,42 +1673,473 @@ class LaserScanQA:
             #catch any errors during file saving
             print(f"error saving report: {e}")
     
+    def process_file(self, file_path: str,
+                     output_dir: Optional[str] = "reports") -> Optional[Tuple[ScanMetrics, Dict]]:
+        """
+        load, assess and save the report of a single point cloud file
+        
+        Args:
+            file_path: path to point cloud file
+            output_dir: output directory for the report (None does not save it)
+            
+        Returns:
+            tuple of (metrics, report) or None if the file could not be processed
+        """
+        print(f"processing: {file_path}")
+        
+        #reuse the stored result when neither the file nor the settings changed
+        cache_key, entry = self._cached_entry(file_path)
+        if entry is not None:
+            print(f"cache hit: {file_path}")
+            metrics = ScanMetrics(**entry['metrics'])
+            self.metrics_history.append(metrics)
+            self._write_file_report(entry['report'], file_path, output_dir)
+            return metrics, entry['report']
+        
+        metrics = self._assess_file(file_path)
+        if metrics is None:
+            return None
+        report = self._save_file_report(metrics, file_path, output_dir)
+        
+        #remember the result for the next run over the same file
+        if cache_key is not None:
+            self.cache.put(cache_key, {'metrics': asdict(metrics), 'report': report})
+        return metrics, report
+    
+    def _cached_entry(self, file_path: str) -> Tuple[Optional[str], Optional[Dict]]:
+        """return the cache key of a file and its stored entry (None when missing or uncached)"""
+        if self.cache is None:
+            return None, None
+        try:
+            cache_key = self.cache.key(file_path, self._result_config(), self._metrics_version())
+        except OSError:
+            #unreadable files fall through to the loader, which reports the error
+            return None, None
+        return cache_key, self.cache.get(cache_key)
+    
+    def _result_config(self) -> Dict:
+        """config entries a cached result depends on: result_config_keys and keys unknown to the defaults"""
+        known = self._default_config()
+        return {key: value for key, value in self.config.items()
+                if key in RESULT_CONFIG_KEYS or key not in known}
+    
+    def _metrics_version(self) -> str:
+        """metrics_version plus the names and versions of custom metrics"""
+        custom = [plugin.name for plugin in self.custom_metrics()]
+        if not custom:
+            return METRICS_VERSION
+        return f"{METRICS_VERSION}:{self.metric_engine.version(custom)}"
+    
+    def _assess_file(self, file_path: str) -> Optional[ScanMetrics]:
+        """assess one file in memory or streamed, returning None on failure"""
+        profiler = self.create_profiler()
+        #scans larger than memory are assessed straight from the file
+        if self.config.get('streaming', False):
+            try:
+                return self.run_streaming_assessment(file_path, profiler=profiler)
+            except Exception as e:
+                print(f"error assessing {file_path}: {e}")
+                return None
+        
+        #load point cloud from file
+        with profiler.stage('load'):
+            points = self.load_point_cloud(file_path)
+        if points is None:
+            return None
+        return self._assess_points(file_path, points, profiler)
+    
+    def _assess_points(self, file_path: str, points: np.ndarray,
+                       profiler: StageProfiler) -> Optional[ScanMetrics]:
+        """assess the loaded points of one file, returning None on failure"""
+        try:
+            #only the configured attribute columns are read
+            attributes = None
+            if self.config.get('attributes'):
+                with profiler.stage('load_attributes'):
+                    attributes = self.load_attributes(file_path)
+            #run quality assessment on loaded points
+            return self.run_quality_assessment(points, profiler=profiler, attributes=attributes)
+        except Exception as e:
+            #a bad scan is reported and skipped instead of stopping the batch
+            print(f"error assessing {file_path}: {e}")
+            return None
+    
+    def _save_file_report(self, metrics: ScanMetrics, file_path: str, output_dir: str) -> Dict:
+        """generate the report of one file and save it next to the others"""
+        #generate report from metrics
+        report = self.generate_report(metrics)
+        self._write_file_report(report, file_path, output_dir)
+        return report
+    
+    def _write_file_report(self, report: Dict, file_path: str, output_dir: Optional[str]):
+        """save a report as <file stem>_report.json in output_dir, or append it to the batch's report store"""
+        if output_dir is None:
+            return
+        if self._report_store is not None:
+            #consolidated mode buffers one json line per scan
+            self._report_store.append(self._scan_name(file_path), report)
+            return
+        #save individual report file; subdirectories below the report root are mirrored
+        relative = Path(self._scan_name(file_path))
+        output_path = Path(output_dir) / relative.parent / (relative.stem + '_report.json')
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self.save_report(report, str(output_path))
+    
+    def _scan_name(self, file_path: str) -> str:
+        """name a report is stored under: the file's path relative to the report root, '/'-separated"""
+        path = Path(file_path).resolve()
+        if self._report_root is not None:
+            try:
+                return path.relative_to(self._report_root).as_posix()
+            except ValueError:
+                pass
+        return path.name
+    
     def batch_process(self, file_paths: List[str], 
-                     output_dir: str = "reports") -> List[Dict]:
+                     output_dir: str = "reports",
+                     workers: Optional[int] = 1,
+                     pipelined: Optional[bool] = None) -> List[Dict]:
         """
         process multiple point cloud files in batch
         
+        with report_format 'jsonl' every report is appended to one buffered json
+        lines file (report_file in output_dir) with an index by scan name, the
+        file's path relative to the directory holding every file of the batch
+        (e.g. 'site_a/scan.las'); open it with report_store.ReportStore to look
+        reports up.
+        
         Args:
             file_paths: list of file paths to process
             output_dir: output directory for reports
+            workers: number of worker processes (1 runs in this process, None uses every core)
+            pipelined: load upcoming files and write reports on background threads
+                while this one computes (defaults to the 'pipelined' config setting)
             
         Returns:
-            list of reports
+            list of reports, in the order of file_paths
         """
         #create output directory if it doesn't exist
         Path(output_dir).mkdir(exist_ok=True)
+        
+        #scans are named relative to the deepest directory holding all of them
+        if file_paths:
+            self._report_root = Path(os.path.commonpath([str(Path(path).resolve().parent)
+                                                         for path in file_paths]))
+        #one buffered json lines file instead of a file per scan
+        self._open_report_store(output_dir)
+        try:
+            return self._run_batch(file_paths, output_dir, workers, pipelined)
+        finally:
+            self._close_report_store()
+            self._report_root = None
+    
+    def _open_report_store(self, output_dir: str):
+        """start the consolidated report file when report_format is 'jsonl'"""
+        if self.config.get('report_format', 'json') == 'jsonl':
+            self._report_store = ReportStore(Path(output_dir) / self.config.get('report_file', 'reports.jsonl'))
+    
+    def _close_report_store(self):
+        """flush and close the consolidated report file, if any"""
+        store, self._report_store = self._report_store, None
+        if store is not None:
+            store.close()
+            print(f"{len(store)} reports saved to {store.path}")
+    
+    def _run_batch(self, file_paths: List[str], output_dir: str, workers: Optional[int],
+                   pipelined: Optional[bool]) -> List[Dict]:
+        """process the batch serially, pipelined or on a process pool"""
         reports = []
         
+        #use every core when no worker count is given
+        if workers is None:
+            workers = os.cpu_count() or 1
+        
+        if workers > 1 and len(file_paths) > 1:
+            #spread files over a process pool, results come back in input order
+            for result in self._process_parallel(file_paths, output_dir, workers):
+                if result is None:
+                    continue
+                metrics, report = result
+                #workers keep their own history, so collect it here
+                self.metrics_history.append(metrics)
+                reports.append(report)
+            return reports
+        
+        if pipelined is None:
+            pipelined = self.config.get('pipelined', False)
+        if pipelined and len(file_paths) > 1:
+            #overlap disk reads and report writes with the computation
+            for result in self._process_pipelined(file_paths, output_dir,
+                                                  self.config.get('prefetch_depth', 2)):
+                if result is not None:
+                    reports.append(result[1])
+            return reports
+        
         #process each file in the list
         for file_path in file_paths:
-            print(f"processing: {file_path}")
-            
-            #load point cloud from file
-            points = self.load_point_cloud(file_path)
-            if points is None:
+            result = self.process_file(file_path, output_dir)
+            if result is None:
                 continue
-                
-            #run quality assessment on loaded points
-            metrics = self.run_quality_assessment(points)
-            #generate report from metrics
-            report = self.generate_report(metrics)
-            
-            #save individual report file
-            filename = Path(file_path).stem + '_report.json'
-            output_path = Path(output_dir) / filename
-            self.save_report(report, str(output_path))
             
             #add report to results list
-            reports.append(report)
+            reports.append(result[1])
         
         return reports
+    
+    def _prefetch(self, file_path: str) -> Tuple[str, Optional[str], Optional[Dict], Optional[np.ndarray], float]:
+        """
+        look up and load one file ahead of its assessment
+        
+        Returns:
+            tuple of (file path, cache key, cache entry, points, load seconds); points
+            is None on a cache hit, in streaming mode or when loading failed
+        """
+        cache_key, entry = self._cached_entry(file_path)
+        if entry is not None or self.config.get('streaming', False):
+            return file_path, cache_key, entry, None, 0.0
+        start = time.perf_counter()
+        points = self.load_point_cloud(file_path)
+        if isinstance(points, np.ndarray) and not points.flags.owndata:
+            #read memory-mapped files now so the computation never waits on the disk
+            points = np.array(points)
+        return file_path, cache_key, entry, points, time.perf_counter() - start
+    
+    def _process_pipelined(self, file_paths: List[str], output_dir: str,
+                           depth: int) -> Iterator[Optional[Tuple[ScanMetrics, Dict]]]:
+        """
+        run the batch as a three stage pipeline and yield results in input order
+        
+        a loader thread reads up to depth files ahead into a bounded queue, this
+        thread only computes metrics, and a writer thread saves reports and cache
+        entries. file reads and writes release the gil, so the disk and the cpu
+        work at the same time and at most depth + 2 scans are held in memory.
+        traced peak memory of compute stages includes the loader's allocations.
+        """
+        loaded = queue.Queue(maxsize=max(1, depth))
+        to_write = queue.Queue(maxsize=max(1, depth))
+        stop = threading.Event()
+        
+        def load():
+            for file_path in file_paths:
+                if stop.is_set():
+                    break
+                loaded.put(self._prefetch(file_path))
+            loaded.put(None)
+        
+        def write():
+            while True:
+                item = to_write.get()
+                if item is None:
+                    return
+                cache_key, metrics, report, file_path = item
+                try:
+                    self._write_file_report(report, file_path, output_dir)
+                    if cache_key is not None:
+                        self.cache.put(cache_key, {'metrics': asdict(metrics), 'report': report})
+                except Exception as e:
+                    print(f"error writing results of {file_path}: {e}")
+        
+        #daemon threads never keep the interpreter alive if the batch is abandoned
+        loader = threading.Thread(target=load, daemon=True)
+        writer = threading.Thread(target=write, daemon=True)
+        loader.start()
+        writer.start()
+        try:
+            while True:
+                item = loaded.get()
+                if item is None:
+                    break
+                file_path, cache_key, entry, points, load_seconds = item
+                item = None
+                print(f"processing: {file_path}")
+                
+                if entry is not None:
+                    print(f"cache hit: {file_path}")
+                    metrics = ScanMetrics(**entry['metrics'])
+                    self.metrics_history.append(metrics)
+                    to_write.put((None, metrics, entry['report'], file_path))
+                    yield metrics, entry['report']
+                    continue
+                
+                if self.config.get('streaming', False):
+                    metrics = self._assess_file(file_path)
+                elif points is None:
+                    metrics = None
+                else:
+                    profiler = self.create_profiler()
+                    profiler.record('load', load_seconds)
+                    metrics = self._assess_points(file_path, points, profiler)
+                    #drop the scan before waiting for the next one
+                    points = None
+                if metrics is None:
+                    yield None
+                    continue
+                
+                report = self.generate_report(metrics)
+                to_write.put((cache_key, metrics, report, file_path))
+                yield metrics, report
+        finally:
+            stop.set()
+            to_write.put(None)
+            writer.join()
+    
+    def _process_parallel(self, file_paths: List[str], output_dir: str,
+                          workers: int) -> Iterator[Optional[Tuple[ScanMetrics, Dict]]]:
+        """run process_file over a process pool and yield results in input order"""
+        with self._worker_pool(min(workers, len(file_paths))) as pool:
+            futures = [self._submit_file(pool, file_path, output_dir) for file_path in file_paths]
+            for file_path, future in zip(file_paths, futures):
+                yield self._worker_result(future, file_path, output_dir)
+    
+    def _worker_pool(self, workers: int) -> ProcessPoolExecutor:
+        """process pool whose workers each hold a warm instance with this config and custom metrics"""
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker,
+                                   initargs=(self.config, self.profile_hook, self.custom_metrics()))
+    
+    def _submit_file(self, pool: ProcessPoolExecutor, file_path: str, output_dir: str) -> Future:
+        """run process_file on a worker"""
+        #workers cannot share the consolidated report file, so its lines are written here
+        worker_dir = None if self._report_store is not None else output_dir
+        return pool.submit(_run_batch_worker, file_path, worker_dir, self._report_root)
+    
+    def _worker_result(self, future: Future, file_path: str,
+                       output_dir: str) -> Optional[Tuple[ScanMetrics, Dict]]:
+        """wait for one worker result, writing its consolidated report line here"""
+        try:
+            result = future.result()
+        except Exception as e:
+            #a crashed worker only loses its own file
+            print(f"error processing {file_path}: {e}")
+            return None
+        if result is not None and self._report_store is not None:
+            self._write_file_report(result[1], file_path, output_dir)
+        return result
+    
+    def watch_folder(self, watch_dir: str, output_dir: str = "reports",
+                     workers: Optional[int] = 1, checkpoint_path: Optional[str] = None,
+                     stop: Optional[threading.Event] = None, max_polls: Optional[int] = None,
+                     recursive: bool = False) -> int:
+        """
+        assess scans as they arrive in a directory, until stopped
+        
+        the directory is listed every watch_poll_seconds; a file is assessed once
+        its size and mtime stayed unchanged for watch_settle_seconds, so files
+        still being copied are left alone. assessed files are logged in a
+        checkpoint, so a restart skips everything already done and only
+        reassesses files that changed since. files run in this instance or, with
+        workers > 1, on a process pool of warm instances with at most two files
+        per worker in flight. ctrl-c stops after the files in flight.
+        
+        Args:
+            watch_dir: directory scanners drop files into
+            output_dir: output directory for reports
+            workers: number of worker processes (1 runs in this process, None uses every core)
+            checkpoint_path: json lines log of assessed files (if None,
+                watch_checkpoint.jsonl in output_dir)
+            stop: event that ends the watch when set (checked between polls)
+            max_polls: end after this many directory listings (None runs until stopped)
+            recursive: also watch subdirectories (their reports go to the same
+                subdirectories of output_dir)
+            
+        Returns:
+            number of files assessed
+        """
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        poll_seconds = self.config.get('watch_poll_seconds', 2.0)
+        checkpoint = Checkpoint(checkpoint_path or str(Path(output_dir) / 'watch_checkpoint.jsonl'))
+        #drop superseded entries left by earlier runs
+        checkpoint.compact()
+        tracker = StabilityTracker(self.config.get('watch_settle_seconds', 5.0))
+        if workers is None:
+            workers = os.cpu_count() or 1
+        print(f"watching {watch_dir} ({len(checkpoint)} files already assessed)")
+        
+        pool = self._worker_pool(workers) if workers > 1 else None
+        #futures of files on the pool, with the file state they were submitted in
+        pending: Dict[Future, Tuple[str, Tuple[int, int]]] = {}
+        assessed = 0
+        polls = 0
+        self._report_root = Path(watch_dir).resolve()
+        self._open_report_store(output_dir)
+        try:
+            while True:
+                polls += 1
+                before = assessed
+                waiting = {path: state for path, state in list_scans(watch_dir, SUPPORTED_EXTENSIONS,
+                                                                       recursive).items()
+                           if not checkpoint.done(path, state)}
+                in_flight = {path for path, _ in pending.values()}
+                for path in tracker.observe({p: st for p, st in waiting.items() if p not in in_flight}):
+                    if pool is None:
+                        result = self.process_file(path, output_dir)
+                        checkpoint.record(path, waiting[path], 'failed' if result is None else 'done')
+                        assessed += 1
+                    elif len(pending) < 2 * workers:
+                        pending[self._submit_file(pool, path, output_dir)] = (path, waiting[path])
+                    else:
+                        #the rest stay stable and are picked up by a later poll
+                        break
+                    tracker.forget(path)
+                
+                #collect finished files without waiting for the others
+                for future in [future for future in pending if future.done()]:
+                    path, state = pending.pop(future)
+                    assessed += self._record_watched(future, path, state, output_dir, checkpoint)
+                #readers of the consolidated file see each poll's reports
+                if self._report_store is not None and assessed > before:
+                    self._report_store.flush()
+                
+                if max_polls is not None and polls >= max_polls:
+                    break
+                if stop is None:
+                    time.sleep(poll_seconds)
+                elif stop.wait(poll_seconds):
+                    break
+        except KeyboardInterrupt:
+            print("stopping watch after the files in flight")
+        finally:
+            for future, (path, state) in pending.items():
+                assessed += self._record_watched(future, path, state, output_dir, checkpoint)
+            if pool is not None:
+                pool.shutdown()
+            checkpoint.close()
+            self._close_report_store()
+            self._report_root = None
+        return assessed
+    
+    def _record_watched(self, future: Future, path: str, state: Tuple[int, int],
+                        output_dir: str, checkpoint: Checkpoint) -> int:
+        """take a watched file's worker result into the history and checkpoint; returns 1"""
+        result = self._worker_result(future, path, output_dir)
+        if result is not None:
+            #workers keep their own history, so collect it here
+            self.metrics_history.append(result[0])
+        checkpoint.record(path, state, 'failed' if result is None else 'done')
+        return 1
+
+#per-process framework instance used by batch workers
+_worker_qa: Optional[LaserScanQA] = None
+
+
+def _init_batch_worker(config: Dict, profile_hook: Optional[ProfileHook] = None,
+                       plugins: Tuple[MetricPlugin, ...] = ()):
+    """create the framework instance once per worker process, with the parent's custom metrics"""
+    global _worker_qa
+    _worker_qa = LaserScanQA(config, profile_hook)
+    for plugin in plugins:
+        _worker_qa.register_metric(plugin.name, plugin.compute, plugin.requires, plugin.stage, plugin.version)
+
+
+def _run_batch_worker(file_path: str, output_dir: Optional[str],
+                      report_root: Optional[Path] = None) -> Optional[Tuple[ScanMetrics, Dict]]:
+    """process one file in a worker process (output_dir None leaves the report to the parent)"""
+    #report names follow the parent's batch or watched directory
+    _worker_qa._report_root = report_root
+    return _worker_qa.process_file(file_path, output_dir)
+
+
+def _run_tile_worker(points: np.ndarray, halo_points: np.ndarray,
+                     reference_points: Optional[np.ndarray],
+                     reference_halo: Optional[np.ndarray]) -> Dict[str, float]:
+    """assess one tile in a worker process"""
+    return _worker_qa.assess_tile(points, halo_points, reference_points, reference_halo)
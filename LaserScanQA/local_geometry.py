@@ -0,0 +1,218 @@
+"""
+local_geometry - batched k-nearest-neighbour plane fits for local point cloud analysis
+"""
+
+import numpy as np
+from typing import Dict, Iterator, Optional, Tuple
+
+from spatial_index import VoxelHashIndex
+
+
+def neighbourhood_eigen(coords: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    eigen decomposition of a block of neighbourhood covariances
+
+    Args:
+        coords: neighbour coordinates (B, n, 3), each neighbourhood including its point
+
+    Returns:
+        tuple of eigenvalues ascending (B, 3), eigenvectors (B, 3, 3) and
+        neighbourhood centroids (B, 3)
+    """
+    centroids = coords.mean(axis=1, keepdims=True)
+    centred = coords - centroids
+    covariance = np.einsum('bki,bkj->bij', centred, centred) / coords.shape[1]
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    return eigenvalues, eigenvectors, centroids[:, 0]
+
+
+def iter_neighbourhood_eigen(points: np.ndarray, k: int, chunk_size: int = 65536,
+                             index: Optional[VoxelHashIndex] = None,
+                             rows: Optional[np.ndarray] = None
+                             ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    eigen decomposition of every point's k-neighbourhood covariance, one block at a time
+
+    each neighbourhood is the point itself plus its k nearest neighbours. blocks are
+    visited in grid order so neighbour lookups stay local, and only one block of
+    neighbour coordinates is held in memory at a time.
+
+    Args:
+        points: point cloud data (N, 3)
+        k: number of neighbours per point
+        chunk_size: number of points per block
+        index: prebuilt index over points (if None, one is built)
+        rows: only fit the neighbourhoods of these points, in this order (if None,
+            every point); neighbours still come from the whole cloud
+
+    Returns:
+        iterator of (point indices (B,), eigenvalues ascending (B, 3), eigenvectors (B, 3, 3),
+        neighbourhood centroids (B, 3), distance to the farthest neighbour (B,))
+    """
+    if index is None:
+        #about 2k points per cell keeps most neighbourhoods inside the first block searched
+        index = VoxelHashIndex(points, target_occupancy=max(8.0, 2.0 * k))
+    if rows is None:
+        #the index stores points in grid order, so a slice of it is spatially compact
+        blocks = ((index.order[start:start + chunk_size], index.points[start:start + chunk_size])
+                  for start in range(0, len(index), chunk_size))
+    else:
+        blocks = ((rows[start:start + chunk_size], points[rows[start:start + chunk_size]])
+                  for start in range(0, len(rows), chunk_size))
+    for block_rows, block in blocks:
+        distances, neighbours = index.query(block, k=k + 1, chunk_size=chunk_size)
+        yield (block_rows,) + neighbourhood_eigen(points[neighbours]) + (distances[:, -1],)
+
+
+def plane_residuals(points: np.ndarray, k: int, chunk_size: int = 65536,
+                    index: Optional[VoxelHashIndex] = None,
+                    rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    rms distance of each point's neighbourhood to its best-fit plane
+
+    Args:
+        points: point cloud data (N, 3)
+        k: number of neighbours per point
+        chunk_size: number of points per block
+        index: prebuilt index over points (if None, one is built)
+        rows: only compute the residuals of these points (if None, every point)
+
+    Returns:
+        per-point residual in point cloud units (N,), or one per row in rows order
+    """
+    residuals = np.empty(len(points) if rows is None else len(rows), dtype=np.float32)
+    #the smallest eigenvalue is the mean squared distance to the plane; rescale
+    #by n / (n - 3) because the plane itself is fitted to the same points
+    n = min(k + 1, len(points))
+    scale = n / (n - 3) if n > 3 else 1.0
+    filled = 0
+    for block_rows, eigenvalues, _, _, _ in iter_neighbourhood_eigen(points, k, chunk_size, index, rows):
+        values = np.sqrt(np.maximum(eigenvalues[:, 0], 0.0) * scale)
+        if rows is None:
+            residuals[block_rows] = values
+        else:
+            #sampled rows come back in the order they were given
+            residuals[filled:filled + len(values)] = values
+            filled += len(values)
+    return residuals
+
+
+def _block_properties(points: np.ndarray, eigenvalues: np.ndarray, eigenvectors: np.ndarray,
+                      centroids: np.ndarray, scale: float, normals: bool) -> Dict[str, np.ndarray]:
+    """residual, curvature, roughness and optionally normal of a block of points from their neighbourhoods"""
+    smallest = np.maximum(eigenvalues[:, 0], 0.0)
+    total = np.maximum(eigenvalues.sum(axis=1), 0.0)
+    #eigh sorts ascending, so the first eigenvector is the plane normal
+    block_normals = eigenvectors[:, :, 0]
+    offsets = points - centroids
+    values = {
+        'residuals': np.sqrt(smallest * scale),
+        'curvature': np.divide(smallest, total, out=np.zeros_like(total), where=total > 0),
+        'roughness': np.abs(np.einsum('bi,bi->b', offsets, block_normals))
+    }
+    if normals:
+        values['normals'] = block_normals
+    return values
+
+
+def surface_properties(points: np.ndarray, k: int, chunk_size: int = 65536,
+                       index: Optional[VoxelHashIndex] = None, rows: Optional[np.ndarray] = None,
+                       normals: bool = False, reach: bool = False) -> Dict[str, np.ndarray]:
+    """
+    per-point plane residual, curvature, roughness and optionally normal from one pass
+
+    all come from the same neighbourhood covariance, so noise and roughness
+    together cost one neighbour search and one batched eigh per block.
+
+    Args:
+        points: point cloud data (N, 3)
+        k: number of neighbours per point
+        chunk_size: number of points per block
+        index: prebuilt index over points (if None, one is built)
+        rows: only compute the properties of these points (if None, every point)
+        normals: also return unit normals (12 bytes per point)
+        reach: also return the distance to each point's farthest neighbour
+
+    Returns:
+        dictionary of float32 arrays with one entry per point (or per row in rows order):
+        'residuals' (rms neighbourhood distance to the plane, as plane_residuals),
+        'curvature' (surface variation l0 / (l0 + l1 + l2), 0 on a plane, 1/3 when isotropic),
+        'roughness' (distance of the point itself to its neighbourhood plane) and
+        'normals' (N, 3) when requested, with unspecified sign, and 'reach' when requested
+    """
+    count = len(points) if rows is None else len(rows)
+    names = ('residuals', 'curvature', 'roughness') + (('reach',) if reach else ())
+    result = {name: np.empty(count, dtype=np.float32) for name in names}
+    if normals:
+        result['normals'] = np.empty((count, 3), dtype=np.float32)
+    n = min(k + 1, len(points))
+    scale = n / (n - 3) if n > 3 else 1.0
+    filled = 0
+    for block_rows, eigenvalues, eigenvectors, centroids, farthest in iter_neighbourhood_eigen(
+            points, k, chunk_size, index, rows):
+        values = _block_properties(points[block_rows], eigenvalues, eigenvectors, centroids, scale, normals)
+        if reach:
+            values['reach'] = farthest
+        #every point at its own index, or sampled rows in the order they were given
+        target = block_rows if rows is None else slice(filled, filled + len(block_rows))
+        for name, array in values.items():
+            result[name][target] = array
+        filled += len(block_rows)
+    return result
+
+
+def neighbour_properties(queries: np.ndarray, coords: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    plane residual, curvature and roughness of neighbourhoods gathered elsewhere,
+    e.g. merged from the chunks of a file
+
+    Args:
+        queries: the points (B, 3)
+        coords: coordinates of each point's neighbours (B, n, 3), the point included
+
+    Returns:
+        dictionary of float32 arrays (B,) with the keys of surface_properties
+    """
+    n = coords.shape[1]
+    scale = n / (n - 3) if n > 3 else 1.0
+    values = _block_properties(queries, *neighbourhood_eigen(coords), scale, False)
+    return {name: array.astype(np.float32) for name, array in values.items()}
+
+
+def residual_statistics(residuals: np.ndarray, k: int) -> Dict[str, float]:
+    """
+    summary statistics of plane-fit residuals
+
+    Args:
+        residuals: per-point residuals
+        k: number of neighbours the residuals were fitted with
+
+    Returns:
+        dictionary with mean, median, p95 and rms residual
+    """
+    residuals = residuals.astype(np.float64)
+    median, p95 = np.percentile(residuals, [50, 95])
+    return {
+        'mean': float(np.mean(residuals)),
+        'median': float(median),
+        'p95': float(p95),
+        'rms': float(np.sqrt(np.mean(residuals ** 2))),
+        'k': int(k)
+    }
+
+
+def local_noise_statistics(points: np.ndarray, k: int, chunk_size: int = 65536,
+                           index: Optional[VoxelHashIndex] = None) -> Dict[str, float]:
+    """
+    summary statistics of local plane-fit residuals
+
+    Args:
+        points: point cloud data (N, 3)
+        k: number of neighbours per point
+        chunk_size: number of points per block
+        index: prebuilt index over points (if None, one is built)
+
+    Returns:
+        dictionary with mean, median, p95 and rms residual
+    """
+    return residual_statistics(plane_residuals(points, k, chunk_size, index), k)
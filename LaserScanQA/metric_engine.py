@@ -0,0 +1,245 @@
+"""
+metric_engine - metric plugins sharing per-cloud intermediates computed in one fused pass
+"""
+
+import numpy as np
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from streaming import RunningMoments
+from voxel_grid import VoxelGrid
+
+#points per block of the fused pass; clouds up to this size are read once as a whole
+FUSED_CHUNK_ROWS = 1_000_000
+#intermediates every fused pass can produce, each from the same chunk reads
+FUSED_INTERMEDIATES = ('bbox', 'moments', 'voxel_grid')
+
+Requirements = Union[Tuple[str, ...], Callable[['CloudContext'], Iterable[str]]]
+
+
+@dataclass
+class MetricPlugin:
+    """
+    one metric and the intermediates it reads
+
+    Args:
+        name: metric name, the key of its value in the results
+        compute: function of a cloudcontext returning the metric value
+        requires: intermediate names, or a function of the context returning them
+            when they depend on the inputs (a reference cloud, say)
+        stage: profiler stage the metric is timed under (if None, its name)
+        version: bump it whenever the metric definition changes so cached results are recomputed
+    """
+    name: str
+    compute: Callable[['CloudContext'], Any]
+    requires: Requirements = ()
+    stage: Optional[str] = None
+    version: str = '1'
+
+    def requirements(self, context: 'CloudContext') -> Tuple[str, ...]:
+        """intermediates needed on this context"""
+        if callable(self.requires):
+            return tuple(self.requires(context))
+        return tuple(self.requires)
+
+
+@dataclass
+class Intermediate:
+    """a derived per-cloud value computed lazily from other intermediates"""
+    name: str
+    compute: Callable[['CloudContext'], Any]
+    requires: Tuple[str, ...] = ()
+    stage: Optional[str] = None
+
+
+class CloudContext:
+    """
+    one cloud, its inputs and every intermediate computed for it so far
+
+    intermediates are computed on first request and then shared by all metrics.
+    the fused ones (bbox, moments, voxel_grid) come from a single blocked pass
+    over the points, so asking for all three reads the cloud once and finds
+    each block's bounds once.
+    """
+
+    def __init__(self, engine: 'MetricEngine', points: np.ndarray,
+                 reference_points: Optional[np.ndarray] = None,
+                 profiler=None, voxel_size: float = 0.25, **inputs):
+        """
+        create a context
+
+        Args:
+            engine: engine whose intermediates are used
+            points: point cloud data (N, 3)
+            reference_points: optional reference cloud in the same coordinates
+            profiler: stageprofiler timing intermediates and metrics (None skips timing)
+            voxel_size: voxel edge length of the voxel_grid intermediate
+            inputs: further values metrics read but do not compute
+        """
+        self.engine = engine
+        self.points = points
+        self.reference_points = reference_points
+        self.profiler = profiler
+        self.voxel_size = voxel_size
+        self.inputs = inputs
+        #side results metrics report next to their values, e.g. noise statistics
+        self.details: Dict[str, Any] = {}
+        self.passes = 0
+        self._values: Dict[str, Any] = {}
+
+    @property
+    def has_reference(self) -> bool:
+        """whether a non-empty reference cloud was given"""
+        return self.reference_points is not None and len(self.reference_points) > 0
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._values
+
+    def __getitem__(self, name: str) -> Any:
+        self.require([name])
+        return self._values[name]
+
+    def set(self, name: str, value: Any):
+        """store an intermediate computed elsewhere so no metric recomputes it"""
+        self._values[name] = value
+
+    def stage(self, name: str):
+        """profiler stage context manager, or a no-op without a profiler"""
+        return nullcontext() if self.profiler is None else self.profiler.stage(name)
+
+    def require(self, names: Iterable[str]):
+        """
+        make sure intermediates are available, computing the missing ones
+
+        Args:
+            names: intermediate names
+        """
+        missing = [name for name in dict.fromkeys(names) if name not in self._values]
+        fused = [name for name in missing if name in FUSED_INTERMEDIATES]
+        if fused:
+            with self.stage('fused_pass'):
+                self._fused_pass(fused)
+        for name in missing:
+            if name in fused:
+                continue
+            intermediate = self.engine.intermediates.get(name)
+            if intermediate is None:
+                raise KeyError(f"unknown intermediate: {name}")
+            self.require(intermediate.requires)
+            with self.stage(intermediate.stage or name):
+                self._values[name] = intermediate.compute(self)
+
+    def _fused_pass(self, names: List[str]):
+        """compute the requested fused intermediates in one blocked pass over the points"""
+        moments = RunningMoments() if 'moments' in names else None
+        grid = VoxelGrid(self.voxel_size) if 'voxel_grid' in names else None
+        mins, maxs = np.full(3, np.inf), np.full(3, -np.inf)
+        points = self.points
+        for start in range(0, len(points), FUSED_CHUNK_ROWS):
+            chunk = points[start:start + FUSED_CHUNK_ROWS]
+            #each block's bounds are found once and handed to every accumulator
+            bounds = (np.min(chunk, axis=0), np.max(chunk, axis=0))
+            np.minimum(mins, bounds[0], out=mins)
+            np.maximum(maxs, bounds[1], out=maxs)
+            if moments is not None:
+                moments.update(chunk, bounds)
+            if grid is not None:
+                grid.update(chunk, bounds)
+        self.passes += 1
+        self._values['bbox'] = (mins, maxs)
+        if moments is not None:
+            self._values['moments'] = moments
+        if grid is not None:
+            self._values['voxel_grid'] = grid
+
+
+class MetricEngine:
+    """
+    registry of metric plugins and the intermediates they share
+
+    the built-in intermediates are bbox (mins, maxs), moments (runningmoments
+    with count, mean and std), voxel_grid (voxelgrid) and centroid. custom
+    metrics and intermediates register into the same engine and reuse them.
+    """
+
+    def __init__(self):
+        self.metrics: 'OrderedDict[str, MetricPlugin]' = OrderedDict()
+        self.intermediates: Dict[str, Intermediate] = {}
+        self.register_intermediate('centroid', lambda context: context['moments'].mean, ('moments',))
+
+    def register(self, name: str, compute: Callable[[CloudContext], Any],
+                 requires: Requirements = (), stage: Optional[str] = None,
+                 version: str = '1', replace: bool = False) -> MetricPlugin:
+        """
+        add a metric plugin
+
+        Args:
+            name: metric name
+            compute: function of a cloudcontext returning the metric value
+            requires: intermediates it reads (names or a function of the context)
+            stage: profiler stage name (if None, the metric name)
+            version: definition version, part of result cache keys
+            replace: allow replacing a metric of the same name
+
+        Returns:
+            the registered plugin
+        """
+        if name in self.metrics and not replace:
+            raise ValueError(f"metric already registered: {name}")
+        plugin = MetricPlugin(name, compute, requires, stage, version)
+        self.metrics[name] = plugin
+        return plugin
+
+    def unregister(self, name: str):
+        """remove a metric plugin"""
+        self.metrics.pop(name, None)
+
+    def register_intermediate(self, name: str, compute: Callable[[CloudContext], Any],
+                              requires: Tuple[str, ...] = (), stage: Optional[str] = None):
+        """
+        add a derived intermediate shared by every metric that requires it
+
+        Args:
+            name: intermediate name
+            compute: function of a cloudcontext returning the value
+            requires: intermediates it is derived from
+            stage: profiler stage name (if None, the intermediate name)
+        """
+        if name in FUSED_INTERMEDIATES:
+            raise ValueError(f"{name} is computed by the fused pass")
+        self.intermediates[name] = Intermediate(name, compute, tuple(requires), stage)
+
+    def context(self, points: np.ndarray, reference_points: Optional[np.ndarray] = None,
+                profiler=None, voxel_size: float = 0.25, **inputs) -> CloudContext:
+        """create a context for one cloud (see cloudcontext)"""
+        return CloudContext(self, points, reference_points, profiler, voxel_size, **inputs)
+
+    def run(self, context: CloudContext, names: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        compute metrics on a context
+
+        the union of their fused requirements is computed first, in one pass.
+
+        Args:
+            context: cloud context
+            names: metrics to compute, in this order (if None, every registered metric)
+
+        Returns:
+            mapping from metric name to value
+        """
+        plugins = [self.metrics[name] for name in (self.metrics if names is None else names)]
+        needed = [name for plugin in plugins for name in plugin.requirements(context)]
+        context.require([name for name in needed if name in FUSED_INTERMEDIATES])
+        results = {}
+        for plugin in plugins:
+            context.require(plugin.requirements(context))
+            with context.stage(plugin.stage or plugin.name):
+                results[plugin.name] = plugin.compute(context)
+        return results
+
+    def version(self, names: Optional[Iterable[str]] = None) -> str:
+        """names and versions of the metrics, for result cache keys"""
+        names = self.metrics if names is None else names
+        return ','.join(f"{name}@{self.metrics[name].version}" for name in names)
@@ -0,0 +1,166 @@
+"""
+metrics_history - bounded columnar store of past scan metrics with vectorized queries
+"""
+
+import numpy as np
+from typing import Any, Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+
+#scalar metric columns and their storage types
+COLUMNS = {
+    'point_count': np.int64,
+    'density': np.float64,
+    'noise_level': np.float64,
+    'completeness': np.float64,
+    'geometric_accuracy': np.float64,
+    'timestamp': np.float64,
+    'processing_time': np.float64
+}
+#rows allocated before the first growth step
+INITIAL_ROWS = 1024
+
+
+class MetricsHistory:
+    """
+    ring buffer of scan metrics stored as one numpy array per column
+
+    only the scalar metrics are kept (about 56 bytes per scan); per-scan
+    dictionaries such as noise statistics and profiles stay in the reports.
+    once capacity is reached the oldest entries are overwritten. the store grows
+    by doubling up to capacity, so short sessions do not preallocate it all.
+    """
+
+    def __init__(self, capacity: int = 100_000, factory: Optional[Callable[..., Any]] = None):
+        """
+        create an empty history
+
+        Args:
+            capacity: number of most recent scans retained
+            factory: builds the objects returned by iteration and indexing from
+                the column values as keyword arguments (plain dicts if None)
+        """
+        if capacity < 1:
+            raise ValueError("history capacity must be at least 1")
+        self.capacity = int(capacity)
+        self.factory = factory or dict
+        rows = min(self.capacity, INITIAL_ROWS)
+        self._columns = {name: np.zeros(rows, dtype=dtype) for name, dtype in COLUMNS.items()}
+        #position of the next write and number of valid rows
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self):
+        """double the allocated rows, up to capacity"""
+        rows = min(self.capacity, 2 * len(self._columns['timestamp']))
+        for name, column in self._columns.items():
+            grown = np.zeros(rows, dtype=column.dtype)
+            grown[:len(column)] = column
+            self._columns[name] = grown
+
+    def append(self, metrics):
+        """
+        record one scan
+
+        Args:
+            metrics: scanmetrics object (or anything with the same scalar attributes)
+        """
+        if self._next == len(self._columns['timestamp']) and self._next < self.capacity:
+            self._grow()
+        row = self._next
+        for name, column in self._columns.items():
+            column[row] = getattr(metrics, name)
+        self._next = (row + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        """drop every entry, keeping the allocated arrays"""
+        self._next = 0
+        self._size = 0
+
+    def _rows(self, window: Optional[int] = None) -> np.ndarray:
+        """positions of the last window entries (all if None), oldest first"""
+        count = self._size if window is None else max(0, min(int(window), self._size))
+        return (self._next - count + np.arange(count)) % len(self._columns['timestamp'])
+
+    def columns(self, window: Optional[int] = None, since: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """
+        copy of the stored columns, oldest first
+
+        Args:
+            window: only the most recent window scans (all if None)
+            since: only scans with timestamp >= since
+
+        Returns:
+            mapping from metric name to array
+        """
+        rows = self._rows(window)
+        if since is not None:
+            rows = rows[self._columns['timestamp'][rows] >= since]
+        return {name: column[rows] for name, column in self._columns.items()}
+
+    def _entry(self, row: int) -> Any:
+        """build the entry stored at one array position"""
+        return self.factory(**{name: column[row].item() for name, column in self._columns.items()})
+
+    def __iter__(self) -> Iterator[Any]:
+        """yield stored entries, oldest first"""
+        for row in self._rows():
+            yield self._entry(row)
+
+    def __getitem__(self, index: int) -> Any:
+        """return one entry (negative indices count from the newest)"""
+        if not -self._size <= index < self._size:
+            raise IndexError("metrics history index out of range")
+        return self._entry(self._rows()[index])
+
+    def percentile(self, name: str, q: Union[float, Sequence[float]],
+                   window: Optional[int] = None, since: Optional[float] = None) -> Union[float, np.ndarray]:
+        """
+        percentiles of one metric column
+
+        Args:
+            name: column name, e.g. 'processing_time'
+            q: percentile or sequence of percentiles in [0, 100]
+            window: only the most recent window scans (all if None)
+            since: only scans with timestamp >= since
+
+        Returns:
+            percentile value(s), nan when no scans match
+        """
+        values = self.columns(window, since)[name]
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else float('nan')
+        result = np.percentile(values, q)
+        return float(result) if np.ndim(result) == 0 else result
+
+    def pass_rates(self, rules: Dict[str, Tuple[str, float]], window: Optional[int] = None,
+                   since: Optional[float] = None) -> Dict[str, float]:
+        """
+        fraction of scans passing each metric's threshold, plus all of them at once
+
+        Args:
+            rules: mapping from column name to (comparison, threshold) where
+                comparison is '>=' or '<='
+            window: only the most recent window scans (all if None)
+            since: only scans with timestamp >= since
+
+        Returns:
+            pass rate per metric and under 'all', nan when no scans match
+        """
+        columns = self.columns(window, since)
+        count = len(columns['timestamp'])
+        passed_all = np.ones(count, dtype=bool)
+        rates = {}
+        for name, (comparison, threshold) in rules.items():
+            if comparison == '>=':
+                passed = columns[name] >= threshold
+            elif comparison == '<=':
+                passed = columns[name] <= threshold
+            else:
+                raise ValueError(f"unknown comparison: {comparison}")
+            passed_all &= passed
+            rates[name] = float(passed.mean()) if count else float('nan')
+        rates['all'] = float(passed_all.mean()) if count else float('nan')
+        return rates
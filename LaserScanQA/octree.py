@@ -0,0 +1,232 @@
+"""
+octree - linear morton-ordered octree for level-of-detail metrics and region queries
+"""
+
+import numpy as np
+from typing import Callable, Optional, Tuple
+
+from spatial_index import morton_decode, morton_encode
+
+#levels below the root; keeps (key + 1) << 3 * depth inside int64
+MAX_DEPTH = 20
+#points binned per block while the morton codes are computed
+OCTREE_CHUNK_ROWS = 1_000_000
+
+#classifies node boxes (lo, hi) into fully inside and fully outside a query region
+Classifier = Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def expand_ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    every position of a set of half-open ranges
+
+    Args:
+        starts: range starts (M,)
+        ends: range ends (M,)
+
+    Returns:
+        int64 positions (sum of the range lengths,)
+    """
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    #each range continues counting from its own start
+    steps = np.ones(total, dtype=np.int64)
+    firsts = np.cumsum(lengths) - lengths
+    nonempty = lengths > 0
+    steps[firsts[nonempty]] = starts[nonempty] - np.r_[0, ends[nonempty][:-1] - 1]
+    return np.cumsum(steps)
+
+
+class Octree:
+    """
+    points sorted along a morton curve, with every octree level implicit in the codes
+
+    each point gets the morton code of its leaf cell; after one sort a node at
+    any level is the contiguous run of codes sharing its prefix, found with two
+    binary searches. no node objects are stored, so building costs one
+    encoding pass and one argsort, and a region query visits only the nodes
+    crossing the region boundary.
+    """
+
+    def __init__(self, points: np.ndarray, leaf_size: float = 0.25,
+                 offset: Optional[np.ndarray] = None):
+        """
+        build the octree of a point cloud
+
+        Args:
+            points: point cloud data (N, 3), not copied or reordered
+            leaf_size: edge length of the finest cells (enlarged if the cloud
+                needs more than 2**20 of them per axis)
+            offset: position of the points' coordinate zero in the query frame,
+                for points stored relative to a scan origin
+        """
+        if len(points) == 0:
+            raise ValueError("cannot build an octree of an empty point cloud")
+        self.points = points
+        self.offset = np.zeros(3) if offset is None else np.asarray(offset, dtype=np.float64)
+        mins = np.min(points, axis=0).astype(np.float64)
+        extent = float(np.max(np.max(points, axis=0) - mins))
+        #two cells of slack for the origin snapping down and the maximum itself
+        leaf_size = max(float(leaf_size), extent / ((1 << MAX_DEPTH) - 2))
+        #leaf cells are aligned to multiples of leaf_size like voxel grids
+        self.origin = np.floor(mins / leaf_size) * leaf_size
+        self.leaf_size = leaf_size
+        cells_needed = int(np.ceil((extent + (mins - self.origin).max()) / leaf_size)) + 1
+        self.depth = min(max(int(np.ceil(np.log2(cells_needed))), 1), MAX_DEPTH)
+
+        codes = np.empty(len(points), dtype=np.int64)
+        limit = (1 << self.depth) - 1
+        for start in range(0, len(points), OCTREE_CHUNK_ROWS):
+            chunk = np.asarray(points[start:start + OCTREE_CHUNK_ROWS], dtype=np.float64)
+            cells = np.clip(np.floor((chunk - self.origin) / leaf_size), 0, limit).astype(np.int64)
+            codes[start:start + len(chunk)] = morton_encode(cells)
+        self.order = np.argsort(codes, kind='stable')
+        self.codes = codes[self.order]
+        #first position of every occupied leaf
+        self.leaf_starts = np.flatnonzero(np.r_[True, self.codes[1:] != self.codes[:-1]])
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        """bytes held besides the points"""
+        return self.codes.nbytes + self.order.nbytes + self.leaf_starts.nbytes
+
+    def node_size(self, level: int) -> float:
+        """edge length of the nodes of a level (0 is the root, depth the leaves)"""
+        return self.leaf_size * (1 << (self.depth - level))
+
+    def nodes(self, level: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        occupied nodes of one level
+
+        Args:
+            level: 0 (root) to depth (leaves)
+
+        Returns:
+            tuple of node keys, start and end positions in morton order
+        """
+        shift = 3 * (self.depth - level)
+        starts = self.leaf_starts
+        if shift:
+            prefixes = self.codes[starts] >> shift
+            starts = starts[np.r_[True, prefixes[1:] != prefixes[:-1]]]
+        ends = np.r_[starts[1:], len(self.codes)]
+        return self.codes[starts] >> shift, starts, ends
+
+    def ranges(self, level: int, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        morton-order positions of the points in nodes of one level
+
+        Args:
+            level: node level
+            keys: node keys (M,)
+
+        Returns:
+            tuple of start and end positions (M,), equal for empty nodes
+        """
+        shift = 3 * (self.depth - level)
+        return (np.searchsorted(self.codes, keys << shift),
+                np.searchsorted(self.codes, (keys + 1) << shift))
+
+    def node_bounds(self, level: int, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """minimum and maximum corners (M, 3) of nodes of one level"""
+        size = self.node_size(level)
+        lo = self.origin + morton_decode(keys) * size
+        return lo, lo + size
+
+    def indices(self, positions: np.ndarray) -> np.ndarray:
+        """original point indices of morton-order positions, sorted"""
+        return np.sort(self.order[positions])
+
+    def level_points(self, level: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        level-of-detail cloud: one centroid per occupied node
+
+        Args:
+            level: node level; coarser levels give fewer, more averaged points
+
+        Returns:
+            tuple of centroids (M, 3) in the points' frame and point counts (M,)
+        """
+        _, starts, ends = self.nodes(level)
+        sums = np.add.reduceat(np.asarray(self.points, dtype=np.float64)[self.order], starts, axis=0)
+        counts = ends - starts
+        return sums / counts[:, None], counts
+
+    def _query(self, classify: Classifier, contains: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        indices of the points in a region, descending only into boundary nodes
+
+        nodes fully inside contribute their whole position range, nodes fully
+        outside are dropped, and only the points of leaves crossing the
+        boundary are tested one by one.
+        """
+        pad = 1e-6 * self.leaf_size
+        keys = np.zeros(1, dtype=np.int64)
+        inside_starts, inside_ends = [], []
+        for level in range(self.depth + 1):
+            lo, hi = self.node_bounds(level, keys)
+            inside, outside = classify(lo - pad, hi + pad)
+            starts, ends = self.ranges(level, keys[inside])
+            inside_starts.append(starts)
+            inside_ends.append(ends)
+            keys = keys[~inside & ~outside]
+            if len(keys) == 0 or level == self.depth:
+                break
+            children = (keys[:, None] * 8 + np.arange(8)).ravel()
+            starts, ends = self.ranges(level + 1, children)
+            keys = children[ends > starts]
+
+        positions = [expand_ranges(np.concatenate(inside_starts), np.concatenate(inside_ends))]
+        if len(keys) and level == self.depth:
+            #leaves crossing the boundary
+            starts, ends = self.ranges(self.depth, keys)
+            candidates = expand_ranges(starts, ends)
+            points = np.asarray(self.points[self.order[candidates]], dtype=np.float64)
+            positions.append(candidates[contains(points)])
+        return self.indices(np.concatenate(positions))
+
+    def crop(self, mins: np.ndarray, maxs: np.ndarray) -> np.ndarray:
+        """
+        points inside an axis-aligned box
+
+        Args:
+            mins: minimum corner (3,) in the query frame
+            maxs: maximum corner (3,) in the query frame
+
+        Returns:
+            sorted indices of the points with mins <= p <= maxs
+        """
+        mins = np.asarray(mins, dtype=np.float64) - self.offset
+        maxs = np.asarray(maxs, dtype=np.float64) - self.offset
+
+        def classify(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            inside = np.all(lo >= mins, axis=1) & np.all(hi <= maxs, axis=1)
+            outside = np.any(hi < mins, axis=1) | np.any(lo > maxs, axis=1)
+            return inside, outside
+
+        return self._query(classify, lambda p: np.all((p >= mins) & (p <= maxs), axis=1))
+
+    def within(self, center: np.ndarray, radius: float) -> np.ndarray:
+        """
+        points within a radius of a center
+
+        Args:
+            center: query point (3,) in the query frame
+            radius: search radius
+
+        Returns:
+            sorted indices of the points with |p - center| <= radius
+        """
+        center = np.asarray(center, dtype=np.float64) - self.offset
+
+        def classify(lo: np.ndarray, hi: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            nearest = np.linalg.norm(np.clip(center, lo, hi) - center, axis=1)
+            farthest = np.linalg.norm(np.maximum(np.abs(center - lo), np.abs(center - hi)), axis=1)
+            return farthest <= radius, nearest > radius
+
+        return self._query(classify, lambda p: np.einsum('ij,ij->i', p - center, p - center) <= radius * radius)
@@ -0,0 +1,90 @@
+"""
+outlier_filter - statistical and radius outlier removal from blocked k-nearest-neighbour queries
+"""
+
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from spatial_index import VoxelHashIndex
+
+#outlier removal methods accepted by outlier_mask
+OUTLIER_METHODS = ('statistical', 'radius', 'both')
+
+
+def neighbour_distance_summary(points: np.ndarray, k: int, nth: int, chunk_size: int = 65536,
+                               index: Optional[VoxelHashIndex] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    mean distance to the k nearest other points and distance to the nth nearest, per point
+
+    blocks are visited in grid order like the noise engine and reduced right
+    away, so only one block of neighbour distances exists at a time and the
+    result takes two values per point whatever k is.
+
+    Args:
+        points: point cloud data (N, 3)
+        k: neighbours averaged per point
+        nth: rank of the neighbour whose distance is returned (1 is the nearest)
+        chunk_size: number of points per block
+        index: prebuilt index over points (if None, one is built)
+
+    Returns:
+        tuple of mean distances (N,) and nth-neighbour distances (N,), in the points' dtype
+    """
+    neighbours = max(k, nth)
+    if index is None:
+        index = VoxelHashIndex(points, target_occupancy=max(8.0, 2.0 * neighbours))
+    mean_distances = np.empty(len(points), dtype=index.points.dtype)
+    nth_distances = np.empty(len(points), dtype=index.points.dtype)
+    for start in range(0, len(index), chunk_size):
+        rows = index.order[start:start + chunk_size]
+        distances, _ = index.query(index.points[start:start + chunk_size], k=neighbours + 1,
+                                   chunk_size=chunk_size)
+        #the first neighbour of every point is the point itself (or a duplicate at distance 0)
+        mean_distances[rows] = distances[:, 1:k + 1].mean(axis=1)
+        nth_distances[rows] = distances[:, nth]
+    return mean_distances, nth_distances
+
+
+def outlier_mask(points: np.ndarray, method: str = 'statistical', k: int = 8,
+                 std_ratio: float = 2.0, radius: float = 0.1, min_neighbors: int = 3,
+                 chunk_size: int = 65536) -> Tuple[np.ndarray, Dict[str, int]]:
+    """
+    flag isolated points such as flying pixels
+
+    statistical removal drops points whose mean distance to their k nearest
+    neighbours is more than std_ratio standard deviations above the cloud's
+    mean; radius removal drops points with fewer than min_neighbors other points
+    within radius. both share one neighbour query.
+
+    Args:
+        points: point cloud data (N, 3)
+        method: 'statistical', 'radius' or 'both'
+        k: neighbours per point for statistical removal
+        std_ratio: allowed standard deviations above the mean neighbour distance
+        radius: search radius for radius removal
+        min_neighbors: points required within radius (at least 1)
+        chunk_size: number of points per query block
+
+    Returns:
+        tuple of keep mask (N,) and the number of points each test removed
+        (a point failing both tests is counted under each)
+    """
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"unknown outlier method: {method}")
+    tests = ['statistical', 'radius'] if method == 'both' else [method]
+    keep = np.ones(len(points), dtype=bool)
+    if len(points) <= max(k, min_neighbors):
+        return keep, {test: 0 for test in tests}
+
+    mean_distances, nth_distances = neighbour_distance_summary(points, k, max(min_neighbors, 1), chunk_size)
+    removed = {}
+    for test in tests:
+        if test == 'statistical':
+            limit = mean_distances.mean(dtype=np.float64) + std_ratio * mean_distances.std(dtype=np.float64)
+            inliers = mean_distances <= limit
+        else:
+            #a point has min_neighbors within radius exactly when its min_neighbors-th neighbour is
+            inliers = nth_distances <= radius
+        removed[test] = int(len(points) - np.count_nonzero(inliers))
+        keep &= inliers
+    return keep, removed
@@ -0,0 +1,312 @@
+"""
+point_attributes - typed per-point attributes (intensity, rgb, returns) read column by column
+"""
+
+import numpy as np
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pointcloud_io import (COORDINATE_COLUMNS, csv_column_names, iter_csv_chunks, read_las_header,
+                           read_ply_header, sniff_csv)
+
+#storage type of every supported attribute; rgb is (N, 3)
+ATTRIBUTE_DTYPES = {
+    'intensity': np.uint16,
+    'return_number': np.uint8,
+    'number_of_returns': np.uint8,
+    'classification': np.uint8,
+    'rgb': np.uint8
+}
+#field names each attribute goes by in ply vertices, npy records and csv headers
+ATTRIBUTE_FIELDS = {
+    'intensity': (('intensity',), ('scalar_intensity',), ('i',)),
+    'return_number': (('return_number',), ('returnnumber',), ('scalar_return_number',)),
+    'number_of_returns': (('number_of_returns',), ('numberofreturns',), ('num_returns',)),
+    'classification': (('classification',), ('class',)),
+    'rgb': (('red', 'green', 'blue'), ('r', 'g', 'b'))
+}
+#column of each attribute in header-less csv files and plain npy arrays
+DEFAULT_ATTRIBUTE_COLUMNS = {'intensity': 3, 'return_number': 4}
+#byte offset of the red, green and blue fields for each las point format that has them
+LAS_RGB_OFFSETS = {2: 20, 3: 28, 5: 28, 7: 30, 8: 30, 10: 30}
+
+Columns = Dict[str, Union[int, Sequence[int]]]
+
+
+def _typed(name: str, values: np.ndarray) -> np.ndarray:
+    """convert raw attribute values to the attribute's storage type"""
+    dtype = ATTRIBUTE_DTYPES[name]
+    if values.dtype == dtype:
+        return np.array(values)
+    if name == 'rgb' and values.dtype.kind in 'ui' and values.dtype.itemsize > 1:
+        #16-bit colour channels, as las stores them
+        values = values >> 8
+    elif values.dtype.kind == 'f':
+        values = np.rint(values)
+    info = np.iinfo(dtype)
+    return np.clip(values, info.min, info.max).astype(dtype)
+
+
+def _check_names(names: Iterable[str]) -> List[str]:
+    """validate attribute names"""
+    names = list(dict.fromkeys(names))
+    unknown = [name for name in names if name not in ATTRIBUTE_DTYPES]
+    if unknown:
+        raise ValueError(f"unknown attributes {unknown}; supported: {list(ATTRIBUTE_DTYPES)}")
+    return names
+
+
+def _match_fields(available: Sequence[str], names: List[str]) -> Dict[str, Tuple[str, ...]]:
+    """fields holding each wanted attribute, by case-insensitive name"""
+    lookup = {field.lower(): field for field in available}
+    fields = {}
+    for name in names:
+        for candidate in ATTRIBUTE_FIELDS[name]:
+            if all(part in lookup for part in candidate):
+                fields[name] = tuple(lookup[part] for part in candidate)
+                break
+    return fields
+
+
+def _record_chunks(records: np.ndarray, fields: Dict[str, Tuple[str, ...]],
+                   chunk_rows: int) -> Iterator[Dict[str, np.ndarray]]:
+    """typed attributes of structured records, chunk by chunk"""
+    for start in range(0, len(records), chunk_rows):
+        block = records[start:start + chunk_rows]
+        chunk = {}
+        for name, parts in fields.items():
+            if len(parts) == 1:
+                chunk[name] = _typed(name, block[parts[0]])
+            else:
+                chunk[name] = _typed(name, np.stack([block[part] for part in parts], axis=1))
+        yield chunk
+
+
+def _las_chunks(file_path: str, names: List[str], chunk_rows: int) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    typed attributes of an uncompressed las file
+
+    only the bytes of the requested fields are read from the memory-mapped records.
+    """
+    header = read_las_header(file_path)
+    point_format = header['point_format'] & 0x3F
+    #formats 6 and up widened the return fields to 4 bits and moved classification
+    extended = point_format >= 6
+    fields, offsets, formats = [], [], []
+
+    def add(field: str, offset: int, fmt: str):
+        fields.append(field)
+        offsets.append(offset)
+        formats.append(fmt)
+
+    if 'intensity' in names:
+        add('intensity', 12, '<u2')
+    if 'return_number' in names or 'number_of_returns' in names:
+        add('returns', 14, 'u1')
+    if 'classification' in names:
+        add('classification', 16 if extended else 15, 'u1')
+    if 'rgb' in names and point_format in LAS_RGB_OFFSETS:
+        for i, channel in enumerate(('red', 'green', 'blue')):
+            add(channel, LAS_RGB_OFFSETS[point_format] + 2 * i, '<u2')
+    if not fields:
+        return
+    record = np.dtype({'names': fields, 'formats': formats, 'offsets': offsets,
+                       'itemsize': header['record_length']})
+    records = np.memmap(file_path, dtype=record, mode='r', offset=header['data_offset'],
+                        shape=(header['point_count'],))
+    bits, mask = (4, 0x0F) if extended else (3, 0x07)
+    for start in range(0, len(records), chunk_rows):
+        block = records[start:start + chunk_rows]
+        chunk = {}
+        if 'intensity' in fields:
+            chunk['intensity'] = np.array(block['intensity'], dtype=np.uint16)
+        if 'returns' in fields:
+            returns = np.array(block['returns'])
+            if 'return_number' in names:
+                chunk['return_number'] = returns & mask
+            if 'number_of_returns' in names:
+                chunk['number_of_returns'] = (returns >> bits) & mask
+        if 'classification' in fields:
+            #the low 5 bits are the class in the legacy formats, the rest are flags
+            classes = np.array(block['classification'])
+            chunk['classification'] = classes if extended else classes & 0x1F
+        if 'red' in fields:
+            chunk['rgb'] = _typed('rgb', np.stack([block['red'], block['green'], block['blue']], axis=1))
+        yield chunk
+
+
+def _column_indices(names: List[str], column_names: Optional[List[str]],
+                    columns: Optional[Columns], n_columns: int) -> Dict[str, Tuple[int, ...]]:
+    """columns holding each wanted attribute, by header name or by configured index"""
+    if column_names is not None:
+        fields = _match_fields(column_names, names)
+        return {name: tuple(column_names.index(part) for part in parts) for name, parts in fields.items()}
+    columns = DEFAULT_ATTRIBUTE_COLUMNS if columns is None else columns
+    indices = {}
+    for name in names:
+        if name not in columns:
+            continue
+        index = columns[name]
+        index = (index,) if np.isscalar(index) else tuple(index)
+        #columns past the end of the file are attributes it does not have
+        if all(COORDINATE_COLUMNS[-1] < i < n_columns for i in index):
+            indices[name] = index
+    return indices
+
+
+def _array_chunks(parse: Callable[[], Iterator[np.ndarray]], indices: Dict[str, Tuple[int, ...]],
+                  positions: Dict[int, int]) -> Iterator[Dict[str, np.ndarray]]:
+    """typed attributes from blocks holding the selected columns"""
+    for block in parse():
+        chunk = {}
+        for name, index in indices.items():
+            cols = [positions[i] for i in index]
+            chunk[name] = _typed(name, block[:, cols[0]] if len(cols) == 1 else block[:, cols])
+        yield chunk
+
+
+def iter_attribute_chunks(file_path: str, names: Iterable[str], chunk_rows: int = 1_000_000,
+                          columns: Optional[Columns] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    stream typed attributes of any supported point file in chunks
+
+    chunks line up with the coordinate chunks of iter_point_chunks. only the
+    requested attributes are read: las and ply records are memory-mapped with
+    just their fields, csv parsing skips every other column. attributes a file
+    does not have are left out of the chunks.
+
+    Args:
+        file_path: path to point cloud file
+        names: attribute names, keys of ATTRIBUTE_DTYPES
+        chunk_rows: maximum number of points per chunk
+        columns: column index of each attribute (a list of three for rgb) in
+            header-less csv files and plain npy arrays (if None, the defaults)
+
+    Returns:
+        iterator of dictionaries from attribute name to typed array
+    """
+    names = _check_names(names)
+    if not names:
+        return
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.las':
+        yield from _las_chunks(file_path, names, chunk_rows)
+    elif suffix == '.ply':
+        count, record, offset = read_ply_header(file_path)
+        vertices = np.memmap(file_path, dtype=record, mode='r', offset=offset, shape=(count,))
+        yield from _record_chunks(vertices, _match_fields(record.names, names), chunk_rows)
+    elif suffix == '.npy':
+        array = np.load(file_path, mmap_mode='r')
+        if array.dtype.names:
+            yield from _record_chunks(array, _match_fields(array.dtype.names, names), chunk_rows)
+            return
+        indices = _column_indices(names, None, columns, array.shape[1])
+        positions = {i: i for index in indices.values() for i in index}
+        yield from _array_chunks(lambda: (array[start:start + chunk_rows]
+                                          for start in range(0, len(array), chunk_rows)),
+                                 indices, positions)
+    elif suffix == '.csv':
+        _, n_columns = sniff_csv(file_path)
+        indices = _column_indices(names, csv_column_names(file_path), columns, n_columns)
+        if not indices:
+            return
+        selected = sorted({i for index in indices.values() for i in index})
+        positions = {i: position for position, i in enumerate(selected)}
+        yield from _array_chunks(lambda: iter_csv_chunks(file_path, chunk_rows, columns=selected),
+                                 indices, positions)
+    else:
+        raise ValueError(f"unsupported file format: {file_path}")
+
+
+def read_attributes(file_path: str, names: Iterable[str],
+                    columns: Optional[Columns] = None) -> Dict[str, np.ndarray]:
+    """
+    read typed attributes of a whole point file
+
+    Args:
+        file_path: path to point cloud file
+        names: attribute names, keys of ATTRIBUTE_DTYPES
+        columns: attribute columns of header-less csv and plain npy files
+
+    Returns:
+        dictionary from attribute name to typed array (N,) or (N, 3) for rgb,
+        holding only the attributes the file has
+    """
+    parts: Dict[str, List[np.ndarray]] = {}
+    for chunk in iter_attribute_chunks(file_path, names, columns=columns):
+        for name, values in chunk.items():
+            parts.setdefault(name, []).append(values)
+    return {name: values[0] if len(values) == 1 else np.concatenate(values)
+            for name, values in parts.items()}
+
+
+class AttributeStatistics:
+    """
+    running statistics of typed attributes
+
+    intensities are uint16, so a 65536-bin histogram gives exact medians and
+    percentiles whether the attributes arrive whole or chunk by chunk.
+    """
+
+    def __init__(self):
+        self.intensity = np.zeros(1 << 16, dtype=np.int64)
+        self.return_numbers = np.zeros(1 << 8, dtype=np.int64)
+        self.returns_per_pulse = np.zeros(1 << 8, dtype=np.int64)
+        self.rgb_sum = np.zeros(3, dtype=np.float64)
+        self.rgb_count = 0
+
+    def update(self, attributes: Dict[str, np.ndarray]):
+        """
+        add one chunk of attributes
+
+        Args:
+            attributes: dictionary from attribute name to typed array
+        """
+        if 'intensity' in attributes:
+            self.intensity += np.bincount(attributes['intensity'], minlength=1 << 16)
+        if 'return_number' in attributes:
+            self.return_numbers += np.bincount(attributes['return_number'], minlength=1 << 8)
+        if 'number_of_returns' in attributes:
+            self.returns_per_pulse += np.bincount(attributes['number_of_returns'], minlength=1 << 8)
+        if 'rgb' in attributes:
+            self.rgb_sum += attributes['rgb'].sum(axis=0, dtype=np.float64)
+            self.rgb_count += len(attributes['rgb'])
+
+    def summary(self, low_intensity: int = 1000) -> Dict:
+        """
+        json-ready statistics of the attributes seen
+
+        Args:
+            low_intensity: intensity below which a return counts as low
+
+        Returns:
+            intensity statistics with the low-return ratio, return ratios and the
+            mean colour, for whichever attributes were present
+        """
+        summary = {}
+        count = int(self.intensity.sum())
+        if count:
+            values = np.arange(len(self.intensity))
+            cumulative = np.cumsum(self.intensity)
+
+            def percentile(q: float) -> int:
+                return int(np.searchsorted(cumulative, q / 100.0 * (count - 1), side='right'))
+
+            summary['intensity'] = {
+                'mean': float(np.dot(values, self.intensity) / count),
+                'median': percentile(50),
+                'p5': percentile(5),
+                'p95': percentile(95),
+                'low_intensity': low_intensity,
+                'low_return_ratio': float(self.intensity[:low_intensity].sum() / count)
+            }
+        returns = {}
+        if self.return_numbers.any():
+            returns['first_return_ratio'] = float(self.return_numbers[1] / self.return_numbers.sum())
+        if self.returns_per_pulse.any():
+            returns['multi_return_ratio'] = float(self.returns_per_pulse[2:].sum() / self.returns_per_pulse.sum())
+        if returns:
+            summary['returns'] = returns
+        if self.rgb_count:
+            summary['rgb'] = {'mean': (self.rgb_sum / self.rgb_count).tolist()}
+        return summary
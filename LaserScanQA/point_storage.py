@@ -0,0 +1,203 @@
+"""
+point_storage - compact float32 or int32-quantized point clouds relative to a per-scan origin
+"""
+
+import numpy as np
+from pathlib import Path
+from typing import Optional
+
+from pointcloud_io import (READERS, count_lines, iter_point_chunks, read_las_header,
+                           read_las_records, sniff_csv)
+
+#storage precisions and the dtype of their coordinates
+PRECISIONS = {'float64': np.float64, 'float32': np.float32, 'int32': np.int32}
+#largest quantized offset from the origin that fits in int32
+INT32_LIMIT = np.iinfo(np.int32).max
+
+
+class CompactPoints:
+    """
+    point cloud stored as offsets from a per-scan origin
+
+    float32 storage keeps offsets directly; int32 storage keeps them as integer
+    multiples of a per-axis scale, the way las files store coordinates. storing
+    offsets instead of absolute coordinates keeps millimetre fidelity on
+    georeferenced scans, whose absolute coordinates do not fit float32 precision.
+    metrics are computed on float32 offsets (local()), so both modes take half
+    the memory and bandwidth of float64 arrays.
+    """
+
+    def __init__(self, data: np.ndarray, origin: np.ndarray, scale: Optional[np.ndarray] = None):
+        """
+        wrap already encoded offsets
+
+        Args:
+            data: float32 offsets or int32 quantized offsets (N, 3)
+            origin: world coordinates of the zero offset (3,)
+            scale: per-axis size of one int32 step (ignored for float32 data)
+        """
+        if data.dtype not in (np.float32, np.int32):
+            raise ValueError(f"compact points need float32 or int32 data, not {data.dtype}")
+        self.data = data
+        self.origin = np.asarray(origin, dtype=np.float64).reshape(3)
+        self.scale = np.ones(3) if scale is None else np.broadcast_to(
+            np.asarray(scale, dtype=np.float64), (3,)).copy()
+
+    @classmethod
+    def empty(cls, count: int, precision: str, origin: np.ndarray,
+              scale: float = 0.001) -> 'CompactPoints':
+        """allocate storage for count points in the given precision ('float32' or 'int32')"""
+        if precision not in ('float32', 'int32'):
+            raise ValueError(f"unknown compact precision: {precision}")
+        return cls(np.empty((count, 3), dtype=PRECISIONS[precision]), origin,
+                   scale if precision == 'int32' else None)
+
+    @classmethod
+    def from_points(cls, points: np.ndarray, precision: str = 'float32', scale: float = 0.001,
+                    origin: Optional[np.ndarray] = None,
+                    chunk_rows: int = 1_000_000) -> 'CompactPoints':
+        """
+        encode a float point cloud
+
+        Args:
+            points: point cloud data (N, 3)
+            precision: 'float32' or 'int32'
+            scale: size of one int32 step in point cloud units
+            origin: world coordinates of the zero offset (if None, the floor of the
+                cloud minimum, so whole-unit voxel lattices line up with world ones)
+            chunk_rows: points converted at a time, bounding float64 temporaries
+
+        Returns:
+            compact point cloud
+        """
+        if origin is None:
+            origin = np.floor(np.min(points, axis=0)) if len(points) else np.zeros(3)
+        compact = cls.empty(len(points), precision, origin, scale)
+        for start in range(0, len(points), chunk_rows):
+            compact.data[start:start + chunk_rows] = compact.encode(points[start:start + chunk_rows])
+        return compact
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def precision(self) -> str:
+        """'float32' or 'int32'"""
+        return self.data.dtype.name
+
+    @property
+    def nbytes(self) -> int:
+        """bytes held by the coordinates"""
+        return self.data.nbytes
+
+    def encode(self, points: np.ndarray) -> np.ndarray:
+        """
+        convert world coordinates to this cloud's storage type
+
+        Args:
+            points: point cloud data (B, 3)
+
+        Returns:
+            float32 offsets or int32 quantized offsets (B, 3)
+        """
+        offsets = np.asarray(points, dtype=np.float64) - self.origin
+        if self.data.dtype == np.float32:
+            return offsets.astype(np.float32)
+        steps = np.rint(offsets / self.scale)
+        if len(steps) and np.abs(steps).max() > INT32_LIMIT:
+            raise ValueError("points are too far from the origin for int32 storage at this scale")
+        return steps.astype(np.int32)
+
+    def local(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        float32 offsets from the origin, the working coordinates of the metric kernels
+
+        Args:
+            start: first point
+            stop: end of the range (if None, the last point)
+
+        Returns:
+            float32 array (B, 3); a view for float32 storage
+        """
+        block = self.data[start:stop]
+        if block.dtype == np.float32:
+            return block
+        return np.multiply(block, self.scale.astype(np.float32), dtype=np.float32)
+
+    def to_local(self, points: np.ndarray) -> np.ndarray:
+        """express other world coordinates (a reference cloud, say) as float32 offsets in this frame"""
+        return (np.asarray(points, dtype=np.float64) - self.origin).astype(np.float32)
+
+    def world(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        decode a range of points back to float64 world coordinates
+
+        Args:
+            start: first point
+            stop: end of the range (if None, the last point)
+
+        Returns:
+            float64 array (B, 3)
+        """
+        return self.data[start:stop] * self.scale + self.origin
+
+
+def _count_points(file_path: str) -> int:
+    """number of points in a file (an upper bound for csv, whose blank lines are dropped)"""
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.csv':
+        skip, _ = sniff_csv(file_path)
+        return count_lines(file_path, skip)
+    if suffix == '.las':
+        return read_las_header(file_path)['point_count']
+    if suffix not in READERS:
+        raise ValueError(f"unsupported file format: {file_path}")
+    #npy and ply readers only memory-map the file
+    return len(READERS[suffix](file_path))
+
+
+def load_compact_points(file_path: str, precision: str = 'float32', scale: float = 0.001,
+                        chunk_rows: int = 1_000_000) -> CompactPoints:
+    """
+    load any supported point file straight into compact storage
+
+    the file is converted chunk by chunk into a preallocated array, so no float64
+    copy of the whole cloud is ever held. las files loaded as int32 keep their
+    own integer coordinates and scale; only the origin moves from the header
+    offset to the floor of the cloud's minimum, so float32 offsets stay small.
+
+    Args:
+        file_path: path to point cloud file
+        precision: 'float32' or 'int32'
+        scale: size of one int32 step in point cloud units
+        chunk_rows: points converted at a time
+
+    Returns:
+        compact point cloud
+    """
+    if precision == 'int32' and Path(file_path).suffix.lower() == '.las':
+        records, header = read_las_records(file_path)
+        data = np.column_stack([records['X'], records['Y'], records['Z']]).astype(np.int32, copy=False)
+        offset = np.asarray(header['offset'], dtype=np.float64)
+        scale = np.asarray(header['scale'], dtype=np.float64)
+        if not len(data):
+            return CompactPoints(data, offset, scale)
+        #whole steps between the header offset and the floor of the minimum corner
+        low = data.min(axis=0) * scale + offset
+        shift = np.floor((np.floor(low) - offset) / scale).astype(np.int64)
+        np.subtract(data, shift.astype(np.int32), out=data)
+        return CompactPoints(data, offset + shift * scale, scale)
+
+    compact = None
+    filled = 0
+    for chunk in iter_point_chunks(file_path, chunk_rows):
+        if compact is None:
+            #the first chunk fixes the origin; any point of the scan keeps offsets small
+            compact = CompactPoints.empty(_count_points(file_path), precision,
+                                          np.floor(np.min(chunk, axis=0)), scale)
+        compact.data[filled:filled + len(chunk)] = compact.encode(chunk)
+        filled += len(chunk)
+    if compact is None:
+        return CompactPoints.empty(0, precision, np.zeros(3), scale)
+    compact.data = compact.data[:filled]
+    return compact
@@ -0,0 +1,507 @@
+"""
+pointcloud_io - fast chunked readers for point cloud files
+"""
+
+import io
+import numpy as np
+from pathlib import Path
+from numpy.lib.recfunctions import structured_to_unstructured
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+#bytes of text parsed per block by the csv reader
+CSV_BLOCK_BYTES = 4 * 1024 * 1024
+#leading lines inspected when looking for a header
+CSV_SNIFF_LINES = 16
+#columns holding x, y, z in csv files and plain arrays
+COORDINATE_COLUMNS = (0, 1, 2)
+
+
+def _is_numeric_line(line: bytes, delimiter: bytes) -> bool:
+    """return true if every field of a csv line parses as a float"""
+    try:
+        [float(field) for field in line.strip().split(delimiter)]
+        return True
+    except ValueError:
+        return False
+
+
+def sniff_csv(file_path: str, delimiter: str = ',') -> Tuple[int, int]:
+    """
+    find the header length and column count of a csv point file
+
+    Args:
+        file_path: path to csv file
+        delimiter: field separator
+
+    Returns:
+        tuple of (number of header lines to skip, number of columns)
+    """
+    sep = delimiter.encode()
+    with open(file_path, 'rb') as f:
+        for line_number in range(CSV_SNIFF_LINES):
+            line = f.readline()
+            if not line:
+                break
+            #skip blank lines, comments and any header text before the first data row
+            stripped = line.strip()
+            if stripped and not stripped.startswith(b'#') and _is_numeric_line(stripped, sep):
+                return line_number, len(stripped.split(sep))
+    raise ValueError(f"no numeric rows found in the first {CSV_SNIFF_LINES} lines of {file_path}")
+
+
+def csv_column_names(file_path: str, delimiter: str = ',') -> Optional[List[str]]:
+    """
+    lowercase column names from the header line of a csv point file
+
+    Args:
+        file_path: path to csv file
+        delimiter: field separator
+
+    Returns:
+        one name per column, or None when the line before the first data row
+        is missing or has a different number of fields
+    """
+    skip, n_columns = sniff_csv(file_path, delimiter)
+    if skip == 0:
+        return None
+    with open(file_path, 'rb') as f:
+        lines = [f.readline() for _ in range(skip)]
+    header = lines[-1].strip().lstrip(b'#/').decode('utf-8', 'replace')
+    names = [name.strip().lower() for name in header.split(delimiter)]
+    return names if len(names) == n_columns else None
+
+
+def count_lines(file_path: str, skip_lines: int = 0) -> int:
+    """
+    count the lines of a file without decoding it
+
+    Args:
+        file_path: path to file
+        skip_lines: leading lines excluded from the count
+
+    Returns:
+        number of lines after the skipped ones (a final line without newline counts)
+    """
+    lines = 0
+    last = b'\n'
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(CSV_BLOCK_BYTES)
+            if not block:
+                break
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - skip_lines, 0)
+
+
+def _parse_csv_block(block: bytes, n_columns: int, delimiter: str,
+                     columns: Optional[Sequence[int]] = None) -> np.ndarray:
+    """
+    parse complete csv lines into a (rows, n_columns) float array
+
+    Args:
+        block: bytes holding whole lines only
+        n_columns: expected number of columns
+        delimiter: field separator
+        columns: indices of the columns to keep (if None, all of them)
+
+    Returns:
+        parsed rows as float64, one column per kept column
+    """
+    #numpy's c tokenizer handles blank lines and comments and reports bad rows clearly;
+    #columns left out are skipped by the tokenizer instead of being converted
+    rows = np.loadtxt(io.BytesIO(block), delimiter=delimiter, ndmin=2,
+                      usecols=None if columns is None else tuple(columns))
+    expected = n_columns if columns is None else len(columns)
+    if rows.size and rows.shape[1] != expected:
+        raise ValueError(f"expected {expected} columns but found {rows.shape[1]}")
+    return rows
+
+
+def iter_csv_chunks(file_path: str, chunk_rows: int = 1_000_000,
+                    delimiter: str = ',', columns: Optional[Sequence[int]] = None) -> Iterator[np.ndarray]:
+    """
+    stream a csv point file as float arrays of at most chunk_rows rows
+
+    Args:
+        file_path: path to csv file
+        chunk_rows: maximum number of rows per yielded array
+        delimiter: field separator
+        columns: indices of the columns to parse (if None, all of them)
+
+    Returns:
+        iterator of (rows, columns) float64 arrays
+    """
+    skip, n_columns = sniff_csv(file_path, delimiter)
+    if columns is not None and max(columns) >= n_columns:
+        raise ValueError(f"column {max(columns)} requested but {file_path} has {n_columns} columns")
+    #size text blocks from the first line so a block holds about chunk_rows rows
+    with open(file_path, 'rb') as f:
+        for _ in range(skip):
+            f.readline()
+        first = f.readline()
+        block_bytes = max(min(len(first) * chunk_rows, CSV_BLOCK_BYTES), 1024)
+        remainder = first
+
+        while True:
+            data = f.read(block_bytes)
+            block = remainder + data
+            if not data:
+                #last block, which may not end with a newline
+                if block.strip():
+                    yield from _split_rows(_parse_csv_block(block, n_columns, delimiter, columns), chunk_rows)
+                return
+            cut = block.rfind(b'\n') + 1
+            if cut == 0:
+                remainder = block
+                continue
+            remainder = block[cut:]
+            yield from _split_rows(_parse_csv_block(block[:cut], n_columns, delimiter, columns), chunk_rows)
+
+
+def _split_rows(array: np.ndarray, chunk_rows: int) -> Iterator[np.ndarray]:
+    """yield consecutive row slices of at most chunk_rows rows"""
+    for start in range(0, len(array), chunk_rows):
+        yield array[start:start + chunk_rows]
+
+
+def read_csv_points(file_path: str, delimiter: str = ',',
+                    out: Optional[np.ndarray] = None,
+                    columns: Optional[Sequence[int]] = COORDINATE_COLUMNS) -> np.ndarray:
+    """
+    read a whole csv point file into one preallocated array
+
+    the file is scanned once to count lines, then parsed block by block straight
+    into the result, so peak memory is the final array plus one text block.
+    attribute columns after x, y, z are skipped unless asked for.
+
+    Args:
+        file_path: path to csv file
+        delimiter: field separator
+        out: optional preallocated (N, n_columns) float array to fill
+        columns: indices of the columns to read (if None, all of them)
+
+    Returns:
+        float64 array (N, n_columns), n_columns being the number of columns read
+    """
+    skip, n_columns = sniff_csv(file_path, delimiter)
+    if columns is not None:
+        n_columns = len(columns)
+    #the line count is an upper bound on rows (blank lines are dropped while parsing)
+    capacity = count_lines(file_path, skip)
+    if out is None:
+        out = np.empty((capacity, n_columns), dtype=np.float64)
+    elif out.shape[1] != n_columns or len(out) < capacity:
+        raise ValueError(f"output array of shape {out.shape} cannot hold {capacity} x {n_columns} values")
+
+    filled = 0
+    for chunk in iter_csv_chunks(file_path, chunk_rows=max(capacity, 1), delimiter=delimiter, columns=columns):
+        out[filled:filled + len(chunk)] = chunk
+        filled += len(chunk)
+    return out[:filled]
+
+
+#ply property types mapped to numpy type codes
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'
+}
+
+
+def _xyz_view(records: np.ndarray, names: Tuple[str, str, str] = ('x', 'y', 'z')) -> np.ndarray:
+    """
+    return the coordinate fields of a structured array as an (N, 3) array
+
+    the result is a strided view into records whenever the three fields share a
+    dtype and are evenly spaced, which is the usual layout of point formats.
+    """
+    if not all(name in records.dtype.names for name in names):
+        raise ValueError(f"point records need fields {names}, found {records.dtype.names}")
+    return structured_to_unstructured(records[list(names)])
+
+
+def read_npy_points(file_path: str) -> np.ndarray:
+    """
+    open a .npy point file memory-mapped
+
+    Args:
+        file_path: path to .npy file holding an (N, 3+) array or records with x, y, z fields
+
+    Returns:
+        read-only memory-mapped (N, 3) view of the x, y, z columns or fields
+    """
+    array = np.load(file_path, mmap_mode='r')
+    if array.dtype.names:
+        return _xyz_view(array)
+    if array.ndim != 2 or array.shape[1] < 3:
+        raise ValueError(f"expected an (N, 3) array in {file_path}, found shape {array.shape}")
+    #attribute columns after x, y, z stay on disk
+    return array[:, :3]
+
+
+def read_ply_header(file_path: str) -> Tuple[int, np.dtype, int]:
+    """
+    parse the header of a binary ply file
+
+    Args:
+        file_path: path to .ply file
+
+    Returns:
+        tuple of (vertex count, vertex record dtype, byte offset of the vertex data)
+    """
+    with open(file_path, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError(f"{file_path} is not a ply file")
+        byte_order = None
+        elements = []
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError(f"ply header of {file_path} has no end_header")
+            words = line.decode('ascii', 'replace').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'format':
+                formats = {'binary_little_endian': '<', 'binary_big_endian': '>'}
+                if words[1] not in formats:
+                    raise ValueError(f"unsupported ply format '{words[1]}' (only binary ply is supported)")
+                byte_order = formats[words[1]]
+            elif words[0] == 'element':
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1][2].append(None)
+                else:
+                    elements[-1][2].append((words[2], byte_order + PLY_TYPES[words[1]]))
+            elif words[0] == 'end_header':
+                data_offset = f.tell()
+                break
+
+    #skip any fixed-size elements stored before the vertices
+    for name, count, properties in elements:
+        if None in properties:
+            if name == 'vertex':
+                raise ValueError("list properties on vertices are not supported")
+            raise ValueError(f"cannot skip variable-length ply element '{name}' before vertices")
+        record = np.dtype(properties)
+        if name == 'vertex':
+            return count, record, data_offset
+        data_offset += count * record.itemsize
+    raise ValueError(f"{file_path} has no vertex element")
+
+
+def read_ply_points(file_path: str) -> np.ndarray:
+    """
+    memory-map the vertices of a binary ply file
+
+    Args:
+        file_path: path to .ply file
+
+    Returns:
+        (N, 3) coordinate array, a zero-copy view when x, y, z are adjacent fields
+    """
+    count, record, offset = read_ply_header(file_path)
+    vertices = np.memmap(file_path, dtype=record, mode='r', offset=offset, shape=(count,))
+    return _xyz_view(vertices)
+
+
+def read_las_header(file_path: str) -> dict:
+    """
+    parse the public header block of an uncompressed las file
+
+    Args:
+        file_path: path to .las file
+
+    Returns:
+        dictionary with version, point format, record length, point count,
+        byte offset of the point data, scale and offset
+    """
+    with open(file_path, 'rb') as f:
+        raw = f.read(375)
+    if raw[:4] != b'LASF':
+        raise ValueError(f"{file_path} is not a las file")
+    version = (raw[24], raw[25])
+    point_format = raw[104]
+    #the two high bits of the format byte mark laszip compression
+    if point_format & 0xC0:
+        raise ValueError("compressed las (laz) files are not supported")
+    count = int(np.frombuffer(raw, '<u4', 1, 107)[0])
+    #las 1.4 moved the point count to a 64-bit field
+    if version >= (1, 4) and len(raw) >= 255:
+        count = int(np.frombuffer(raw, '<u8', 1, 247)[0]) or count
+    return {
+        'version': version,
+        'point_format': point_format,
+        'record_length': int(np.frombuffer(raw, '<u2', 1, 105)[0]),
+        'point_count': count,
+        'data_offset': int(np.frombuffer(raw, '<u4', 1, 96)[0]),
+        'scale': np.frombuffer(raw, '<f8', 3, 131).copy(),
+        'offset': np.frombuffer(raw, '<f8', 3, 155).copy()
+    }
+
+
+def read_las_records(file_path: str) -> Tuple[np.ndarray, dict]:
+    """
+    memory-map the raw point records of an uncompressed las file
+
+    Args:
+        file_path: path to .las file
+
+    Returns:
+        tuple of (structured records with int32 X, Y, Z fields, header dictionary)
+    """
+    header = read_las_header(file_path)
+    record = np.dtype({'names': ['X', 'Y', 'Z'], 'formats': ['<i4', '<i4', '<i4'],
+                       'offsets': [0, 4, 8], 'itemsize': header['record_length']})
+    records = np.memmap(file_path, dtype=record, mode='r', offset=header['data_offset'],
+                        shape=(header['point_count'],))
+    return records, header
+
+
+def read_las_points(file_path: str, chunk_rows: int = 1_000_000) -> np.ndarray:
+    """
+    read the scaled coordinates of an uncompressed las file
+
+    Args:
+        file_path: path to .las file
+        chunk_rows: number of records converted at a time
+
+    Returns:
+        float64 coordinate array (N, 3)
+    """
+    records, header = read_las_records(file_path)
+    raw = _xyz_view(records, ('X', 'Y', 'Z'))
+    #las stores integers, so scaling needs one output array; convert in chunks to avoid temporaries
+    points = np.empty(raw.shape, dtype=np.float64)
+    for start in range(0, len(raw), chunk_rows):
+        block = points[start:start + chunk_rows]
+        np.multiply(raw[start:start + chunk_rows], header['scale'], out=block)
+        block += header['offset']
+    return points
+
+
+#readers for every supported point cloud extension
+READERS = {
+    '.csv': read_csv_points,
+    '.npy': read_npy_points,
+    '.ply': read_ply_points,
+    '.las': read_las_points
+}
+SUPPORTED_EXTENSIONS = tuple(READERS)
+
+
+def iter_point_chunks(file_path: str, chunk_rows: int = 1_000_000) -> Iterator[np.ndarray]:
+    """
+    stream the x, y, z coordinates of any supported point file in chunks
+
+    csv files are parsed block by block; binary files are memory-mapped and
+    sliced, so only one chunk is resident at a time.
+
+    Args:
+        file_path: path to point cloud file
+        chunk_rows: maximum number of points per chunk
+
+    Returns:
+        iterator of (B, 3) coordinate arrays
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.csv':
+        yield from iter_csv_chunks(file_path, chunk_rows, columns=COORDINATE_COLUMNS)
+        return
+    if suffix == '.las':
+        records, header = read_las_records(file_path)
+        raw = _xyz_view(records, ('X', 'Y', 'Z'))
+        for start in range(0, len(raw), chunk_rows):
+            yield raw[start:start + chunk_rows] * header['scale'] + header['offset']
+        return
+    if suffix not in READERS:
+        raise ValueError(f"unsupported file format: {file_path}")
+    points = READERS[suffix](file_path)
+    for start in range(0, len(points), chunk_rows):
+        yield np.asarray(points[start:start + chunk_rows, :3])
+
+
+def _array_chunks(points: np.ndarray, chunk_rows: int) -> Iterator[np.ndarray]:
+    """yield row slices of an array (or memmap) as in-memory float64 chunks"""
+    for start in range(0, len(points), chunk_rows):
+        yield np.asarray(points[start:start + chunk_rows, :3], dtype=np.float64)
+
+
+def write_points(file_path: str, points: np.ndarray, chunk_rows: int = 1_000_000):
+    """
+    write an (N, 3) point array in the format given by the file extension
+
+    the array is converted chunk by chunk, so a memory-mapped source larger than
+    memory can be written out.
+
+    Args:
+        file_path: output path ending in .csv, .npy, .ply or .las
+        points: point array (N, 3), may be memory-mapped
+        chunk_rows: number of points converted at a time
+    """
+    suffix = Path(file_path).suffix.lower()
+    if suffix == '.csv':
+        with open(file_path, 'w') as f:
+            for chunk in _array_chunks(points, chunk_rows):
+                np.savetxt(f, chunk, delimiter=',', fmt='%.6f')
+    elif suffix == '.npy':
+        out = np.lib.format.open_memmap(file_path, mode='w+', dtype=np.float64, shape=(len(points), 3))
+        for start in range(0, len(points), chunk_rows):
+            out[start:start + chunk_rows] = points[start:start + chunk_rows, :3]
+        out.flush()
+        del out
+    elif suffix == '.ply':
+        header = ("ply\nformat binary_little_endian 1.0\n"
+                  f"element vertex {len(points)}\n"
+                  "property float x\nproperty float y\nproperty float z\nend_header\n")
+        with open(file_path, 'wb') as f:
+            f.write(header.encode('ascii'))
+            for chunk in _array_chunks(points, chunk_rows):
+                f.write(chunk.astype('<f4').tobytes())
+    elif suffix == '.las':
+        _write_las(file_path, points, chunk_rows)
+    else:
+        raise ValueError(f"unsupported file format: {file_path}")
+
+
+def _write_las(file_path: str, points: np.ndarray, chunk_rows: int, scale: float = 0.001):
+    """write las 1.2 point format 0 records with millimetre scale"""
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    for chunk in _array_chunks(points, chunk_rows):
+        np.minimum(mins, chunk.min(axis=0), out=mins)
+        np.maximum(maxs, chunk.max(axis=0), out=maxs)
+    if not len(points):
+        mins = maxs = np.zeros(3)
+
+    #whole-unit offsets, as las writers usually pick, keep voxel lattices aligned
+    offset = np.floor(mins)
+
+    header = bytearray(227)
+    header[0:4] = b'LASF'
+    header[24:26] = bytes([1, 2])
+    header[26:58] = b'laserscanqa'.ljust(32, b'\0')
+    header[58:90] = b'laserscanqa'.ljust(32, b'\0')
+    np.frombuffer(header, '<u2', 1, 94)[:] = 227
+    np.frombuffer(header, '<u4', 1, 96)[:] = 227
+    header[104] = 0
+    np.frombuffer(header, '<u2', 1, 105)[:] = 20
+    np.frombuffer(header, '<u4', 1, 107)[:] = len(points)
+    np.frombuffer(header, '<u4', 1, 111)[:] = len(points)
+    np.frombuffer(header, '<f8', 3, 131)[:] = scale
+    np.frombuffer(header, '<f8', 3, 155)[:] = offset
+    np.frombuffer(header, '<f8', 6, 179)[:] = [maxs[0], mins[0], maxs[1], mins[1], maxs[2], mins[2]]
+
+    record = np.dtype({'names': ['X', 'Y', 'Z'], 'formats': ['<i4', '<i4', '<i4'],
+                       'offsets': [0, 4, 8], 'itemsize': 20})
+    with open(file_path, 'wb') as f:
+        f.write(bytes(header))
+        for chunk in _array_chunks(points, chunk_rows):
+            records = np.zeros(len(chunk), dtype=record)
+            ints = np.round((chunk - offset) / scale).astype('<i4')
+            records['X'], records['Y'], records['Z'] = ints[:, 0], ints[:, 1], ints[:, 2]
+            f.write(records.tobytes())
@@ -0,0 +1,87 @@
+"""
+profiling - per-stage timing and peak memory measurement for assessment runs
+"""
+
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+#signature of profile hooks: (stage name, seconds, peak traced bytes)
+ProfileHook = Callable[[str, float, int], None]
+
+
+class StageProfiler:
+    """
+    records perf_counter time and peak traced memory of named stages
+
+    repeated stages (one per chunk, for example) accumulate their time and keep
+    the largest peak. stages may be nested; an outer stage's peak includes the
+    peaks of the stages inside it. memory is measured with tracemalloc, which
+    also sees numpy array allocations, and tracing is only active while a stage runs.
+    """
+
+    def __init__(self, trace_memory: bool = True, hook: Optional[ProfileHook] = None):
+        """
+        create a profiler
+
+        Args:
+            trace_memory: measure peak memory of each stage with tracemalloc
+            hook: optional callback invoked after every stage
+        """
+        self.trace_memory = trace_memory
+        self.hook = hook
+        self.stages: Dict[str, Dict[str, float]] = {}
+        #open stages as [baseline bytes, highest peak seen]
+        self._stack: List[List[int]] = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        time the enclosed block as the named stage
+
+        Args:
+            name: stage name used as key in the profile
+        """
+        frame = [0, 0]
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            #keep the enclosing stage's peak before resetting it for this one
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            frame = [current, current]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self._stack.pop()
+            peak_bytes = 0
+            if self.trace_memory:
+                frame[1] = max(frame[1], tracemalloc.get_traced_memory()[1])
+                peak_bytes = frame[1] - frame[0]
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], frame[1])
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+            self.record(name, seconds, peak_bytes)
+
+    def record(self, name: str, seconds: float, peak_bytes: int = 0):
+        """accumulate one stage measurement, e.g. one timed on another thread, and notify the hook"""
+        entry = self.stages.setdefault(name, {'seconds': 0.0, 'peak_bytes': 0, 'calls': 0})
+        entry['seconds'] += seconds
+        entry['peak_bytes'] = max(entry['peak_bytes'], int(peak_bytes))
+        entry['calls'] += 1
+        if self.hook is not None:
+            self.hook(name, seconds, int(peak_bytes))
+
+    def profile(self) -> Dict[str, Dict[str, float]]:
+        """return a copy of the recorded stages"""
+        return {name: dict(entry) for name, entry in self.stages.items()}
@@ -0,0 +1,170 @@
+"""
+reference_registry - prebuilt nearest neighbour indexes of reference clouds shared across scans
+"""
+
+import hashlib
+import numpy as np
+import os
+import shutil
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from spatial_index import VoxelHashIndex
+
+#points hashed at a time when computing a reference digest
+DIGEST_BLOCK_ROWS = 1_000_000
+
+
+def array_digest(points: np.ndarray) -> str:
+    """
+    sha256 of an array's shape, dtype and values, hashed in blocks
+
+    Args:
+        points: point cloud data (M, 3)
+
+    Returns:
+        hex digest
+    """
+    digest = hashlib.sha256(f"{points.shape}:{points.dtype.str}".encode())
+    for start in range(0, len(points), DIGEST_BLOCK_ROWS):
+        digest.update(np.ascontiguousarray(points[start:start + DIGEST_BLOCK_ROWS]).tobytes())
+    return digest.hexdigest()
+
+
+class ReferenceRegistry:
+    """
+    least recently used cache of reference indexes, keyed by reference content
+
+    a reference is identified by the digest of its values, so the same cloud
+    loaded twice shares one index. the digest of an array object is remembered
+    while that object lives, so repeated calls with the same array skip hashing;
+    arrays modified in place after their first use must be passed with a new key.
+    with index_dir set, built indexes are also saved there and later processes
+    memory-map them instead of rebuilding.
+    """
+
+    def __init__(self, max_bytes: int = 1024 * 1024 * 1024, index_dir: Optional[str] = None):
+        """
+        create an empty registry
+
+        Args:
+            max_bytes: total size of the indexes kept in memory
+            index_dir: directory of persisted indexes (None keeps them in memory only)
+        """
+        self.max_bytes = max_bytes
+        self.index_dir = Path(index_dir) if index_dir else None
+        if self.index_dir is not None:
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._indexes: 'OrderedDict[str, VoxelHashIndex]' = OrderedDict()
+        #digests of live arrays by object id, checked against a weak reference and
+        #dropped when the array is freed
+        self._digests: Dict[int, Tuple[weakref.ref, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._indexes)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._indexes
+
+    @property
+    def nbytes(self) -> int:
+        """bytes held by the cached indexes"""
+        return sum(index.nbytes for index in self._indexes.values())
+
+    def key(self, points: np.ndarray) -> str:
+        """
+        registry key of a reference cloud
+
+        Args:
+            points: reference point cloud (M, 3)
+
+        Returns:
+            content digest, memoised per array object
+        """
+        memo = self._digests.get(id(points))
+        if memo is not None and memo[0]() is points:
+            return memo[1]
+        key = array_digest(points)
+        ident, digests = id(points), self._digests
+
+        def forget(ref: weakref.ref):
+            #the entry goes with its array unless a newer array already took over the id
+            if digests.get(ident, (None,))[0] is ref:
+                del digests[ident]
+
+        try:
+            self._digests[ident] = (weakref.ref(points, forget), key)
+        except TypeError:
+            #objects without weak reference support are simply hashed every time
+            pass
+        return key
+
+    def index(self, points: np.ndarray, key: Optional[str] = None) -> VoxelHashIndex:
+        """
+        nearest neighbour index of a reference cloud, built only on first use
+
+        Args:
+            points: reference point cloud (M, 3)
+            key: identity of the reference (if None, its content digest)
+
+        Returns:
+            index over points
+        """
+        if key is None:
+            key = self.key(points)
+        index = self._indexes.get(key)
+        if index is not None:
+            self._indexes.move_to_end(key)
+            self.hits += 1
+            return index
+
+        self.misses += 1
+        index = self._load(key)
+        if index is None:
+            index = VoxelHashIndex(points)
+            self._save(key, index)
+        self._indexes[key] = index
+        self.evict()
+        return index
+
+    def _path(self, key: str) -> Path:
+        return self.index_dir / key
+
+    def _load(self, key: str) -> Optional[VoxelHashIndex]:
+        """memory-map a persisted index, None when there is none"""
+        if self.index_dir is None or not (self._path(key) / 'index.json').exists():
+            return None
+        try:
+            return VoxelHashIndex.load(str(self._path(key)))
+        except (OSError, ValueError):
+            #damaged entries are rebuilt
+            return None
+
+    def _save(self, key: str, index: VoxelHashIndex):
+        """persist an index; readers never see a partially written directory"""
+        if self.index_dir is None:
+            return
+        temp = self.index_dir / f".{key}.{os.getpid()}.tmp"
+        try:
+            index.save(str(temp))
+            os.replace(temp, self._path(key))
+        except OSError:
+            #another process saved the same index first, or the disk is full
+            pass
+        finally:
+            shutil.rmtree(temp, ignore_errors=True)
+
+    def evict(self):
+        """drop least recently used indexes until the registry fits in max_bytes (keeping the newest)"""
+        total = self.nbytes
+        while total > self.max_bytes and len(self._indexes) > 1:
+            _, index = self._indexes.popitem(last=False)
+            total -= index.nbytes
+
+    def clear(self):
+        """drop every in-memory index (persisted indexes stay on disk)"""
+        self._indexes.clear()
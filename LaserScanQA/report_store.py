@@ -0,0 +1,160 @@
+"""
+report_store - append-only json lines file of scan reports with an index by scan name
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+#bytes of encoded reports buffered before they are written
+REPORT_BUFFER_BYTES = 1024 * 1024
+
+
+class ReportStore:
+    """
+    every report of a batch in one json lines file
+
+    each line is {"scan": name, "report": {...}}. reports are encoded into a
+    memory buffer and written in large blocks; the byte offset and length of
+    every line are kept in an index, saved next to the file as <file>.index on
+    flush, so one report is read back with a single seek. lines appended after
+    the last saved index (by a run that crashed, say) are indexed again on open,
+    and a torn last line is cut off. a scan reported twice resolves to its
+    newest line.
+    """
+
+    def __init__(self, path: str, buffer_bytes: int = REPORT_BUFFER_BYTES):
+        """
+        open or create a store
+
+        Args:
+            path: json lines file
+            buffer_bytes: encoded bytes held in memory before a write
+        """
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + '.index')
+        self.buffer_bytes = buffer_bytes
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._buffer: List[bytes] = []
+        self._buffered = 0
+        self._end = self._recover()
+        self._file = open(self.path, 'ab')
+
+    def _recover(self) -> int:
+        """load the saved index, index any lines written after it and return the file size"""
+        if not self.path.exists():
+            return 0
+        indexed = 0
+        try:
+            with open(self.index_path, 'r') as f:
+                saved = json.load(f)
+            if saved['size'] <= self.path.stat().st_size:
+                self._index = {name: tuple(entry) for name, entry in saved['entries'].items()}
+                indexed = saved['size']
+        except (OSError, ValueError, KeyError):
+            #a missing or damaged index is rebuilt from the lines
+            self._index = {}
+        offset = indexed
+        with open(self.path, 'rb+') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    #a write interrupted mid-line leaves a torn record
+                    f.truncate(offset)
+                    break
+                try:
+                    self._index[json.loads(line)['scan']] = (offset, len(line))
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        return offset
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._index
+
+    def names(self) -> List[str]:
+        """scan names in the store"""
+        return list(self._index)
+
+    def append(self, name: str, report: Dict):
+        """
+        add one report
+
+        Args:
+            name: scan name the report is looked up by
+            report: report dictionary
+        """
+        line = (json.dumps({'scan': name, 'report': report}, separators=(',', ':')) + '\n').encode()
+        self._index[name] = (self._end + self._buffered, len(line))
+        self._buffer.append(line)
+        self._buffered += len(line)
+        if self._buffered >= self.buffer_bytes:
+            self._write_buffer()
+
+    def _write_buffer(self):
+        """write the buffered lines in one call"""
+        if not self._buffer:
+            return
+        self._file.write(b''.join(self._buffer))
+        self._end += self._buffered
+        self._buffer.clear()
+        self._buffered = 0
+
+    def flush(self):
+        """write buffered reports and save the index"""
+        self._write_buffer()
+        self._file.flush()
+        temp = self.index_path.with_name(self.index_path.name + f".{os.getpid()}.tmp")
+        with open(temp, 'w') as f:
+            json.dump({'size': self._end, 'entries': self._index}, f, separators=(',', ':'))
+        os.replace(temp, self.index_path)
+
+    def close(self):
+        """flush and close the file"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> 'ReportStore':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, name: str) -> Optional[Dict]:
+        """
+        read one report without loading the rest of the file
+
+        Args:
+            name: scan name
+
+        Returns:
+            report dictionary, or None if the scan is not in the store
+        """
+        entry = self._index.get(name)
+        if entry is None:
+            return None
+        if entry[0] >= self._end:
+            #still in the buffer
+            self._write_buffer()
+        if not self._file.closed:
+            self._file.flush()
+        with open(self.path, 'rb') as f:
+            f.seek(entry[0])
+            return json.loads(f.read(entry[1]))['report']
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict]]:
+        """yield (scan name, report) of every line in file order, one line at a time"""
+        if not self._file.closed:
+            self._write_buffer()
+            self._file.flush()
+        with open(self.path, 'rb') as f:
+            for line in f:
+                record = json.loads(line)
+                yield record['scan'], record['report']
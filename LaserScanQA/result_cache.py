@@ -0,0 +1,156 @@
+"""
+result_cache - persistent on-disk cache of assessment results keyed by file content
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+#bytes read at a time while hashing files
+HASH_BLOCK_BYTES = 1024 * 1024
+
+
+def file_digest(file_path: str) -> str:
+    """
+    sha256 of a file's content, read in blocks
+
+    Args:
+        file_path: path to file
+
+    Returns:
+        hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def config_digest(config: Dict, ignore: Iterable[str] = ()) -> str:
+    """
+    stable sha256 of the settings that influence results
+
+    Args:
+        config: configuration dictionary
+        ignore: keys that do not change results (cache location, worker counts, ...)
+
+    Returns:
+        hex digest
+    """
+    relevant = {key: value for key, value in config.items() if key not in set(ignore)}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    directory of json entries, one per (file content, config, metrics version)
+
+    entries are written atomically and the least recently used ones are removed
+    once the directory grows past max_bytes. a hit refreshes the entry's mtime,
+    which is what the eviction order is based on.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        open or create a cache directory
+
+        Args:
+            cache_dir: directory holding the cache entries
+            max_bytes: total size the entries may occupy before eviction
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        #content digests of files already hashed in this process, keyed by path, size and mtime
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def key(self, file_path: str, config: Dict, version: str,
+            ignore: Iterable[str] = ()) -> str:
+        """
+        cache key of a file assessed with a given config and metrics version
+
+        Args:
+            file_path: path to point cloud file
+            config: configuration dictionary
+            version: metrics code version; bump it to invalidate every entry
+            ignore: config keys that do not change results
+
+        Returns:
+            hex key
+        """
+        stat = os.stat(file_path)
+        memo = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        if memo not in self._digests:
+            self._digests[memo] = file_digest(file_path)
+        parts = f"{self._digests[memo]}:{config_digest(config, ignore)}:{version}"
+        return hashlib.sha256(parts.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        look up an entry
+
+        Args:
+            key: cache key
+
+        Returns:
+            stored entry or None on a miss
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            #mark as recently used
+            os.utime(path)
+            return entry
+        except (OSError, ValueError):
+            #missing, evicted by another process or half-written entries are misses
+            return None
+
+    def put(self, key: str, entry: Dict):
+        """
+        store an entry and evict old ones if the cache is over its size limit
+
+        Args:
+            key: cache key
+            entry: json-serialisable entry
+        """
+        path = self._path(key)
+        temp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(temp, 'w') as f:
+            json.dump(entry, f)
+        #readers never see a partially written entry
+        os.replace(temp, path)
+        self.evict()
+
+    def evict(self):
+        """remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """remove every entry"""
+        for path in self.cache_dir.glob('*.json'):
+            try:
+                path.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,97 @@
+"""
+sampling - seeded point subsamples and distribution-free confidence intervals
+"""
+
+import numpy as np
+from statistics import NormalDist
+from typing import Optional, Tuple
+
+#sampling methods accepted by sample_rows
+SAMPLING_METHODS = ('uniform', 'voxel')
+
+
+def z_score(confidence: float) -> float:
+    """two-sided standard normal quantile of a confidence level (1.96 for 0.95)"""
+    return NormalDist().inv_cdf(0.5 + confidence / 2.0)
+
+
+def sample_rows(count: int, size: int, method: str = 'uniform', seed: int = 0,
+                voxel_order: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    draw a seeded subsample of point indices
+
+    Args:
+        count: number of points in the cloud
+        size: number of points to draw (all points if size >= count)
+        method: 'uniform' draws without replacement; 'voxel' takes one point from
+            each run of count / size points in voxel (morton) order, so every
+            region contributes in proportion to its points
+        seed: random seed
+        voxel_order: point indices sorted by voxel, required for 'voxel'
+
+    Returns:
+        sorted point indices (size,)
+    """
+    if size >= count:
+        return np.arange(count)
+    rng = np.random.default_rng(seed)
+    if method == 'uniform':
+        return np.sort(rng.choice(count, size, replace=False))
+    if method == 'voxel':
+        if voxel_order is None:
+            raise ValueError("voxel sampling needs the voxel order of the points")
+        #systematic sample along the voxel order with a random start
+        step = count / size
+        positions = (rng.uniform(0, step) + np.arange(size) * step).astype(np.int64)
+        return np.sort(voxel_order[np.minimum(positions, count - 1)])
+    raise ValueError(f"unknown sampling method: {method}")
+
+
+def median_interval(values: np.ndarray, confidence: float = 0.95) -> Tuple[float, float]:
+    """
+    confidence interval of the population median from a sample
+
+    uses the binomial order statistics around the sample median, so it holds
+    for any residual distribution.
+
+    Args:
+        values: sampled values (n,)
+        confidence: confidence level
+
+    Returns:
+        tuple of (lower, upper) bounds
+    """
+    n = len(values)
+    if n == 0:
+        return float('nan'), float('nan')
+    half_width = z_score(confidence) * np.sqrt(n) / 2.0
+    low = int(max(np.floor(n / 2.0 - half_width), 0))
+    high = int(min(np.ceil(n / 2.0 + half_width), n - 1))
+    ranked = np.partition(values, [low, high])
+    return float(ranked[low]), float(ranked[high])
+
+
+def mean_interval(values: np.ndarray, confidence: float = 0.95,
+                  population: Optional[int] = None) -> Tuple[float, float, float]:
+    """
+    normal-approximation confidence interval of a population mean from a sample
+
+    Args:
+        values: sampled values (n,)
+        confidence: confidence level
+        population: number of values in the population, for the finite population correction
+
+    Returns:
+        tuple of (mean, lower, upper)
+    """
+    n = len(values)
+    if n == 0:
+        return float('nan'), float('nan'), float('nan')
+    mean = float(np.mean(values, dtype=np.float64))
+    if n < 2:
+        return mean, mean, mean
+    error = float(np.std(values, ddof=1, dtype=np.float64)) / np.sqrt(n)
+    if population:
+        error *= np.sqrt(max(0.0, 1.0 - n / population))
+    margin = z_score(confidence) * error
+    return mean, mean - margin, mean + margin
@@ -0,0 +1,453 @@
+"""
+spatial_index - morton-ordered voxel grid for fast nearest neighbour queries on point clouds
+"""
+
+import json
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+#largest number of cells allowed along one axis so packed keys fit in int64
+MAX_CELLS_PER_AXIS = 2 ** 21
+#largest padded candidate matrix (queries x candidates) built for one batch
+MAX_CANDIDATES = 2 ** 18
+#queries moved into the index frame at a time when an offset is given
+OFFSET_BLOCK_ROWS = 1_000_000
+#arrays written by VoxelHashIndex.save, all memory-mappable
+INDEX_ARRAYS = ('points', 'order', 'keys', 'level_keys', 'level_starts', 'level_counts')
+
+
+def pack_cells(cells: np.ndarray, dims: np.ndarray) -> np.ndarray:
+    """
+    pack integer cell coordinates into one int64 key per cell
+
+    Args:
+        cells: integer cell coordinates (..., 3), all inside [0, dims)
+        dims: number of cells along each axis (3,)
+
+    Returns:
+        int64 keys with the same leading shape as cells
+    """
+    cells = cells.astype(np.int64, copy=False)
+    #row-major packing keeps keys of neighbouring z cells adjacent
+    return (cells[..., 0] * dims[1] + cells[..., 1]) * dims[2] + cells[..., 2]
+
+
+def morton_encode(cells: np.ndarray) -> np.ndarray:
+    """
+    interleave the bits of non-negative cell coordinates into morton (z-order) keys
+
+    Args:
+        cells: integer cell coordinates (..., 3), each in [0, 2**21)
+
+    Returns:
+        int64 keys; dropping the lowest 3 * L bits gives the key of the enclosing
+        cell 2**L times larger, so sorting by key groups every coarser cell too
+    """
+    def spread(v: np.ndarray) -> np.ndarray:
+        v = v.astype(np.uint64) & np.uint64(0x1FFFFF)
+        v = (v | (v << np.uint64(32))) & np.uint64(0x1F00000000FFFF)
+        v = (v | (v << np.uint64(16))) & np.uint64(0x1F0000FF0000FF)
+        v = (v | (v << np.uint64(8))) & np.uint64(0x100F00F00F00F00F)
+        v = (v | (v << np.uint64(4))) & np.uint64(0x10C30C30C30C30C3)
+        v = (v | (v << np.uint64(2))) & np.uint64(0x1249249249249249)
+        return v
+
+    keys = (spread(cells[..., 0]) << np.uint64(2)) | (spread(cells[..., 1]) << np.uint64(1)) | spread(cells[..., 2])
+    return keys.astype(np.int64)
+
+
+def morton_decode(keys: np.ndarray) -> np.ndarray:
+    """
+    recover cell coordinates from morton keys
+
+    Args:
+        keys: int64 keys from morton_encode (...,)
+
+    Returns:
+        int64 cell coordinates (..., 3)
+    """
+    def compact(v: np.ndarray) -> np.ndarray:
+        v = v & np.uint64(0x1249249249249249)
+        v = (v | (v >> np.uint64(2))) & np.uint64(0x10C30C30C30C30C3)
+        v = (v | (v >> np.uint64(4))) & np.uint64(0x100F00F00F00F00F)
+        v = (v | (v >> np.uint64(8))) & np.uint64(0x1F0000FF0000FF)
+        v = (v | (v >> np.uint64(16))) & np.uint64(0x1F00000000FFFF)
+        v = (v | (v >> np.uint64(32))) & np.uint64(0x1FFFFF)
+        return v
+
+    keys = np.asarray(keys).astype(np.uint64)
+    return np.stack([compact(keys >> np.uint64(2)), compact(keys >> np.uint64(1)), compact(keys)],
+                    axis=-1).astype(np.int64)
+
+
+def auto_cell_size(points: np.ndarray, target_occupancy: float = 8.0,
+                   max_sample: int = 2_000_000, seed: int = 0) -> float:
+    """
+    pick a cell size so that occupied cells hold roughly target_occupancy points
+
+    Args:
+        points: point cloud data (N, 3)
+        target_occupancy: desired mean number of points per occupied cell
+        max_sample: number of points used for the estimate on large clouds
+        seed: seed for the subsample on large clouds
+
+    Returns:
+        cell edge length in the units of the point cloud
+    """
+    n = len(points)
+    if n == 0:
+        return 1.0
+    sample = points
+    if n > max_sample:
+        rng = np.random.default_rng(seed)
+        sample = points[rng.choice(n, max_sample, replace=False)]
+
+    mins = np.min(sample, axis=0)
+    span = float(np.max(np.max(sample, axis=0) - mins))
+    #a single repeated point can use any cell size
+    if span <= 0:
+        return 1.0
+
+    #start from the cell size a uniformly filled cube would need
+    cell = span / max(len(sample) / target_occupancy, 1.0) ** (1.0 / 3.0)
+    for _ in range(6):
+        cell = max(cell, span / (MAX_CELLS_PER_AXIS - 1))
+        cells = np.floor((sample - mins) / cell).astype(np.int64)
+        dims = cells.max(axis=0) + 1
+        occupancy = len(sample) / len(np.unique(pack_cells(cells, dims)))
+        #scans are mostly surfaces, so occupancy grows with the square of the cell size
+        factor = float(np.clip((target_occupancy / occupancy) ** 0.5, 0.25, 4.0))
+        if abs(factor - 1.0) < 0.1:
+            break
+        cell *= factor
+
+    #the subsample is sparser than the full cloud, so shrink the cells to match
+    if len(sample) < n:
+        cell *= (len(sample) / n) ** 0.5
+    return max(cell, span / (MAX_CELLS_PER_AXIS - 1))
+
+
+class VoxelHashIndex:
+    """
+    nearest neighbour index over a point cloud using a morton-ordered voxel grid
+
+    points are bucketed into cubic cells and sorted by morton key, so every
+    occupied cell, and every coarser cell made of 2**L x 2**L x 2**L cells, is a
+    contiguous run of points. queries look up the cells around each query with a
+    binary search and are processed in vectorized batches; queries whose answer
+    is not certain yet move up to coarser levels of the same sorted array.
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: Optional[float] = None,
+                 target_occupancy: float = 8.0):
+        """
+        build the index
+
+        Args:
+            points: reference point cloud (M, 3)
+            cell_size: edge length of a grid cell (if None, chosen from the data)
+            target_occupancy: mean points per cell used when choosing cell_size
+        """
+        #float32 clouds stay float32, so the sorted copy and all distances take half the memory
+        points = np.asarray(points)
+        if points.dtype != np.float32:
+            points = points.astype(np.float64, copy=False)
+        if points.ndim != 2 or points.shape[1] != 3 or len(points) == 0:
+            raise ValueError("index needs a non-empty (M, 3) point array")
+
+        #choose a cell size that keeps the number of candidates per query small
+        if cell_size is None:
+            cell_size = auto_cell_size(points, target_occupancy)
+        self.origin = np.min(points, axis=0).astype(np.float64)
+        extent = np.max(points, axis=0) - self.origin
+        #never allow more cells per axis than fit in the morton key
+        self.cell_size = float(max(cell_size, float(np.max(extent)) / (MAX_CELLS_PER_AXIS - 1), 1e-12))
+
+        cells = self._cell_coords(points)
+        self.dims = cells.max(axis=0) + 1
+        keys = morton_encode(cells)
+
+        #sort points by cell so every cell is one contiguous slice
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.points = points[self.order]
+        #number of levels until one cell holds the whole grid
+        self.top_level = int(np.ceil(np.log2(max(int(self.dims.max()), 1))))
+        #per-level (cell keys, starts, counts), built on first use
+        self._levels: Dict[int, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    @property
+    def nbytes(self) -> int:
+        """bytes held by the index arrays"""
+        levels = sum(array.nbytes for level in self._levels.values() for array in level)
+        return self.points.nbytes + self.order.nbytes + self.keys.nbytes + levels
+
+    def save(self, directory: str):
+        """
+        write the index as .npy arrays plus a json header
+
+        Args:
+            directory: directory to create (its contents are overwritten)
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        level_keys, level_starts, level_counts = self._level(0)
+        arrays = {'points': self.points, 'order': self.order, 'keys': self.keys,
+                  'level_keys': level_keys, 'level_starts': level_starts, 'level_counts': level_counts}
+        for name in INDEX_ARRAYS:
+            np.save(directory / f"{name}.npy", np.ascontiguousarray(arrays[name]))
+        header = {'origin': self.origin.tolist(), 'cell_size': self.cell_size,
+                  'dims': self.dims.tolist(), 'top_level': self.top_level}
+        with open(directory / 'index.json', 'w') as f:
+            json.dump(header, f)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'VoxelHashIndex':
+        """
+        open an index written by save without rebuilding it
+
+        Args:
+            directory: directory written by save
+            mmap: memory-map the arrays instead of reading them, so processes
+                opening the same index share one copy through the page cache
+
+        Returns:
+            index ready for queries
+        """
+        directory = Path(directory)
+        with open(directory / 'index.json', 'r') as f:
+            header = json.load(f)
+        arrays = {name: np.load(directory / f"{name}.npy", mmap_mode='r' if mmap else None)
+                  for name in INDEX_ARRAYS}
+        index = cls.__new__(cls)
+        index.origin = np.array(header['origin'], dtype=np.float64)
+        index.cell_size = float(header['cell_size'])
+        index.dims = np.array(header['dims'], dtype=np.int64)
+        index.top_level = int(header['top_level'])
+        index.points, index.order, index.keys = arrays['points'], arrays['order'], arrays['keys']
+        index._levels = {0: (arrays['level_keys'], arrays['level_starts'], arrays['level_counts'])}
+        return index
+
+    def _cell_coords(self, points: np.ndarray) -> np.ndarray:
+        """return integer cell coordinates of points relative to the grid origin"""
+        dtype = np.float32 if points.dtype == np.float32 else np.float64
+        return np.floor((points - self.origin.astype(dtype)) / dtype(self.cell_size)).astype(np.int64)
+
+    def _level(self, level: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """return sorted cell keys, start positions and counts of cells 2**level cells wide"""
+        if level not in self._levels:
+            self._levels[level] = np.unique(self.keys >> (3 * level), return_index=True, return_counts=True)
+        return self._levels[level]
+
+    def _offsets(self, size: int) -> np.ndarray:
+        """return all cell offsets of a cubic block with size cells per axis (O, 3)"""
+        r = np.arange(size)
+        return np.stack(np.meshgrid(r, r, r, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    def _lookup(self, cells: np.ndarray, level: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        find the point slice of each cell
+
+        Args:
+            cells: integer cell coordinates at the given level (..., 3)
+            level: grid level (cells are 2**level base cells wide)
+
+        Returns:
+            tuple of start positions and point counts, zero count for empty cells
+        """
+        cell_keys, cell_starts, cell_counts = self._level(level)
+        level_dims = (self.dims + (1 << level) - 1) >> level
+        inside = np.all((cells >= 0) & (cells < level_dims), axis=-1)
+        keys = np.where(inside, morton_encode(np.clip(cells, 0, level_dims - 1)), -1)
+        pos = np.minimum(np.searchsorted(cell_keys, keys), len(cell_keys) - 1)
+        hit = inside & (cell_keys[pos] == keys)
+        starts = np.where(hit, cell_starts[pos], 0)
+        counts = np.where(hit, cell_counts[pos], 0)
+        return starts, counts
+
+    def _search_block(self, queries: np.ndarray, level: int, size: int,
+                      k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        exact k nearest candidates within a block of cells centred on each query
+
+        Args:
+            queries: query points (B, 3)
+            level: grid level of the block cells
+            size: number of cells per axis of the searched block
+            k: number of neighbours
+
+        Returns:
+            tuple of squared distances (B, k), sorted positions (B, k) and the
+            distance from each query to the block boundary (B,), inf/-1 if missing
+        """
+        #pick the block whose centre is closest to each query
+        cell = self.cell_size * (1 << level)
+        rel = (queries - self.origin) / cell
+        low = np.floor(rel - (size - 1) / 2.0).astype(np.int64)
+        #nothing outside the block can be closer than its nearest face
+        bound = np.minimum(rel - low, low + size - rel).min(axis=1) * cell
+
+        offsets = self._offsets(size)
+        if len(queries) > 1 and len(queries) * len(offsets) * 8 > MAX_CANDIDATES:
+            return self._split_search(queries, level, size, k)
+        starts, counts = self._lookup(low[:, None, :] + offsets[None, :, :], level)
+
+        #lay every candidate of a query out on one row of a padded matrix
+        row_totals = counts.sum(axis=1)
+        width = max(int(row_totals.max()) if len(row_totals) else 0, k)
+        if width > MAX_CANDIDATES:
+            #split the batch when a few crowded blocks would make the matrix too large
+            if len(queries) > 1:
+                return self._split_search(queries, level, size, k)
+            dist, pos = self._scan_segments(queries[0], starts[0], counts[0], k)
+            return dist, pos, bound
+        dist = np.full((len(queries), width), np.inf, dtype=self.points.dtype)
+        pos = np.full((len(queries), width), -1, dtype=np.int64)
+
+        flat_counts = counts.ravel()
+        total = int(flat_counts.sum())
+        if total:
+            #candidates are generated query by query, cell by cell, so every index
+            #below is a running ramp shifted by a per-segment constant
+            ramp = np.arange(total)
+            seg_begin = np.cumsum(flat_counts) - flat_counts
+            source = np.repeat(starts.ravel() - seg_begin, flat_counts) + ramp
+            row_begin = np.cumsum(row_totals) - row_totals
+            flat_cell = np.repeat(np.arange(len(queries)) * width - row_begin, row_totals) + ramp
+            diff = self.points.take(source, axis=0) - np.repeat(queries, row_totals, axis=0)
+            dist.reshape(-1)[flat_cell] = np.einsum('ij,ij->i', diff, diff)
+            pos.reshape(-1)[flat_cell] = source
+
+        dist, pos = self._top_k(dist, pos, k)
+        return dist, pos, bound
+
+    def _split_search(self, queries: np.ndarray, level: int, size: int,
+                      k: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """search the two halves of a batch separately to bound temporary memory"""
+        half = len(queries) // 2
+        first = self._search_block(queries[:half], level, size, k)
+        second = self._search_block(queries[half:], level, size, k)
+        return tuple(np.concatenate(pair) for pair in zip(first, second))
+
+    def _scan_segments(self, query: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                       k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest points of one query among many point slices, in bounded slices
+
+        Args:
+            query: query point (3,)
+            starts: start position of each slice
+            counts: length of each slice
+
+        Returns:
+            tuple of squared distances (1, k) and sorted positions (1, k)
+        """
+        best_d = np.full((1, k), np.inf, dtype=self.points.dtype)
+        best_p = np.full((1, k), -1, dtype=np.int64)
+        for start, count in zip(starts[counts > 0], counts[counts > 0]):
+            for offset in range(0, int(count), MAX_CANDIDATES):
+                begin = int(start) + offset
+                block = self.points[begin:begin + min(MAX_CANDIDATES, int(count) - offset)]
+                diff = block - query
+                d2 = np.einsum('ij,ij->i', diff, diff)[None, :]
+                cand = np.arange(begin, begin + len(block))[None, :]
+                best_d, best_p = self._top_k(np.hstack([best_d, d2]), np.hstack([best_p, cand]), k)
+        return best_d, best_p
+
+    def _top_k(self, dist: np.ndarray, pos: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """keep the k smallest distances of every row, sorted ascending"""
+        if k == 1:
+            best = np.argmin(dist, axis=1)[:, None]
+            return np.take_along_axis(dist, best, axis=1), np.take_along_axis(pos, best, axis=1)
+        if dist.shape[1] > k:
+            part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+            dist = np.take_along_axis(dist, part, axis=1)
+            pos = np.take_along_axis(pos, part, axis=1)
+        order = np.argsort(dist, axis=1, kind='stable')
+        return np.take_along_axis(dist, order, axis=1), np.take_along_axis(pos, order, axis=1)
+
+    def _schedule(self) -> List[Tuple[int, int]]:
+        """
+        (level, block size) stages tried in turn
+
+        the base level is searched with a 2-cell and then a 4-cell block; after
+        that each stage doubles the cell size, so a query whose neighbours are
+        far away costs a few stages instead of a scan of the whole cloud.
+        """
+        return [(0, 2), (0, 4)] + [(level, 4) for level in range(1, self.top_level + 1)]
+
+    def query(self, queries: np.ndarray, k: int = 1,
+              chunk_size: int = 16384) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        find the k nearest indexed points of every query point
+
+        Args:
+            queries: query points (N, 3)
+            k: number of neighbours per query
+            chunk_size: number of queries processed per vectorized batch
+
+        Returns:
+            tuple of distances (N, k) and indices into the original points (N, k),
+            both sorted by distance
+        """
+        queries = np.asarray(queries, dtype=self.points.dtype).reshape(-1, 3)
+        k = min(k, len(self.points))
+        distances = np.empty((len(queries), k), dtype=self.points.dtype)
+        indices = np.empty((len(queries), k), dtype=np.int64)
+
+        #visit queries in cell order so each batch touches a compact part of the index
+        cells = np.clip(self._cell_coords(queries), 0, self.dims - 1)
+        visit = np.argsort(morton_encode(cells), kind='stable')
+
+        for start in range(0, len(queries), chunk_size):
+            rows = visit[start:start + chunk_size]
+            batch = queries[rows]
+            d2, pos = np.full((len(batch), k), np.inf, dtype=self.points.dtype), np.full((len(batch), k), -1, dtype=np.int64)
+            pending = np.arange(len(batch))
+
+            #every stage searches a superset of the previous block, so only the
+            #queries whose answer is not certain yet are searched again
+            for level, size in self._schedule():
+                if len(pending) == 0:
+                    break
+                bd, bp, bound = self._search_block(batch[pending], level, size, k)
+                d2[pending], pos[pending] = bd, bp
+                pending = pending[bd[:, -1] > bound ** 2]
+
+            #queries far outside the indexed cloud are compared with every point
+            for row in pending:
+                d2[row], pos[row] = self._scan_segments(batch[row], np.array([0]),
+                                                        np.array([len(self.points)]), k)
+
+            distances[rows] = np.sqrt(d2)
+            indices[rows] = self.order[pos]
+
+        return distances, indices
+
+    def nearest_distances(self, queries: np.ndarray, chunk_size: int = 16384,
+                          offset: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        distance from every query point to its nearest indexed point
+
+        Args:
+            queries: query points (N, 3)
+            chunk_size: number of queries processed per vectorized batch
+            offset: position of the queries' coordinate zero in the index frame, for
+                queries stored relative to another origin (converted block by block)
+
+        Returns:
+            nearest neighbour distances (N,)
+        """
+        if offset is None:
+            distances, _ = self.query(queries, k=1, chunk_size=chunk_size)
+            return distances[:, 0]
+        offset = np.asarray(offset, dtype=np.float64)
+        distances = np.empty(len(queries), dtype=self.points.dtype)
+        for start in range(0, len(queries), OFFSET_BLOCK_ROWS):
+            block = queries[start:start + OFFSET_BLOCK_ROWS] + offset
+            distances[start:start + len(block)] = self.query(block, k=1, chunk_size=chunk_size)[0][:, 0]
+        return distances
@@ -0,0 +1,142 @@
+"""
+streaming - single-pass accumulators for assessing point clouds chunk by chunk
+"""
+
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+class RunningMoments:
+    """
+    count, bounding box, mean and variance of a point stream
+
+    chunks are merged with the parallel form of welford's update, so the result
+    matches a single pass over the whole cloud without holding it in memory.
+    """
+
+    def __init__(self, dims: int = 3):
+        self.count = 0
+        self.mins = np.full(dims, np.inf)
+        self.maxs = np.full(dims, -np.inf)
+        self.mean = np.zeros(dims)
+        self.m2 = np.zeros(dims)
+
+    def update(self, chunk: np.ndarray, bounds: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        """
+        add a chunk of points
+
+        Args:
+            chunk: points (B, dims)
+            bounds: per-axis (mins, maxs) of the chunk when already known
+        """
+        n = len(chunk)
+        if n == 0:
+            return
+        if bounds is None:
+            bounds = (chunk.min(axis=0), chunk.max(axis=0))
+        np.minimum(self.mins, bounds[0], out=self.mins)
+        np.maximum(self.maxs, bounds[1], out=self.maxs)
+
+        #moments of the chunk on its own, accumulated in float64
+        chunk_mean = chunk.mean(axis=0, dtype=np.float64)
+        chunk_m2 = np.sum(np.square(chunk - chunk_mean.astype(chunk.dtype)), axis=0, dtype=np.float64)
+
+        #combine with the running moments
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + chunk_m2 + delta ** 2 * (self.count * n / total)
+        self.count = total
+
+    @property
+    def variance(self) -> np.ndarray:
+        """population variance per axis"""
+        return self.m2 / self.count if self.count else np.zeros_like(self.m2)
+
+    @property
+    def std(self) -> np.ndarray:
+        """population standard deviation per axis"""
+        return np.sqrt(self.variance)
+
+
+class ResidualHistogram:
+    """
+    bounded-memory summary of a stream of non-negative values
+
+    mean and rms are exact; percentiles come from log-spaced bins whose relative
+    width is below one percent. exact zeros, common on perfectly planar data,
+    are counted apart from the bins, and percentiles never leave the range of
+    the values seen.
+    """
+
+    def __init__(self, low: float = 1e-9, high: float = 1e6, bins: int = 4096):
+        self.edges = np.geomspace(low, high, bins + 1)
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.zeros = 0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def update(self, values: np.ndarray):
+        """
+        add a batch of values
+
+        Args:
+            values: non-negative values (B,)
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        self.minimum = min(self.minimum, float(values.min()))
+        self.maximum = max(self.maximum, float(values.max()))
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        #bin 0 collects values below the range, the last bin values above it
+        bins = np.searchsorted(self.edges, positive, side='right')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_squares += float(np.square(values).sum())
+
+    def percentile(self, q: float) -> float:
+        """
+        approximate percentile of all values seen so far
+
+        Args:
+            q: percentile in [0, 100]
+
+        Returns:
+            value at the percentile, interpolated inside its bin and clamped to
+            the smallest and largest value seen
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q / 100.0 * self.count
+        if self.zeros and rank <= self.zeros:
+            return 0.0
+        rank -= self.zeros
+        cumulative = np.cumsum(self.counts)
+        b = int(np.searchsorted(cumulative, rank, side='left'))
+        if b == 0:
+            value = self.edges[0]
+        elif b >= len(self.edges):
+            value = self.edges[-1]
+        else:
+            before = cumulative[b - 1]
+            fraction = (rank - before) / max(self.counts[b], 1)
+            #interpolate geometrically because the bins are log-spaced
+            value = self.edges[b - 1] * (self.edges[b] / self.edges[b - 1]) ** fraction
+        return float(min(max(value, self.minimum), self.maximum))
+
+    def summary(self) -> Dict[str, float]:
+        """return mean, median, p95 and rms of the stream"""
+        if self.count == 0:
+            return {'mean': 0.0, 'median': 0.0, 'p95': 0.0, 'rms': 0.0}
+        return {
+            'mean': self.total / self.count,
+            'median': self.percentile(50),
+            'p95': self.percentile(95),
+            'rms': float(np.sqrt(self.total_squares / self.count))
+        }
@@ -0,0 +1,23 @@
+"""
+shared pytest setup; the framework modules live flat in the package directory
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    """seeded generator so every run sees the same clouds"""
+    return np.random.default_rng(0)
+
+
+def brute_knn(points: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """sorted distances (Q, k) from every query to its k nearest points"""
+    d = np.linalg.norm(queries[:, None, :].astype(np.float64) - points[None, :, :], axis=2)
+    return np.sort(d, axis=1)[:, :k]
@@ -0,0 +1,20 @@
+"""
+noise metrics read the shared intermediates of the metric engine
+"""
+
+import numpy as np
+import pytest
+
+from laserscanqa import LaserScanQA
+
+
+def test_centroid_noise_reuses_shared_moments(rng):
+    points = rng.uniform(0, 10, (5000, 3))
+    qa = LaserScanQA(dict(LaserScanQA()._default_config(), profile_memory=False))
+    expected = qa.estimate_noise_level(points)
+    #the centroid must come from the moments pass, not a second mean over the points
+    centroids = []
+    spread = qa._centroid_spread
+    qa._centroid_spread = lambda points, centroid=None: centroids.append(centroid) or spread(points, centroid)
+    assert qa.run_quality_assessment(points).noise_level == pytest.approx(expected, rel=1e-12)
+    np.testing.assert_allclose(centroids[0], points.mean(axis=0), rtol=1e-12)
@@ -0,0 +1,54 @@
+"""
+compact storage encodes within its precision
+"""
+
+import numpy as np
+import pytest
+
+from point_storage import CompactPoints, load_compact_points
+from pointcloud_io import read_las_header, write_points
+
+
+def test_int32_round_trip_error(rng):
+    #georeferenced coordinates, far beyond float32 millimetre precision
+    points = rng.uniform(0, 100, (5000, 3)) + np.array([4.5e5, 5.4e6, 120.0])
+    compact = CompactPoints.from_points(points, 'int32', scale=0.001)
+    assert compact.data.dtype == np.int32
+    assert np.abs(compact.world() - points).max() <= 0.0005 + 1e-9
+    #float32 working coordinates keep millimetre fidelity as well
+    assert np.abs(compact.local().astype(np.float64) + compact.origin - points).max() < 0.001
+
+
+def test_float32_round_trip_error(rng):
+    points = rng.uniform(0, 100, (5000, 3)) + np.array([4.5e5, 5.4e6, 120.0])
+    compact = CompactPoints.from_points(points, 'float32')
+    assert compact.local().dtype == np.float32
+    assert np.abs(compact.world() - points).max() < 1e-5
+
+
+def test_int32_overflow_is_rejected():
+    compact = CompactPoints.empty(0, 'int32', np.zeros(3), 0.001)
+    with pytest.raises(ValueError):
+        compact.encode(np.array([[3e6, 0.0, 0.0]]))
+
+
+def test_las_int32_origin_is_rebased(tmp_path, rng):
+    points = rng.uniform(0, 50, (2000, 3)) + np.array([4.5e5, 5.4e6, 120.0])
+    path = tmp_path / 'scan.las'
+    write_points(str(path), points)
+    #move the header offset 400 km away, as writers with a fixed project origin do
+    header = read_las_header(str(path))
+    with open(path, 'r+b') as f:
+        raw = np.memmap(f, dtype=np.uint8, mode='r+')
+        raw[155:163] = np.frombuffer(np.float64(header['offset'][0] - 4e5).tobytes(), np.uint8)
+        x = np.ndarray((header['point_count'],), np.dtype({'names': ['X'], 'formats': ['<i4'], 'itemsize': 20}),
+                       raw, header['data_offset'])
+        x['X'] += 400_000_000
+        raw.flush()
+        del raw, x
+
+    compact = load_compact_points(str(path), 'int32')
+    assert np.abs(compact.world() - points).max() <= 0.0005 + 1e-6
+    #working coordinates start near zero, so float32 keeps millimetres
+    assert compact.local().max() < 51
+    assert np.abs(compact.local().astype(np.float64) + compact.origin - points).max() < 0.001
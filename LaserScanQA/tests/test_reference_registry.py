@@ -0,0 +1,40 @@
+"""
+reference index reuse and least recently used eviction
+"""
+
+import gc
+
+import numpy as np
+
+from reference_registry import ReferenceRegistry
+
+
+def test_lru_eviction(rng):
+    clouds = [rng.uniform(0, 1, (1000, 3)) for _ in range(3)]
+    size = ReferenceRegistry().index(clouds[0]).nbytes
+    #room for two indexes of this size
+    registry = ReferenceRegistry(max_bytes=int(2.5 * size))
+    keys = [registry.key(cloud) for cloud in clouds]
+
+    first = registry.index(clouds[0])
+    registry.index(clouds[1])
+    #touching the first makes the second the least recently used
+    assert registry.index(clouds[0]) is first
+    registry.index(clouds[2])
+    assert keys[0] in registry and keys[2] in registry
+    assert keys[1] not in registry
+    assert (registry.hits, registry.misses) == (1, 3)
+
+
+def test_same_content_shares_an_index(rng):
+    cloud = rng.uniform(0, 1, (500, 3))
+    registry = ReferenceRegistry()
+    assert registry.index(cloud) is registry.index(cloud.copy())
+
+
+def test_digest_memos_follow_array_lifetime(rng):
+    registry = ReferenceRegistry()
+    for _ in range(50):
+        registry.key(rng.uniform(0, 1, (10, 3)))
+    gc.collect()
+    assert len(registry._digests) == 0
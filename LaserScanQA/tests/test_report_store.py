@@ -0,0 +1,37 @@
+"""
+consolidated json lines reports survive reopening and torn writes
+"""
+
+from report_store import ReportStore
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'reports.jsonl'
+    with ReportStore(str(path), buffer_bytes=64) as store:
+        for i in range(20):
+            store.append(f'site/scan_{i}.las', {'value': i})
+        store.append('site/scan_3.las', {'value': 'newest'})
+        assert store.get('site/scan_7.las') == {'value': 7}
+
+    store = ReportStore(str(path))
+    assert len(store) == 20
+    assert store.get('site/scan_3.las') == {'value': 'newest'}
+    assert store.get('missing') is None
+    assert [name for name, _ in store][-1] == 'site/scan_3.las'
+    store.close()
+
+
+def test_recovers_unindexed_and_torn_lines(tmp_path):
+    path = tmp_path / 'reports.jsonl'
+    with ReportStore(str(path)) as store:
+        store.append('a', {'value': 1})
+    #a later run appended one full line and crashed in the middle of another
+    with open(path, 'ab') as f:
+        f.write(b'{"scan":"b","report":{"value":2}}\n{"scan":"c","rep')
+
+    store = ReportStore(str(path))
+    assert store.names() == ['a', 'b']
+    assert store.get('b') == {'value': 2}
+    store.append('c', {'value': 3})
+    assert store.get('c') == {'value': 3}
+    store.close()
@@ -0,0 +1,39 @@
+"""
+cache keys change exactly when a cached result could
+"""
+
+import numpy as np
+
+from laserscanqa import METRICS_VERSION, LaserScanQA
+from result_cache import ResultCache
+
+
+def _key(cache, path, config):
+    qa = LaserScanQA(config)
+    return cache.key(str(path), qa._result_config(), qa._metrics_version())
+
+
+def test_key_invalidation(tmp_path, rng):
+    scan = tmp_path / 'scan.npy'
+    np.save(scan, rng.uniform(0, 1, (100, 3)))
+    cache = ResultCache(str(tmp_path / 'cache'))
+    config = LaserScanQA()._default_config()
+    base = _key(cache, scan, config)
+
+    #runtime options do not change results
+    assert _key(cache, scan, dict(config, pipelined=True, tile_workers=4, cache_dir='x')) == base
+    #metric settings, unknown (custom metric) keys and the metrics version do
+    assert _key(cache, scan, dict(config, voxel_size=0.5)) != base
+    assert _key(cache, scan, dict(config, my_metric_radius=1.0)) != base
+    assert cache.key(str(scan), LaserScanQA(config)._result_config(), METRICS_VERSION + 'x') != base
+
+    #so does the file content, even at the same path
+    np.save(scan, rng.uniform(0, 1, (100, 3)))
+    assert _key(cache, scan, config) != base
+
+
+def test_put_get_round_trip(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    cache.put('abc', {'value': 1})
+    assert cache.get('abc') == {'value': 1}
+    assert cache.get('missing') is None
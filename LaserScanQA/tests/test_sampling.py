@@ -0,0 +1,20 @@
+"""
+approximate mode draws its sample only for the metrics that read it
+"""
+
+import numpy as np
+import pytest
+
+from laserscanqa import LaserScanQA
+
+
+@pytest.mark.parametrize('config, drawn', [
+    ({}, False),
+    ({'noise_method': 'local'}, True),
+    ({'roughness': True}, True),
+])
+def test_sample_drawn_only_when_needed(rng, config, drawn):
+    qa = LaserScanQA(dict(LaserScanQA()._default_config(), approximate=True, sample_size=1000, **config))
+    metrics = qa.run_quality_assessment(rng.uniform(0, 10, (5000, 3)))
+    assert ('sampling' in metrics.profile) == drawn
+    assert metrics.sampling['sample_size'] == 1000
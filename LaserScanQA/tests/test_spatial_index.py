@@ -0,0 +1,64 @@
+"""
+nearest neighbour queries against brute force
+"""
+
+import numpy as np
+import pytest
+
+from conftest import brute_knn
+import spatial_index
+from spatial_index import VoxelHashIndex
+
+
+@pytest.mark.parametrize('k', [1, 8])
+def test_query_matches_brute_force(rng, k):
+    points = rng.uniform(0, 10, (3000, 3))
+    queries = rng.uniform(-1, 11, (500, 3))
+    distances, indices = VoxelHashIndex(points).query(queries, k=k)
+    expected = brute_knn(points, queries, k)
+    np.testing.assert_allclose(distances, expected, rtol=1e-12)
+    #the indices point at points with those distances
+    np.testing.assert_allclose(np.linalg.norm(points[indices] - queries[:, None, :], axis=2), expected)
+
+
+def test_float32_index_matches_brute_force(rng):
+    points = rng.uniform(0, 5, (2000, 3)).astype(np.float32)
+    queries = rng.uniform(0, 5, (300, 3)).astype(np.float32)
+    distances, _ = VoxelHashIndex(points).query(queries, k=4)
+    np.testing.assert_allclose(distances, brute_knn(points, queries, 4), rtol=1e-5, atol=1e-6)
+
+
+def test_nearest_distances_with_offset(rng):
+    points = rng.uniform(0, 10, (2000, 3))
+    queries = rng.uniform(0, 10, (400, 3))
+    offset = np.array([500.0, -20.0, 3.0])
+    distances = VoxelHashIndex(points).nearest_distances(queries - offset, offset=offset)
+    np.testing.assert_allclose(distances, brute_knn(points, queries, 1)[:, 0], rtol=1e-9)
+
+
+@pytest.mark.parametrize('count', [1, 4, 5, 33])
+def test_split_batches_match_brute_force(monkeypatch, rng, count):
+    #a tiny candidate budget forces batches to split around the 4 x 8 x 8 cell lookup limit
+    monkeypatch.setattr(spatial_index, 'MAX_CANDIDATES', 256)
+    #crowded cells so single queries also scan their candidates in slices
+    points = np.repeat(rng.uniform(0, 10, (40, 3)), 20, axis=0) + rng.normal(0, 0.05, (800, 3))
+    queries = rng.uniform(0, 10, (count, 3))
+    distances, indices = VoxelHashIndex(points).query(queries, k=5)
+    expected = brute_knn(points, queries, 5)
+    np.testing.assert_allclose(distances, expected, rtol=1e-12)
+    np.testing.assert_allclose(np.linalg.norm(points[indices] - queries[:, None, :], axis=2), expected)
+
+
+def test_far_queries_escalate_through_coarser_levels(tmp_path, rng):
+    #two dense clusters far apart, so most cells are empty and far queries need coarse levels
+    points = np.vstack([rng.normal(0, 0.5, (2000, 3)), rng.normal(200, 0.5, (2000, 3))])
+    queries = np.vstack([rng.uniform(-50, 250, (200, 3)), rng.normal(0, 0.5, (50, 3))])
+    index = VoxelHashIndex(points)
+    assert index.top_level > 2
+    expected = brute_knn(points, queries, 3)
+    np.testing.assert_allclose(index.query(queries, k=3)[0], expected, rtol=1e-12)
+
+    #a saved index answers the same from memory-mapped arrays
+    index.save(str(tmp_path / 'index'))
+    loaded = VoxelHashIndex.load(str(tmp_path / 'index'), mmap=True)
+    np.testing.assert_allclose(loaded.query(queries, k=3)[0], expected, rtol=1e-12)
@@ -0,0 +1,61 @@
+"""
+streaming assessment of a chunked file matches the in-memory assessment
+"""
+
+import numpy as np
+import pytest
+
+from laserscanqa import LaserScanQA
+
+
+def _assess(tmp_path, points, chunk_rows, **config):
+    path = tmp_path / 'scan.npy'
+    np.save(path, points)
+    qa = LaserScanQA(dict(LaserScanQA()._default_config(), profile_memory=False, **config))
+    memory = qa.run_quality_assessment(qa.load_point_cloud(str(path)))
+    streamed = qa.run_streaming_assessment(str(path), chunk_rows=chunk_rows)
+    return memory, streamed
+
+
+def _surface(rng, count=20000):
+    xy = rng.uniform(0, 10, (count, 2))
+    points = np.c_[xy, 0.2 * np.sin(xy[:, 0]) + rng.normal(0, 0.01, count)]
+    #file order unrelated to position, the hard case for chunking
+    rng.shuffle(points)
+    return points
+
+
+@pytest.mark.parametrize('noise_method', ['centroid', 'local'])
+def test_chunked_matches_in_memory(tmp_path, rng, noise_method):
+    memory, streamed = _assess(tmp_path, _surface(rng), 3000, noise_method=noise_method)
+    assert streamed.point_count == memory.point_count
+    assert streamed.density == pytest.approx(memory.density, rel=1e-9)
+    assert streamed.completeness == memory.completeness
+    assert streamed.geometric_accuracy == pytest.approx(memory.geometric_accuracy, rel=1e-9)
+    #local noise is a histogram median when streamed, with bins under 1% wide
+    assert streamed.noise_level == pytest.approx(memory.noise_level, rel=1e-2 if noise_method == 'local' else 1e-9)
+
+
+def test_chunked_roughness_matches_in_memory(tmp_path, rng):
+    memory, streamed = _assess(tmp_path, _surface(rng), 3000, noise_method='local', roughness=True)
+    assert streamed.roughness['median'] == pytest.approx(memory.roughness['median'], rel=1e-2)
+    assert streamed.roughness['p95'] == pytest.approx(memory.roughness['p95'], rel=1e-2)
+
+
+def test_outlier_filter_is_rejected(tmp_path, rng):
+    #per-chunk statistics would judge points against the wrong neighbours
+    with pytest.raises(ValueError, match='outlier_filter'):
+        _assess(tmp_path, _surface(rng), 3000, outlier_filter='radius')
+
+
+def test_deduplication_is_per_chunk(tmp_path, rng):
+    unique = rng.uniform(0, 10, (1000, 3))
+    #rows 0-99 repeat once inside the first chunk of 600 and once more in the second
+    points = np.vstack([unique[:500], unique[:100], unique[500:], unique[:100]])
+    memory, streamed = _assess(tmp_path, points, 600, deduplicate='remove')
+    assert memory.duplicates['duplicates'] == 200 and memory.duplicates['scope'] == 'cloud'
+    assert memory.point_count == 1000
+    #only the copies inside the first chunk are caught
+    assert streamed.duplicates['scope'] == 'chunk'
+    assert streamed.duplicates['duplicates'] == 100
+    assert streamed.point_count == 1100
@@ -0,0 +1,122 @@
+"""
+tiling - xy tile partition of point clouds for per-region quality maps
+"""
+
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+def tile_grid(clouds: List[np.ndarray], tile_size: float,
+              offset: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """
+    xy tile grid covering every given cloud
+
+    Args:
+        clouds: point clouds (N, 3) that share the grid (scan and reference, say)
+        tile_size: tile edge length in point cloud units
+        offset: world xy of the clouds' coordinate zero, for clouds stored as offsets
+
+    Returns:
+        tuple of grid origin (2,) in cloud coordinates, aligned to world multiples
+        of tile_size, and shape (nx, ny)
+    """
+    offset = np.zeros(2) if offset is None else np.asarray(offset, dtype=np.float64)
+    clouds = [c for c in clouds if c is not None and len(c)]
+    mins = np.min([np.min(c[:, :2], axis=0) for c in clouds], axis=0).astype(np.float64)
+    maxs = np.max([np.max(c[:, :2], axis=0) for c in clouds], axis=0).astype(np.float64)
+    origin = np.floor((mins + offset) / tile_size) * tile_size - offset
+    shape = np.floor((maxs - origin) / tile_size).astype(np.int64) + 1
+    return origin, (int(shape[0]), int(shape[1]))
+
+
+class TilePartition:
+    """
+    points grouped by xy tile with one stable sort
+
+    tiles are numbered row by row (key = iy * nx + ix), and the sort order maps
+    each tile to one contiguous slice of point indices, so extracting a tile
+    only gathers its own points.
+    """
+
+    def __init__(self, points: np.ndarray, tile_size: float, origin: np.ndarray,
+                 shape: Tuple[int, int]):
+        """
+        partition a cloud
+
+        Args:
+            points: point cloud data (N, 3)
+            tile_size: tile edge length in point cloud units
+            origin: xy origin of the grid (2,)
+            shape: number of tiles along x and y
+        """
+        self.points = points
+        self.tile_size = float(tile_size)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.shape = shape
+        dtype = np.float32 if points.dtype == np.float32 else np.float64
+        cells = np.floor((points[:, :2] - self.origin.astype(dtype)) / dtype(self.tile_size)).astype(np.int64)
+        #clip guards points on the far grid border against rounding
+        np.clip(cells, 0, np.array(shape) - 1, out=cells)
+        keys = cells[:, 1] * shape[0] + cells[:, 0]
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts, self.counts = np.unique(keys[self.order], return_index=True,
+                                                        return_counts=True)
+
+    def _slot(self, key: int) -> Optional[int]:
+        """position of a tile key among the occupied tiles, None if empty"""
+        pos = int(np.searchsorted(self.keys, key))
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return pos
+        return None
+
+    def tile_points(self, key: int) -> np.ndarray:
+        """
+        points of one tile
+
+        Args:
+            key: tile key
+
+        Returns:
+            (B, 3) array, empty if the tile holds no points
+        """
+        slot = self._slot(key)
+        if slot is None:
+            return self.points[:0]
+        start = self.starts[slot]
+        return self.points[self.order[start:start + self.counts[slot]]]
+
+    def bounds(self, key: int) -> np.ndarray:
+        """xy box of a tile as [x0, y0, x1, y1]"""
+        low = self.origin + np.array([key % self.shape[0], key // self.shape[0]]) * self.tile_size
+        return np.concatenate([low, low + self.tile_size])
+
+    def halo_points(self, key: int, halo: float) -> np.ndarray:
+        """
+        points of the neighbouring tiles within halo of a tile's box
+
+        neighbourhood and nearest-reference queries near a tile edge need these
+        points, so per-tile metrics match what the whole cloud would give.
+
+        Args:
+            key: tile key
+            halo: margin around the tile box, at most tile_size
+
+        Returns:
+            (H, 3) array
+        """
+        ix, iy = key % self.shape[0], key // self.shape[0]
+        box = self.bounds(key)
+        parts = []
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                nx, ny = ix + dx, iy + dy
+                if (dx == 0 and dy == 0) or not (0 <= nx < self.shape[0] and 0 <= ny < self.shape[1]):
+                    continue
+                neighbour = self.tile_points(ny * self.shape[0] + nx)
+                if len(neighbour):
+                    xy = neighbour[:, :2]
+                    near = np.all((xy >= box[:2] - halo) & (xy <= box[2:] + halo), axis=1)
+                    parts.append(neighbour[near])
+        if not parts:
+            return self.points[:0]
+        return np.concatenate(parts)
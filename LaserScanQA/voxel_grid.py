@@ -0,0 +1,228 @@
+"""
+voxel_grid - sparse hashed voxel occupancy for point clouds
+"""
+
+import numpy as np
+from typing import Optional, Tuple
+
+#bits per axis in a packed voxel key; cells are stored with a bias so negative indices fit
+KEY_BITS = 21
+KEY_BIAS = 1 << (KEY_BITS - 1)
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+def pack_voxel_keys(cells: np.ndarray) -> np.ndarray:
+    """
+    pack signed integer voxel coordinates into one int64 key per voxel
+
+    Args:
+        cells: integer voxel coordinates (N, 3), each in [-2**20, 2**20)
+
+    Returns:
+        int64 keys (N,) that sort in x, y, z order
+    """
+    biased = cells.astype(np.int64, copy=False) + KEY_BIAS
+    if len(biased) and (biased.min() < 0 or biased.max() > KEY_MASK):
+        raise ValueError(f"voxel coordinates exceed {KEY_BITS} bits per axis; use a larger voxel size")
+    return (biased[:, 0] << (2 * KEY_BITS)) | (biased[:, 1] << KEY_BITS) | biased[:, 2]
+
+
+def unpack_voxel_keys(keys: np.ndarray) -> np.ndarray:
+    """
+    recover integer voxel coordinates from packed keys
+
+    Args:
+        keys: int64 keys (N,)
+
+    Returns:
+        integer voxel coordinates (N, 3)
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    return np.stack([(keys >> (2 * KEY_BITS)) & KEY_MASK,
+                     (keys >> KEY_BITS) & KEY_MASK,
+                     keys & KEY_MASK], axis=1) - KEY_BIAS
+
+
+class VoxelGrid:
+    """
+    sorted sparse voxel occupancy of a point cloud
+
+    each occupied voxel is one packed int64 key with its point count. voxels are
+    aligned to multiples of voxel_size, so grids of different clouds (or of
+    different chunks of one cloud) share voxels and can be compared key by key.
+    the bounding box is tracked in the same pass.
+    """
+
+    def __init__(self, voxel_size: float, origin: Optional[np.ndarray] = None):
+        """
+        create an empty grid
+
+        Args:
+            voxel_size: voxel edge length in point cloud units
+            origin: reference point of the key frame (snapped to the voxel lattice;
+                if None, taken from the first points added)
+        """
+        if voxel_size <= 0:
+            raise ValueError("voxel size must be positive")
+        self.voxel_size = float(voxel_size)
+        self.origin = None if origin is None else self._snap(np.asarray(origin, dtype=np.float64))
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.point_count = 0
+        self.mins = np.full(3, np.inf)
+        self.maxs = np.full(3, -np.inf)
+
+    @classmethod
+    def from_points(cls, points: np.ndarray, voxel_size: float,
+                    origin: Optional[np.ndarray] = None) -> 'VoxelGrid':
+        """
+        build a grid from a whole point cloud in one vectorized pass
+
+        Args:
+            points: point cloud data (N, 3)
+            voxel_size: voxel edge length in point cloud units
+            origin: reference point of the key frame (if None, the cloud minimum)
+
+        Returns:
+            populated voxel grid
+        """
+        grid = cls(voxel_size, origin)
+        if grid.origin is None and len(points):
+            grid.origin = grid._snap(np.min(points, axis=0).astype(np.float64))
+        grid.update(points)
+        return grid
+
+    def _snap(self, origin: np.ndarray) -> np.ndarray:
+        """move a point onto the voxel lattice so keys do not depend on the origin choice"""
+        return np.floor(origin / self.voxel_size) * self.voxel_size
+
+    def voxel_keys(self, points: np.ndarray) -> np.ndarray:
+        """
+        packed key of the voxel containing each point
+
+        Args:
+            points: point cloud data (N, 3)
+
+        Returns:
+            int64 keys (N,)
+        """
+        #float32 clouds are binned in float32 so no float64 copy of the chunk is made
+        dtype = np.float32 if points.dtype == np.float32 else np.float64
+        cells = np.floor((points - self.origin.astype(dtype)) / dtype(self.voxel_size)).astype(np.int64)
+        return pack_voxel_keys(cells)
+
+    def update(self, points: np.ndarray, bounds: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        """
+        add a chunk of points, merging its voxel counts into the grid
+
+        Args:
+            points: point cloud data (B, 3)
+            bounds: per-axis (mins, maxs) of the chunk when already known
+        """
+        if len(points) == 0:
+            return
+        if bounds is None:
+            bounds = (np.min(points, axis=0), np.max(points, axis=0))
+        if self.origin is None:
+            self.origin = self._snap(bounds[0].astype(np.float64))
+        np.minimum(self.mins, bounds[0], out=self.mins)
+        np.maximum(self.maxs, bounds[1], out=self.maxs)
+        self.point_count += len(points)
+
+        keys, counts = np.unique(self.voxel_keys(points), return_counts=True)
+        if len(self.keys):
+            #merge with the existing voxels and sum the counts of shared keys
+            keys = np.concatenate([self.keys, keys])
+            counts = np.concatenate([self.counts, counts])
+            keys, inverse = np.unique(keys, return_inverse=True)
+            counts = np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+        self.keys, self.counts = keys, counts
+
+    @property
+    def occupied(self) -> int:
+        """number of occupied voxels"""
+        return len(self.keys)
+
+    @property
+    def voxel_volume(self) -> float:
+        """volume of one voxel"""
+        return self.voxel_size ** 3
+
+    @property
+    def occupied_volume(self) -> float:
+        """total volume of the occupied voxels"""
+        return self.occupied * self.voxel_volume
+
+    def counts_at(self, keys: np.ndarray) -> np.ndarray:
+        """
+        point counts of the given voxel keys, zero where a voxel is empty
+
+        Args:
+            keys: int64 voxel keys in this grid's frame (M,)
+
+        Returns:
+            point counts (M,)
+        """
+        if len(self.keys) == 0:
+            return np.zeros(len(keys), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[pos] == keys, self.counts[pos], 0)
+
+    def enclosed_gaps(self, max_gap: int) -> np.ndarray:
+        """
+        empty voxels lying between occupied ones along an axis
+
+        a run of at most max_gap empty voxels with occupied voxels on both ends
+        of an axis-aligned voxel line is taken as a hole in the surface rather
+        than space the surface never crossed.
+
+        Args:
+            max_gap: longest run of empty voxels counted as a hole
+
+        Returns:
+            sorted unique int64 keys of the hole voxels
+        """
+        if max_gap < 1 or len(self.keys) < 2:
+            return np.empty(0, dtype=np.int64)
+        cells = unpack_voxel_keys(self.keys)
+        gaps = []
+        for axis in range(3):
+            across = [a for a in range(3) if a != axis]
+            #neighbours in this order are consecutive voxels of one axis-aligned line
+            line = cells[np.lexsort((cells[:, axis], cells[:, across[1]], cells[:, across[0]]))]
+            same_line = np.all(line[1:, across] == line[:-1, across], axis=1)
+            lengths = line[1:, axis] - line[:-1, axis] - 1
+            hole = same_line & (lengths >= 1) & (lengths <= max_gap)
+            lengths = lengths[hole]
+            if len(lengths) == 0:
+                continue
+            filled = np.repeat(line[:-1][hole], lengths, axis=0)
+            filled[:, axis] += np.arange(len(filled)) - np.repeat(np.cumsum(lengths) - lengths, lengths) + 1
+            gaps.append(pack_voxel_keys(filled))
+        if not gaps:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(gaps))
+
+    def coverage(self, min_count: float, expected: Optional['VoxelGrid'] = None,
+                 max_gap: int = 0) -> float:
+        """
+        fraction of the expected surface's voxels holding at least min_count points
+
+        Args:
+            min_count: points a voxel needs to count as covered
+            expected: grid of the expected surface in the same frame (if None, this
+                grid's occupied voxels plus the holes found by enclosed_gaps)
+            max_gap: longest run of empty voxels taken as a hole when there is no
+                expected grid
+
+        Returns:
+            coverage ratio (0-1)
+        """
+        if expected is None:
+            keys = np.union1d(self.keys, self.enclosed_gaps(max_gap))
+        else:
+            keys = expected.keys
+        if len(keys) == 0:
+            return 0.0
+        #a voxel is covered or not, so a few dense voxels cannot make up for sparse ones
+        return float(np.mean(self.counts_at(keys) >= min_count))
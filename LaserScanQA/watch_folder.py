@@ -0,0 +1,170 @@
+"""
+watch_folder - stability tracking and a persistent checkpoint for assessing scans as they arrive
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+#(size in bytes, modification time in ns) of a file
+FileState = Tuple[int, int]
+
+
+def list_scans(directory: str, extensions: Iterable[str], recursive: bool = False) -> Dict[str, FileState]:
+    """
+    point cloud files in a directory with their current state
+
+    hidden files (names starting with '.') are skipped, since copy tools often
+    write to a hidden temporary name and rename it once done.
+
+    Args:
+        directory: directory to list
+        extensions: lowercase suffixes to include, e.g. ('.csv', '.las')
+        recursive: include subdirectories
+
+    Returns:
+        mapping from absolute path to (size, mtime_ns)
+    """
+    extensions = set(extensions)
+    pattern = '**/*' if recursive else '*'
+    states = {}
+    for path in Path(directory).glob(pattern):
+        if path.name.startswith('.') or path.suffix.lower() not in extensions:
+            continue
+        try:
+            stat = path.stat()
+        except OSError:
+            #removed between listing and stat
+            continue
+        if path.is_file():
+            states[str(path.resolve())] = (stat.st_size, stat.st_mtime_ns)
+    return states
+
+
+class StabilityTracker:
+    """
+    files whose size and modification time stopped changing
+
+    a scanner copying a file into the folder keeps growing it, so a file only
+    counts as finished once it has been seen non-empty with the same size and
+    mtime for settle_seconds.
+    """
+
+    def __init__(self, settle_seconds: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        """
+        create a tracker
+
+        Args:
+            settle_seconds: time a file has to stay unchanged
+            clock: monotonic time source in seconds
+        """
+        self.settle_seconds = settle_seconds
+        self.clock = clock
+        #last seen state of every pending file and when it was first seen in that state
+        self._seen: Dict[str, Tuple[FileState, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def observe(self, states: Dict[str, FileState]) -> List[str]:
+        """
+        record one listing and return the files that are stable
+
+        Args:
+            states: current (size, mtime_ns) of every file still waiting
+
+        Returns:
+            stable paths in name order
+        """
+        now = self.clock()
+        #files that disappeared are no longer waited for
+        self._seen = {path: seen for path, seen in self._seen.items() if path in states}
+        stable = []
+        for path, state in sorted(states.items()):
+            seen = self._seen.get(path)
+            if seen is None or seen[0] != state:
+                seen = (state, now)
+                self._seen[path] = seen
+            if state[0] > 0 and now - seen[1] >= self.settle_seconds:
+                stable.append(path)
+        return stable
+
+    def forget(self, path: str):
+        """stop tracking a file once it was handed over for assessment"""
+        self._seen.pop(path, None)
+
+
+class Checkpoint:
+    """
+    json lines log of the files already assessed
+
+    entries are keyed by path and checked against the file's size and mtime,
+    so a file rewritten under the same name is assessed again. each entry is
+    appended and flushed on its own, so a restart loses at most the files that
+    were in flight. failed files are logged too and only retried once changed.
+    """
+
+    def __init__(self, path: str):
+        """
+        open or create a checkpoint
+
+        Args:
+            path: json lines file
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._entries: Dict[str, Dict] = {}
+        if self.path.exists():
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry['path']] = entry
+                    except (ValueError, KeyError):
+                        #a torn last line from an interrupted write
+                        continue
+        self._file = open(self.path, 'a')
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def done(self, path: str, state: FileState) -> bool:
+        """whether a file in this exact state was already assessed (or failed)"""
+        entry = self._entries.get(path)
+        return entry is not None and (entry['size'], entry['mtime_ns']) == tuple(state)
+
+    def status(self, path: str) -> Optional[str]:
+        """'done' or 'failed' for logged files, None otherwise"""
+        entry = self._entries.get(path)
+        return None if entry is None else entry['status']
+
+    def record(self, path: str, state: FileState, status: str = 'done'):
+        """
+        log one assessed file
+
+        Args:
+            path: absolute file path
+            state: (size, mtime_ns) of the file when it was assessed
+            status: 'done' or 'failed'
+        """
+        entry = {'path': path, 'size': state[0], 'mtime_ns': state[1], 'status': status,
+                 'time': time.time()}
+        self._entries[path] = entry
+        self._file.write(json.dumps(entry) + '\n')
+        self._file.flush()
+
+    def compact(self):
+        """rewrite the log with only the latest entry per file"""
+        self._file.close()
+        temp = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        with open(temp, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(temp, self.path)
+        self._file = open(self.path, 'a')
+
+    def close(self):
+        """close the log file"""
+        self._file.close()